@@ -0,0 +1,185 @@
+"""
+Scalability benchmarks for the Store/Product/Promotion hot paths.
+
+Usage:
+    python benchmark.py                          # sizes 10^3..10^5
+    python benchmark.py --sizes 1000 1000000     # custom catalog sizes
+    python benchmark.py --save baseline.json     # store a baseline
+    python benchmark.py --compare baseline.json  # exit 1 on regression
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from product import LimitedProduct, NonStockedProduct, Product
+from promotion import PercentDiscount, SecondHalfPrice, ThirdOneFree
+from store import Store
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+PROMOTIONS = [
+    None, None, None, None, None, None, None,
+    SecondHalfPrice("Second Half Price!"),
+    ThirdOneFree("Third One Free!"),
+    PercentDiscount("30% off!", 30),
+]
+
+
+def build_catalog(size, seed=0):
+    """Return `size` products: 80% regular, 10% limited, 10% non-stocked."""
+    rng = random.Random(seed)
+    products = []
+    for i in range(size):
+        kind = rng.random()
+        price = round(rng.uniform(1, 2000), 2)
+        if kind < 0.8:
+            item = Product(f"Product {i}", price, rng.randint(1_000, 1_000_000))
+        elif kind < 0.9:
+            item = LimitedProduct(f"Limited {i}", price, rng.randint(1_000, 100_000), maximum=3)
+        else:
+            item = NonStockedProduct(f"Digital {i}", price)
+        item.set_promotion(rng.choice(PROMOTIONS))
+        products.append(item)
+    return products
+
+
+def build_orders(products, count, seed=1):
+    """Return `count` shopping lists of 1-5 lines, some repeating a product."""
+    rng = random.Random(seed)
+    orders = []
+    for _ in range(count):
+        lines = [(rng.choice(products), rng.randint(1, 3)) for _ in range(rng.randint(1, 5))]
+        if rng.random() < 0.1:
+            lines.append(lines[0])
+        orders.append(lines)
+    return orders
+
+
+def percentile(sorted_values, fraction):
+    index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def measure(operation, calls):
+    """Run operation(i) for i in range(calls); return throughput and latencies."""
+    timer = time.perf_counter_ns
+    latencies = []
+    started = timer()
+    for i in range(calls):
+        before = timer()
+        operation(i)
+        latencies.append(timer() - before)
+    elapsed = (timer() - started) / 1e9
+    latencies.sort()
+    return {
+        "ops_per_sec": calls / elapsed if elapsed else float("inf"),
+        "p50_us": percentile(latencies, 0.50) / 1e3,
+        "p95_us": percentile(latencies, 0.95) / 1e3,
+        "p99_us": percentile(latencies, 0.99) / 1e3,
+    }
+
+
+def peak_memory_mb(size):
+    """Peak traced memory while building a catalog and its store."""
+    tracemalloc.start()
+    store = Store(build_catalog(size))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del store
+    return peak / 2 ** 20
+
+
+def run_size(size, calls):
+    """Run every hot-path benchmark against a catalog of `size` products."""
+    products = build_catalog(size)
+    store = Store(products)
+    other = Store(build_catalog(max(size // 10, 1), seed=2))
+    orders = build_orders(products, calls)
+    probes = [products[i * 7919 % size] for i in range(calls)]
+    listing_calls = max(min(calls, 10_000_000 // size), 3)
+    add_calls = max(min(calls, 1_000_000 // size), 3)
+
+    def quiet_order(i):
+        # Failed lines print; keep the terminal out of the measurement.
+        stdout, sys.stdout = sys.stdout, None
+        try:
+            store.order(orders[i])
+        finally:
+            sys.stdout = stdout
+
+    def buy(i):
+        try:
+            probes[i].buy(1)
+        except Exception:
+            pass
+
+    results = {
+        "order": measure(quiet_order, calls),
+        "buy": measure(buy, calls),
+        "contains": measure(lambda i: probes[i] in store, calls),
+        "get_total_quantity": measure(lambda i: store.get_total_quantity(), calls),
+        "get_all_products": measure(lambda i: store.get_all_products(), listing_calls),
+        "store_add": measure(lambda i: store + other, add_calls),
+    }
+    results["peak_memory_mb"] = peak_memory_mb(size)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regressions: throughput below baseline by > tolerance."""
+    regressions = []
+    for size, benches in baseline.items():
+        current = results.get(size)
+        if current is None:
+            continue
+        for name, stats in benches.items():
+            if not isinstance(stats, dict) or name not in current:
+                continue
+            floor = stats["ops_per_sec"] * (1 - tolerance)
+            if current[name]["ops_per_sec"] < floor:
+                regressions.append(
+                    f"size {size} {name}: {current[name]['ops_per_sec']:.0f} ops/s "
+                    f"< {floor:.0f} (baseline {stats['ops_per_sec']:.0f})"
+                )
+    return regressions
+
+
+def print_results(results):
+    print(f"{'size':>9} {'benchmark':<20} {'ops/s':>12} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9}")
+    for size, benches in results.items():
+        for name, stats in benches.items():
+            if isinstance(stats, dict):
+                print(f"{size:>9} {name:<20} {stats['ops_per_sec']:>12.0f} "
+                      f"{stats['p50_us']:>9.2f} {stats['p95_us']:>9.2f} {stats['p99_us']:>9.2f}")
+        print(f"{size:>9} {'peak memory':<20} {benches['peak_memory_mb']:>10.1f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--calls", type=int, default=5_000, help="calls per benchmark")
+    parser.add_argument("--save", help="write results as a JSON baseline")
+    parser.add_argument("--compare", help="JSON baseline to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed throughput drop before failing (default 0.25)")
+    args = parser.parse_args(argv)
+
+    results = {str(size): run_size(size, args.calls) for size in args.sizes}
+    print_results(results)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+import weakref
+from typing import List
+
+import numpy as np
+
+from product import LimitedProduct, NonStockedProduct, Product
+
+
+class ProductView(Product):
+    """
+    A Product backed by one row of a ProductTable.
+
+    The view keeps no product data of its own: the private fields that
+    Product's properties read and write are redirected to the table's
+    arrays, so validation, store notifications and buy() behave exactly
+    as they do for a regular Product.
+    """
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+        self._init_shared_state()
+
+    @property
+    def name(self):
+        return self._table._names[self._row]
+
+    @name.setter
+    def name(self, name):
+        if not isinstance(name, str) or name.strip() == "":
+            raise ValueError("Name must be a non empty string")
+        self._table._names[self._row] = name
+
+    @property
+    def _price(self):
+        return float(self._table._prices[self._row])
+
+    @_price.setter
+    def _price(self, price):
+        self._table._prices[self._row] = price
+
+    @property
+    def _quantity(self):
+        return int(self._table._quantities[self._row])
+
+    @_quantity.setter
+    def _quantity(self, quantity):
+        self._table._quantities[self._row] = quantity
+
+    @property
+    def _active(self):
+        return bool(self._table._active[self._row])
+
+    @_active.setter
+    def _active(self, status):
+        self._table._active[self._row] = bool(status)
+
+    @property
+    def _promotion(self):
+        return self._table._promotion_for(self._table._promotion_ids[self._row])
+
+    @_promotion.setter
+    def _promotion(self, promotion):
+        self._table._promotion_ids[self._row] = self._table._promotion_id(promotion)
+
+
+class NonStockedProductView(ProductView, NonStockedProduct):
+    """A ProductView following NonStockedProduct rules: no stock is kept or taken."""
+
+
+class LimitedProductView(ProductView, LimitedProduct):
+    """A ProductView following LimitedProduct rules, with its maximum in the table."""
+
+    @property
+    def maximum(self):
+        return int(self._table._maximums[self._row])
+
+    @maximum.setter
+    def maximum(self, maximum):
+        self._table._maximums[self._row] = maximum
+
+
+# Product kinds by type code, as stored in the table's _kinds column.
+KINDS = ["Product", "NonStockedProduct", "LimitedProduct"]
+VIEW_TYPES = [ProductView, NonStockedProductView, LimitedProductView]
+_KIND_OF_TYPE = {
+    Product: "Product", ProductView: "Product",
+    NonStockedProduct: "NonStockedProduct", NonStockedProductView: "NonStockedProduct",
+    LimitedProduct: "LimitedProduct", LimitedProductView: "LimitedProduct",
+}
+
+
+class ProductTable:
+    """
+    Columnar product catalog.
+
+    Names, prices, quantities, active flags, promotion IDs, product kinds and
+    per-purchase maximums are stored in parallel NumPy arrays, one row per
+    product. Indexing the table returns a view of the row's kind
+    (ProductView, NonStockedProductView or LimitedProductView), which can be
+    added to a Store and bought like the product it mirrors. Aggregate
+    queries run over the arrays directly.
+    """
+
+    def __init__(self, capacity=1024):
+        capacity = max(int(capacity), 1)
+        self._size = 0
+        self._names = np.empty(capacity, dtype=object)
+        self._prices = np.zeros(capacity, dtype=np.float64)
+        self._quantities = np.zeros(capacity, dtype=np.int64)
+        self._active = np.zeros(capacity, dtype=bool)
+        self._promotion_ids = np.full(capacity, -1, dtype=np.int32)
+        self._kinds = np.zeros(capacity, dtype=np.int8)
+        self._maximums = np.zeros(capacity, dtype=np.int64)
+        self._promotions = []
+        self._promotion_lookup = {}
+        self._views = weakref.WeakValueDictionary()
+
+    @classmethod
+    def from_products(cls, products):
+        """
+        Build a table holding a copy of the given products' data.
+        Raises:
+            ValueError: If a product is not a Product, NonStockedProduct or
+                        LimitedProduct (other subclasses' rules cannot be
+                        kept in columns)
+        """
+        products = list(products)
+        table = cls(capacity=len(products))
+        for item in products:
+            kind = _KIND_OF_TYPE.get(type(item))
+            if kind is None:
+                raise ValueError(f"Unsupported product type: {type(item).__name__}")
+            table.append(item.name, item.price, item.quantity, active=item.active,
+                         promotion=item.promotion, kind=kind,
+                         maximum=item.maximum if kind == "LimitedProduct" else None)
+        return table
+
+    def _promotion_id(self, promotion):
+        """Return the ID of a promotion, registering it on first use."""
+        if promotion is None:
+            return -1
+        promotion_id = self._promotion_lookup.get(promotion)
+        if promotion_id is None:
+            promotion_id = len(self._promotions)
+            self._promotions.append(promotion)
+            self._promotion_lookup[promotion] = promotion_id
+        return promotion_id
+
+    def _promotion_for(self, promotion_id):
+        return None if promotion_id < 0 else self._promotions[promotion_id]
+
+    def _reserve(self, extra):
+        """Grow the arrays so that `extra` more rows fit."""
+        needed = self._size + extra
+        capacity = len(self._prices)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for field in ("_names", "_prices", "_quantities", "_active", "_promotion_ids",
+                      "_kinds", "_maximums"):
+            old = getattr(self, field)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            if field == "_promotion_ids":
+                new[self._size:] = -1
+            setattr(self, field, new)
+
+    def append(self, name, price, quantity, active=True, promotion=None, kind="Product",
+               maximum=None) -> int:
+        """
+        Add one product and return its row number.
+        `kind` is Product, NonStockedProduct (quantity must be 0) or
+        LimitedProduct (with a positive integer `maximum` per purchase).
+        """
+        if not isinstance(name, str) or name.strip() == "":
+            raise ValueError("Name must be a non empty string")
+        if not isinstance(price, (int, float)) or price < 0:
+            raise ValueError("Price must be a non negative number")
+        if not isinstance(quantity, int) or quantity < 0:
+            raise ValueError("Quantity must be a non negative number")
+        if kind not in KINDS:
+            raise ValueError(f"Unknown product type: {kind}")
+        if kind == "NonStockedProduct" and quantity != 0:
+            raise ValueError("Non-stocked products have no quantity")
+        if kind == "LimitedProduct":
+            if not isinstance(maximum, int) or isinstance(maximum, bool) or maximum <= 0:
+                raise ValueError("Maximum must be a positive integer")
+        elif maximum is not None:
+            raise ValueError("Only limited products have a maximum")
+        self._reserve(1)
+        row = self._size
+        self._names[row] = name
+        self._prices[row] = price
+        self._quantities[row] = quantity
+        self._active[row] = bool(active)
+        self._promotion_ids[row] = self._promotion_id(promotion)
+        self._kinds[row] = KINDS.index(kind)
+        self._maximums[row] = maximum or 0
+        self._size += 1
+        return row
+
+    def extend(self, names, prices, quantities) -> range:
+        """
+        Add many active products without promotions in one step.
+
+        Args:
+            names: Sequence of non empty product names
+            prices: Sequence of non negative prices
+            quantities: Sequence of non negative integer quantities
+
+        Returns:
+            range: The row numbers of the new products
+        """
+        names = list(names)
+        prices = np.asarray(prices, dtype=np.float64)
+        quantities = np.asarray(quantities)
+        count = len(names)
+        if prices.shape != (count,) or quantities.shape != (count,):
+            raise ValueError("Names, prices and quantities must have the same length")
+        if any(not isinstance(name, str) or name.strip() == "" for name in names):
+            raise ValueError("Name must be a non empty string")
+        if count and (np.isnan(prices).any() or prices.min() < 0):
+            raise ValueError("Price must be a non negative number")
+        if count and (quantities.dtype.kind not in "iu" or quantities.min() < 0):
+            raise ValueError("Quantity must be a non negative number")
+        self._reserve(count)
+        start, end = self._size, self._size + count
+        self._names[start:end] = names
+        self._prices[start:end] = prices
+        self._quantities[start:end] = quantities
+        self._active[start:end] = True
+        self._promotion_ids[start:end] = -1
+        self._kinds[start:end] = 0
+        self._maximums[start:end] = 0
+        self._size = end
+        return range(start, end)
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, row) -> ProductView:
+        """
+        Return the view for a row, of the row's product kind; the same view
+        is returned while it is alive.
+        """
+        if not isinstance(row, (int, np.integer)):
+            raise TypeError("Row must be an integer")
+        row = int(row)
+        if row < 0:
+            row += self._size
+        if not 0 <= row < self._size:
+            raise IndexError("Row out of range")
+        view = self._views.get(row)
+        if view is None:
+            view = VIEW_TYPES[self._kinds[row]](self, row)
+            self._views[row] = view
+        return view
+
+    def __iter__(self):
+        for row in range(self._size):
+            yield self[row]
+
+    def products(self) -> List[ProductView]:
+        """Return views for all rows, e.g. to build a Store."""
+        return list(self)
+
+    def total_quantity(self) -> int:
+        """Return the total quantity of all products."""
+        return int(self._quantities[:self._size].sum())
+
+    def active_rows(self) -> np.ndarray:
+        """Return the row numbers of all active products."""
+        return np.flatnonzero(self._active[:self._size])
+
+    def active_products(self) -> List[ProductView]:
+        """Return views for all active products."""
+        return [self[row] for row in self.active_rows()]
+
+    def inventory_value(self, active_only=False) -> float:
+        """Return the sum of price * quantity, at list price."""
+        prices = self._prices[:self._size]
+        quantities = self._quantities[:self._size]
+        if active_only:
+            mask = self._active[:self._size]
+            prices, quantities = prices[mask], quantities[mask]
+        return float(np.dot(prices, quantities))
+
+    def rows_in_price_range(self, low, high, active_only=True) -> np.ndarray:
+        """Return the row numbers of products priced within [low, high]."""
+        prices = self._prices[:self._size]
+        mask = (prices >= low) & (prices <= high)
+        if active_only:
+            mask &= self._active[:self._size]
+        return np.flatnonzero(mask)
+
+    def products_in_price_range(self, low, high, active_only=True) -> List[ProductView]:
+        """Return views for products priced within [low, high]."""
+        return [self[row] for row in self.rows_in_price_range(low, high, active_only)]
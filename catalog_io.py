@@ -0,0 +1,263 @@
+import csv
+import itertools
+import json
+import os
+
+import numpy as np
+
+from product import LimitedProduct, NonStockedProduct, Product, product_from_record
+
+CSV_FIELDS = ["type", "name", "price", "quantity", "active", "promotion", "maximum"]
+PRODUCT_TYPES = {
+    "Product": Product,
+    "NonStockedProduct": NonStockedProduct,
+    "LimitedProduct": LimitedProduct,
+}
+
+
+class RowError(ValueError):
+    """A catalog row that could not be loaded."""
+
+    def __init__(self, row_number, message):
+        super().__init__(f"Row {row_number}: {message}")
+        self.row_number = row_number
+        self.message = message
+
+
+def _format_of(path, format=None) -> str:
+    if format is None:
+        format = os.path.splitext(str(path))[1].lstrip(".").lower()
+    if format not in ("csv", "jsonl"):
+        raise ValueError(f"Unsupported catalog format: {format}")
+    return format
+
+
+def read_rows(path, format=None):
+    """
+    Stream raw rows from a CSV or JSONL catalog.
+
+    Yields:
+        tuple: (row_number, dict) with row numbers counted from 1,
+        excluding the CSV header
+    """
+    format = _format_of(path, format)
+    with open(path, newline="", encoding="utf-8") as catalog_file:
+        if format == "csv":
+            yield from enumerate(csv.DictReader(catalog_file), start=1)
+        else:
+            for row_number, line in enumerate(catalog_file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield row_number, json.loads(line)
+                except ValueError as e:
+                    yield row_number, {"_error": f"invalid JSON ({e})"}
+
+
+def _parse_active(value) -> bool:
+    if value is None or value == "":
+        return True
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in ("true", "1", "yes"):
+            return True
+        if lowered in ("false", "0", "no"):
+            return False
+        raise ValueError(f"Invalid active flag: {value}")
+    return bool(value)
+
+
+def _typed_record(row) -> dict:
+    """Convert a raw CSV/JSONL row into a product_from_record dict."""
+    if not isinstance(row, dict):
+        raise ValueError("Row must be an object")
+    if "_error" in row:
+        raise ValueError(row["_error"])
+    kind = row.get("type") or "Product"
+    quantity = row.get("quantity")
+    if kind == "NonStockedProduct" and quantity in (None, ""):
+        quantity = 0
+    record = {
+        "type": kind,
+        "name": row.get("name"),
+        "price": _number(row.get("price"), float),
+        "quantity": _number(quantity, int),
+        "active": _parse_active(row.get("active")),
+        "promotion": row.get("promotion") or None,
+    }
+    if kind == "LimitedProduct":
+        record["maximum"] = _number(row.get("maximum"), int)
+    return record
+
+
+def _number(value, kind):
+    """Parse a CSV string; JSON numbers are passed through for validation."""
+    if isinstance(value, str):
+        try:
+            return kind(value)
+        except ValueError:
+            return value
+    return value
+
+
+def _is_positive_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def _load_row(row_number, row, promotions):
+    """Reference (slow) path: full validation through product_from_record."""
+    try:
+        return product_from_record(_typed_record(row), promotions)
+    except (KeyError, TypeError, ValueError) as e:
+        raise RowError(row_number, str(e)) from None
+
+
+def _column(rows, field, dtype, default=None):
+    """Parse one field of a chunk into an array; ValueError if any is malformed."""
+    values = [row.get(field, default) for _, row in rows]
+    values = [default if value in (None, "") else value for value in values]
+    raw = np.asarray(values)
+    if raw.dtype.kind == "U":
+        return raw.astype(dtype)
+    if dtype is np.int64 and raw.dtype.kind not in "iub":
+        raise ValueError(f"Non integer {field}")
+    if raw.dtype.kind not in "iubf":
+        raise ValueError(f"Non numeric {field}")
+    return raw.astype(dtype)
+
+
+def _load_chunk(rows, promotions):
+    """
+    Fast path for one chunk of rows.
+
+    Each field of the chunk is extracted as a column; prices and
+    quantities are parsed and range checked with NumPy, and products are
+    built without re-running the constructors' checks. Rows that fail a
+    check, and whole chunks that cannot be parsed in bulk, yield None so
+    that the caller runs _load_row for an exact error.
+    """
+    if not all(row.__class__ is dict for _, row in rows):
+        # JSONL lines that are not objects go straight to _load_row.
+        loaded = _load_chunk([(row_number, row) for row_number, row in rows
+                              if row.__class__ is dict], promotions)
+        for row_number, row in rows:
+            yield next(loaded) if row.__class__ is dict else (row_number, row, None)
+        return
+    try:
+        prices = _column(rows, "price", np.float64)
+        quantities = _column(rows, "quantity", np.int64, default=0)
+    except (TypeError, ValueError, OverflowError):
+        for row_number, row in rows:
+            yield row_number, row, None
+        return
+    # Only non-stocked rows may leave the quantity out.
+    missing = [row.get("quantity") in (None, "") for _, row in rows]
+    good = (~(np.isnan(prices) | (prices < 0) | (quantities < 0))).tolist()
+    prices = prices.tolist()
+    quantities = quantities.tolist()
+    for i, (row_number, row) in enumerate(rows):
+        cls = PRODUCT_TYPES.get(row.get("type") or "Product")
+        name = row.get("name")
+        promotion = row.get("promotion") or None
+        active = row.get("active")
+        if active is None or active == "" or active is True or active == "True" or active == "true":
+            active = True
+        elif active is False or active == "False" or active == "false":
+            active = False
+        else:
+            cls = None
+        if (cls is None or not good[i] or "_error" in row
+                or name.__class__ is not str or not name.strip()
+                or (missing[i] and cls is not NonStockedProduct)):
+            yield row_number, row, None
+            continue
+        if promotion is not None:
+            promotion = promotions.get(promotion)
+            if promotion is None:
+                yield row_number, row, None
+                continue
+        if cls is Product:
+            yield row_number, row, Product._from_trusted(name, prices[i], quantities[i],
+                                                         active, promotion)
+            continue
+        maximum = _number(row.get("maximum"), int) if cls is LimitedProduct else None
+        if cls is LimitedProduct and not _is_positive_int(maximum):
+            yield row_number, row, None
+            continue
+        quantity = 0 if cls is NonStockedProduct else quantities[i]
+        item = cls._from_trusted(name, prices[i], quantity, active, promotion)
+        if maximum is not None:
+            item.maximum = maximum
+        yield row_number, row, item
+
+
+def iter_products(path, promotions=None, on_error=None, format=None, chunk_size=4096):
+    """
+    Stream products from a CSV or JSONL catalog.
+
+    Rows are validated chunk by chunk, so memory stays bounded by
+    `chunk_size` whatever the catalog size.
+
+    Args:
+        path: Catalog file; the format comes from the extension unless given
+        promotions: Mapping of promotion name to Promotion
+        on_error: Called with each RowError; if None the first error is raised
+        format: "csv" or "jsonl"
+        chunk_size: Rows validated together
+
+    Yields:
+        Product: One product per valid row
+    """
+    promotions = promotions or {}
+    rows = read_rows(path, format)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        for row_number, row, item in _load_chunk(chunk, promotions):
+            if item is None:
+                try:
+                    item = _load_row(row_number, row, promotions)
+                except RowError as e:
+                    if on_error is None:
+                        raise
+                    on_error(e)
+                    continue
+            yield item
+
+
+def load_store(store, path, promotions=None, on_error=None, format=None, chunk_size=4096) -> int:
+    """Stream a catalog into a Store. Returns the number of products added."""
+    products = iter_products(path, promotions, on_error, format, chunk_size)
+    count = 0
+    while True:
+        chunk = list(itertools.islice(products, chunk_size))
+        if not chunk:
+            return count
+        count += store.add_products(chunk)
+
+
+def export_products(products, path, format=None) -> int:
+    """
+    Stream products to a CSV or JSONL catalog readable by iter_products.
+
+    Returns:
+        int: The number of products written
+    """
+    format = _format_of(path, format)
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as catalog_file:
+        if format == "csv":
+            writer = csv.DictWriter(catalog_file, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            for item in products:
+                record = item.to_record()
+                if record["promotion"] is None:
+                    record["promotion"] = ""
+                writer.writerow(record)
+                count += 1
+        else:
+            for item in products:
+                catalog_file.write(json.dumps(item.to_record()) + "\n")
+                count += 1
+    return count
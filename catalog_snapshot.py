@@ -0,0 +1,301 @@
+"""
+Binary, memory-mapped catalog snapshots.
+
+Layout (little endian):
+    header      magic, format version, product count, promotion count,
+                total quantity, string table offset
+    records     one fixed-width record per product, in store order
+    name index  record numbers sorted by name, for binary search
+    promotions  (offset, length) of each promotion name in the string table
+    strings     UTF-8 product and promotion names
+
+Opening a snapshot maps the file and reads the header and promotion names
+only; products are built the first time they are accessed, so startup time
+does not depend on the catalog size.
+"""
+import mmap
+import os
+import struct
+import threading
+import weakref
+
+from product import LimitedProduct, NonStockedProduct, Product
+from store import Store
+
+MAGIC = b"BBCATLG\0"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIQIQQ")
+# type, active, promotion index (-1 for none), name offset, name length,
+# price, quantity, maximum
+RECORD = struct.Struct("<BBxxiIIdqq")
+INDEX = struct.Struct("<I")
+STRING_REF = struct.Struct("<II")
+PRODUCT_TYPES = [Product, NonStockedProduct, LimitedProduct]
+
+
+def _type_code(item) -> int:
+    if isinstance(item, LimitedProduct):
+        return PRODUCT_TYPES.index(LimitedProduct)
+    if isinstance(item, NonStockedProduct):
+        return PRODUCT_TYPES.index(NonStockedProduct)
+    return PRODUCT_TYPES.index(Product)
+
+
+def write_snapshot(products, path) -> int:
+    """
+    Write products (a Store or an iterable of products) as a binary snapshot.
+    The file is replaced atomically.
+    Returns:
+        int: The number of products written
+    """
+    if isinstance(products, Store):
+        products = products.iter_products(active_only=False)
+    strings = bytearray()
+    records = []
+    names = []
+    promotion_index = {}
+    total_quantity = 0
+    for number, item in enumerate(products):
+        name = item.name.encode("utf-8")
+        promotion = item.promotion
+        if promotion is None:
+            promotion_ref = -1
+        else:
+            promotion_ref = promotion_index.setdefault(promotion.name, len(promotion_index))
+        maximum = item.maximum if isinstance(item, LimitedProduct) else 0
+        records.append(RECORD.pack(_type_code(item), bool(item.active),
+                                   promotion_ref, len(strings), len(name),
+                                   item.price, item.quantity, maximum))
+        names.append((name, number))
+        strings += name
+        total_quantity += item.quantity
+    promotion_refs = []
+    for promotion_name in promotion_index:
+        encoded = promotion_name.encode("utf-8")
+        promotion_refs.append(STRING_REF.pack(len(strings), len(encoded)))
+        strings += encoded
+    names.sort()
+    strings_offset = (HEADER.size + len(records) * RECORD.size + len(names) * INDEX.size
+                      + len(promotion_refs) * STRING_REF.size)
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as snapshot_file:
+        snapshot_file.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(records), len(promotion_refs),
+                                        total_quantity, strings_offset))
+        snapshot_file.write(b"".join(records))
+        snapshot_file.write(b"".join(INDEX.pack(number) for _, number in names))
+        snapshot_file.write(b"".join(promotion_refs))
+        snapshot_file.write(strings)
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+    os.replace(temporary, path)
+    return len(records)
+
+
+class MappedStore:
+    """
+    Store over a memory-mapped catalog snapshot.
+
+    Products are materialized from their records on first access and kept,
+    so later changes to them (orders, price updates) are tracked like in a
+    Store. Unmaterialized products cannot have changed, so running totals
+    only need to follow the materialized ones. Call to_store() for a full
+    Store with every index built.
+    """
+
+    def __init__(self, path, promotions=None):
+        """
+        Args:
+            path: Snapshot file written by write_snapshot
+            promotions: Mapping of promotion name to Promotion
+
+        Raises:
+            ValueError: If the file is not a snapshot or names an unknown
+                        promotion
+        """
+        self._file = open(path, "rb")
+        try:
+            if os.fstat(self._file.fileno()).st_size < HEADER.size:
+                raise ValueError(f"Not a catalog snapshot: {path}")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, count, promotion_count, total, strings = HEADER.unpack_from(self._map)
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError(f"Not a catalog snapshot: {path}")
+            tables_end = (HEADER.size + count * (RECORD.size + INDEX.size)
+                          + promotion_count * STRING_REF.size)
+            if not tables_end <= strings <= len(self._map):
+                raise ValueError(f"Truncated or corrupt catalog snapshot: {path}")
+            self._count = count
+            self._index_offset = HEADER.size + count * RECORD.size
+            self._strings = strings
+            promotions_offset = self._index_offset + count * INDEX.size
+            self._promotions = []
+            for number in range(promotion_count):
+                offset, length = STRING_REF.unpack_from(
+                    self._map, promotions_offset + number * STRING_REF.size)
+                name = self._string(offset, length)
+                if not promotions or name not in promotions:
+                    raise ValueError(f"Unknown promotion: {name}")
+                self._promotions.append(promotions[name])
+        except Exception:
+            self.close()
+            raise
+        self._total_quantity = total
+        self._products = {}
+        self._numbers = {}
+        self._lock = threading.RLock()
+        self._finalizer = weakref.finalize(self, _close_map, self._map, self._file)
+
+    def close(self):
+        """Unmap the file; materialized products stay usable."""
+        finalizer = getattr(self, "_finalizer", None)
+        if finalizer is not None:
+            finalizer()
+        else:
+            _close_map(getattr(self, "_map", None), self._file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _string(self, offset, length) -> str:
+        start = self._strings + offset
+        if start + length > len(self._map):
+            raise ValueError("Corrupt catalog snapshot: string out of range")
+        return self._map[start:start + length].decode("utf-8")
+
+    def _record(self, number):
+        return RECORD.unpack_from(self._map, HEADER.size + number * RECORD.size)
+
+    def _product_at(self, number) -> Product:
+        """Return the product of record `number`, building it on first access."""
+        item = self._products.get(number)
+        if item is not None:
+            return item
+        with self._lock:
+            item = self._products.get(number)
+            if item is not None:
+                return item
+            kind, active, promotion, offset, length, price, quantity, maximum = self._record(number)
+            cls = PRODUCT_TYPES[kind]
+            item = cls._from_trusted(self._string(offset, length), price, quantity, bool(active),
+                                     self._promotions[promotion] if promotion >= 0 else None)
+            if cls is LimitedProduct:
+                item.maximum = maximum
+            item._stores = weakref.WeakSet([self])
+            self._products[number] = item
+            self._numbers[item] = number
+            return item
+
+    def _is_active(self, number) -> bool:
+        item = self._products.get(number)
+        if item is not None:
+            return item.active
+        return bool(self._record(number)[1])
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, number) -> Product:
+        if not 0 <= number < self._count:
+            raise IndexError("Product number out of range")
+        return self._product_at(number)
+
+    @property
+    def product(self):
+        """Return all products in store order, read-only (materializes every product)."""
+        return tuple(self.iter_products(active_only=False))
+
+    def _product_changed(self, product, field, old, new):
+        """Follow a change pushed by a materialized product."""
+        if field == "quantity":
+            with self._lock:
+                self._total_quantity += new - old
+
+    def get_total_quantity(self) -> int:
+        """Return total quantity of all products in the store."""
+        return self._total_quantity
+
+    def get_product(self, name) -> Product:
+        """Return the first product with the given name, or None (binary search)."""
+        encoded = name.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._name_bytes(self._indexed(middle)) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count and self._name_bytes(self._indexed(low)) == encoded:
+            return self._product_at(self._indexed(low))
+        return None
+
+    def _indexed(self, position) -> int:
+        return INDEX.unpack_from(self._map, self._index_offset + position * INDEX.size)[0]
+
+    def _name_bytes(self, number) -> bytes:
+        _, _, _, offset, length, _, _, _ = self._record(number)
+        start = self._strings + offset
+        return self._map[start:start + length]
+
+    def __contains__(self, product):
+        """Check if a product (or a product name) is in the store."""
+        if isinstance(product, str):
+            return self.get_product(product) is not None
+        return product in self._numbers
+
+    def list_products(self, limit=50, cursor=None, active_only=True, predicate=None):
+        """Return one page of products and the next cursor, as Store.list_products."""
+        if limit <= 0:
+            raise ValueError("Page size must be positive")
+        page = []
+        number = 0 if cursor is None else cursor + 1
+        while number < self._count:
+            if not active_only or self._is_active(number):
+                item = self._product_at(number)
+                if predicate is None or predicate(item):
+                    page.append(item)
+                    if len(page) >= limit:
+                        return page, (number if number + 1 < self._count else None)
+            number += 1
+        return page, None
+
+    def iter_products(self, active_only=True, predicate=None, page_size=1024):
+        """Yield products lazily, in store order."""
+        cursor = None
+        while True:
+            page, cursor = self.list_products(page_size, cursor, active_only, predicate)
+            yield from page
+            if cursor is None:
+                return
+
+    def get_all_products(self):
+        """Return a list of all active products (materializes them)."""
+        return list(self.iter_products())
+
+    def place_order(self, shopping_list):
+        """Processes an order without raising or printing, as Store.place_order."""
+        return Store._place_order(shopping_list)
+
+    def order(self, shopping_list) -> float:
+        """Processes an order line by line, as Store.order."""
+        result = self.place_order(shopping_list)
+        for line in result.failed:
+            print(f"Could not buy {line.product.name}: {line.message}")
+        return result.total_price
+
+    def to_store(self) -> Store:
+        """Materialize every product into a regular Store."""
+        return Store(self.iter_products(active_only=False))
+
+
+def _close_map(snapshot_map, snapshot_file):
+    if snapshot_map is not None:
+        snapshot_map.close()
+    snapshot_file.close()
+
+
+def open_snapshot(path, promotions=None) -> MappedStore:
+    """Open a snapshot written by write_snapshot."""
+    return MappedStore(path, promotions)
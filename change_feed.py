@@ -0,0 +1,109 @@
+from collections import namedtuple
+
+Change = namedtuple("Change", "seq product name field old new")
+Change.__doc__ = """
+One inventory change. `field` is quantity, price, active or promotion, or
+added/removed (with old and new set to None), as for Store listeners.
+"""
+
+
+class FeedOverflow(Exception):
+    """A subscriber fell more than the feed's capacity behind and lost changes."""
+
+    def __init__(self, missed, resume_seq):
+        super().__init__(f"Subscriber missed {missed} changes; resuming at {resume_seq}")
+        self.missed = missed
+        self.resume_seq = resume_seq
+
+
+class ChangeFeed:
+    """
+    Change-data-capture feed for one Store.
+
+    Every change a Store listener sees (each setter firing on a product in
+    the store, and every add or remove) is written to a fixed ring buffer
+    under an increasing sequence number. Writers never wait for
+    subscribers: a slot is simply overwritten once the ring wraps.
+    Subscribers read without locks from their own cursor, in batches, and
+    check each entry's sequence number to detect overwrites; a subscriber
+    that falls behind by more than `capacity` gets FeedOverflow and should
+    resync (e.g. from Store.snapshot()) before polling on.
+    """
+
+    def __init__(self, store, capacity=65536):
+        if not isinstance(capacity, int) or capacity <= 0:
+            raise ValueError("Feed capacity must be a positive integer")
+        self.store = store
+        self.capacity = capacity
+        self._ring = [None] * capacity
+        # Sequence number of the next change; entries below it are published.
+        self._head = 1
+        store.add_listener(self._record)
+
+    def _record(self, product, field, old, new):
+        """Store listener. Stores call listeners under their lock, so there
+        is a single writer at a time."""
+        seq = self._head
+        self._ring[seq % self.capacity] = Change(seq, product, product.name, field, old, new)
+        self._head = seq + 1
+
+    @property
+    def head(self) -> int:
+        """Sequence number the next change will get."""
+        return self._head
+
+    def subscribe(self, from_start=False) -> "Subscription":
+        """
+        Start a subscriber at the next change, or at the oldest change still
+        in the ring when `from_start` is set.
+        """
+        head = self._head
+        start = max(head - self.capacity, 1) if from_start else head
+        return Subscription(self, start)
+
+    def close(self):
+        """Stop recording changes."""
+        self.store.remove_listener(self._record)
+
+
+class Subscription:
+    """One subscriber's position in a ChangeFeed."""
+
+    def __init__(self, feed, start):
+        self.feed = feed
+        self.next_seq = start
+
+    @property
+    def lag(self) -> int:
+        """Number of published changes not yet polled."""
+        return self.feed.head - self.next_seq
+
+    def poll(self, max_items=1024) -> list:
+        """
+        Return up to max_items changes in sequence order, possibly none.
+        Raises:
+            FeedOverflow: If changes were overwritten before being read; the
+            subscription then resumes at the oldest change still available.
+        """
+        feed = self.feed
+        ring, capacity = feed._ring, feed.capacity
+        head = feed._head
+        start = self.next_seq
+        oldest = head - capacity
+        if start < oldest:
+            self.next_seq = oldest
+            raise FeedOverflow(oldest - start, oldest)
+        end = min(head, start + max_items)
+        batch = [ring[seq % capacity] for seq in range(start, end)]
+        # A writer may have lapped us while copying; entries carry their
+        # sequence number, so an overwrite is visible here.
+        if batch and batch[0].seq != start:
+            oldest = feed._head - capacity
+            self.next_seq = oldest
+            raise FeedOverflow(oldest - start, oldest)
+        for offset, change in enumerate(batch):
+            if change.seq != start + offset:
+                batch = batch[:offset]
+                break
+        self.next_seq = start + len(batch)
+        return batch
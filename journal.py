@@ -0,0 +1,268 @@
+import json
+import os
+import threading
+import time
+
+from product import product_from_record
+from store import Store
+
+SNAPSHOT_FILE = "snapshot.json"
+LOG_FILE = "journal.log"
+
+
+class InventoryJournal:
+    """
+    Write-ahead journal of inventory changes for one Store.
+
+    Every quantity, price, active and promotion change (so every buy) and
+    every product added or removed is appended to journal.log as one JSON
+    line with an increasing sequence number. Values are absolute, so
+    replaying a record twice is harmless. Products are identified by their
+    slot in the store, which stays stable while the product is in it, so
+    products sharing a name are told apart.
+
+    Records are group committed: writers only append to an in-memory
+    buffer, and a background thread writes and fsyncs the buffer every
+    `flush_interval` seconds, or as soon as records arrive with
+    `flush_interval=0`. Writers never wait for the disk; call flush() to
+    wait until everything recorded so far is durable. snapshot() writes the
+    whole store to snapshot.json and truncates the log; one is taken when
+    the journal is attached.
+    """
+
+    def __init__(self, store, directory, flush_interval=0.005, fsync=True, snapshot_every=None):
+        """
+        Args:
+            store: The Store to journal
+            directory: Directory for snapshot.json and journal.log
+            flush_interval: Seconds between group commits (0 = as soon as
+                            records arrive)
+            fsync: Whether each group commit is fsynced to disk
+            snapshot_every: Take a snapshot after this many records, or None
+        """
+        if flush_interval < 0:
+            raise ValueError("Flush interval must be a non negative number")
+        self.store = store
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.snapshot_every = snapshot_every
+        self.records = 0
+        self.flushes = 0
+        self.snapshots = 0
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._buffer = []
+        # Slots of each journaled product, mirroring the store's own, so a
+        # removal can name the slot that was removed.
+        self._ids = {}
+        self._since_snapshot = 0
+        self._seq = _read_last_seq(directory)
+        self._log = open(os.path.join(directory, LOG_FILE), "a", encoding="utf-8")
+        self._closed = threading.Event()
+        self._pending = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+        # The directory starts out matching the store, whatever it held before.
+        self.snapshot()
+        store.add_listener(self._record)
+
+    def _record(self, product, field, old, new):
+        """
+        Store listener: append one change to the buffer. Stores call
+        listeners under their lock, so changes arrive one at a time.
+        """
+        ids = self._ids.get(product)
+        if field == "added":
+            value = product.to_record()
+            if ids:
+                value = {"same_as": ids[0]}
+            else:
+                ids = self._ids[product] = []
+            ids.append(self.store._slots[product][-1])
+            slot = ids[-1]
+        elif field == "removed":
+            value = None
+            slot = ids.pop(0)
+            if not ids:
+                del self._ids[product]
+        else:
+            value = (new.name if new else None) if field == "promotion" else new
+            slot = ids[0]
+        with self._lock:
+            self._seq += 1
+            line = json.dumps({"seq": self._seq, "id": slot, "name": product.name,
+                               "field": field, "value": value})
+            self._buffer.append(line)
+            self.records += 1
+            self._since_snapshot += 1
+        if self.flush_interval == 0:
+            self._pending.set()
+
+    def _flush_loop(self):
+        while not self._closed.is_set():
+            if self.flush_interval > 0:
+                self._closed.wait(self.flush_interval)
+            else:
+                self._pending.wait()
+                self._pending.clear()
+            self.flush()
+
+    def flush(self):
+        """
+        Write buffered records to the log (and fsync if enabled), or take a
+        snapshot instead once `snapshot_every` records have accumulated.
+        """
+        with self._io_lock:
+            if self.snapshot_every and self._since_snapshot >= self.snapshot_every:
+                self._write_snapshot()
+                return
+            with self._lock:
+                lines, self._buffer = self._buffer, []
+            if not lines:
+                return
+            self._log.write("\n".join(lines) + "\n")
+            self._log.flush()
+            if self.fsync:
+                os.fsync(self._log.fileno())
+            self.flushes += 1
+
+    def snapshot(self):
+        """Write the whole store to snapshot.json and truncate the log."""
+        with self._io_lock:
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        """Write the snapshot; the caller holds the I/O lock."""
+        # The store lock keeps listeners out while the store is read.
+        with self.store._lock, self._lock:
+            # Records still buffered are covered by the snapshot.
+            self._buffer = []
+            self._since_snapshot = 0
+            seq = self._seq
+            self._ids = {}
+            products = []
+            for slot, item in self.store._products.items():
+                ids = self._ids.setdefault(item, [])
+                record = {"same_as": ids[0]} if ids else item.to_record()
+                record["id"] = slot
+                ids.append(slot)
+                products.append(record)
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as snapshot_file:
+            json.dump({"seq": seq, "products": products}, snapshot_file)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(temp_path, path)
+        self._log.truncate(0)
+        self._log.seek(0)
+        self.snapshots += 1
+
+    def close(self):
+        """Flush outstanding records and stop journaling the store."""
+        self._closed.set()
+        self._pending.set()
+        self._flusher.join()
+        self.store.remove_listener(self._record)
+        self.flush()
+        self._log.close()
+
+
+def _read_last_seq(directory) -> int:
+    """Return the last sequence number found in the snapshot or log."""
+    seq = 0
+    snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+    if os.path.exists(snapshot_path):
+        with open(snapshot_path, encoding="utf-8") as snapshot_file:
+            seq = json.load(snapshot_file)["seq"]
+    for record in _read_log(directory):
+        seq = max(seq, record["seq"])
+    return seq
+
+
+def _read_log(directory):
+    path = os.path.join(directory, LOG_FILE)
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as log_file:
+        for line in log_file:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # A torn last line from a crash mid-write is ignored.
+                return
+
+
+def recover(directory, promotions=None):
+    """
+    Rebuild a Store from the latest snapshot plus the log tail.
+
+    Args:
+        directory: Directory written by an InventoryJournal
+        promotions: Mapping of promotion name to Promotion, used to
+                    re-attach promotions by name
+
+    Returns:
+        tuple: (Store, info) where info has the recovery time in seconds,
+        the number of products loaded from the snapshot and the number of
+        log records replayed.
+    """
+    promotions = promotions or {}
+    started = time.perf_counter()
+    seq = 0
+    # Journal slot -> recovered product.
+    ids = {}
+    products = []
+    snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+    if os.path.exists(snapshot_path):
+        with open(snapshot_path, encoding="utf-8") as snapshot_file:
+            snapshot = json.load(snapshot_file)
+        seq = snapshot["seq"]
+        for record in snapshot["products"]:
+            item = _product_for(record, ids, promotions)
+            ids[record["id"]] = item
+            products.append(item)
+    store = Store(products)
+    replayed = 0
+    for record in _read_log(directory):
+        if record["seq"] <= seq:
+            continue
+        _replay(store, ids, record, promotions)
+        replayed += 1
+    info = {
+        "seconds": time.perf_counter() - started,
+        "snapshot_products": len(products),
+        "replayed": replayed,
+    }
+    return store, info
+
+
+def _product_for(record, ids, promotions):
+    """Return the product a snapshot or "added" record describes."""
+    if "same_as" in record:
+        return ids[record["same_as"]]
+    return product_from_record(record, promotions)
+
+
+def _replay(store, ids, record, promotions):
+    field, value, slot = record["field"], record["value"], record["id"]
+    if field == "added":
+        item = ids[slot] = _product_for(value, ids, promotions)
+        store.add_product(item)
+        return
+    item = ids.get(slot)
+    if item is None:
+        return
+    if field == "removed":
+        del ids[slot]
+        store.remove_product(item)
+    elif field == "quantity":
+        item.quantity = value
+    elif field == "price":
+        item.price = value
+    elif field == "active":
+        item.active = value
+    elif field == "promotion":
+        item.promotion = promotions.get(value) if value else None
@@ -0,0 +1,119 @@
+"""
+Load generator for server.py.
+
+Opens keep-alive connections, pipelines a mix of listing, search, quote and
+order requests on each, and reports requests/s and latency percentiles.
+
+Usage:
+    python loadgen.py --port 8080 --connections 32 --requests 20000 --pipeline 4
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from benchmark import percentile
+
+DEFAULT_MIX = [
+    ("GET", "/products?limit=20", None),
+    ("GET", "/search?q=pro&limit=10", None),
+    ("POST", "/quote", {"lines": [{"name": "MacBook Air M2", "quantity": 3}]}),
+    ("POST", "/order", {"lines": [{"name": "Python E‑Book", "quantity": 1}]}),
+]
+
+
+def _encode(method, path, payload, host) -> bytes:
+    body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+    head = f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(body)}\r\n"
+    if body:
+        head += "Content-Type: application/json\r\n"
+    return (head + "\r\n").encode("latin-1") + body
+
+
+async def _read_response(reader) -> int:
+    """Read one response and return its status code."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Server closed the connection")
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def _client(host, port, count, pipeline, mix, rng, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        sent = 0
+        while sent < count:
+            batch = min(pipeline, count - sent)
+            writer.write(b"".join(_encode(*rng.choice(mix), host) for _ in range(batch)))
+            started = time.perf_counter()
+            await writer.drain()
+            for _ in range(batch):
+                status = await _read_response(reader)
+                latencies.append(time.perf_counter() - started)
+                statuses[status] = statuses.get(status, 0) + 1
+            sent += batch
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def run_load(host="127.0.0.1", port=8080, connections=32, requests=10_000, pipeline=1,
+                   mix=None, seed=0) -> dict:
+    """
+    Send `requests` requests over `connections` keep-alive connections,
+    `pipeline` at a time on each, and return throughput and latencies.
+    """
+    if connections <= 0 or requests <= 0 or pipeline <= 0:
+        raise ValueError("Connections, requests and pipeline depth must be positive")
+    mix = mix or DEFAULT_MIX
+    rng = random.Random(seed)
+    latencies, statuses = [], {}
+    per_client = [requests // connections + (i < requests % connections)
+                  for i in range(connections)]
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _client(host, port, count, pipeline, mix, rng, latencies, statuses)
+        for count in per_client if count
+    ))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "requests_per_sec": len(latencies) / elapsed if elapsed else float("inf"),
+        "p50_ms": percentile(latencies, 0.50) * 1e3,
+        "p99_ms": percentile(latencies, 0.99) * 1e3,
+        "statuses": statuses,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--pipeline", type=int, default=1, help="requests in flight per connection")
+    args = parser.parse_args(argv)
+
+    stats = asyncio.run(run_load(args.host, args.port, args.connections, args.requests,
+                                 args.pipeline))
+    print(f"{stats['requests']} requests, {stats['requests_per_sec']:.0f} req/s, "
+          f"p50 {stats['p50_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms")
+    print("statuses: " + ", ".join(f"{status}: {count}" for status, count
+                                   in sorted(stats["statuses"].items())))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,22 +2,50 @@ from product import Product, LimitedProduct, NonStockedProduct
 from store import Store
 from promotion import SecondHalfPrice, ThirdOneFree, PercentDiscount
 
+SEARCH_PAGE_SIZE = 20
+
+
+def print_numbered(products, start=0):
+    """Print products as a numbered list in a single write."""
+    lines = [
+        f"{start + i + 1}. {product.name}, Price: {product.price}, Quantity: {product.get_quantity()}"
+        for i, product in enumerate(products)
+    ]
+    print("-----\n" + "\n".join(lines) + "\n-----")
+
+
+def browse_products(store: Store):
+    """Show active products one page at a time; return every product shown."""
+    shown = []
+    cursor = None
+    while True:
+        page, cursor = store.list_products(SEARCH_PAGE_SIZE, cursor)
+        if page:
+            print_numbered(page, len(shown))
+            shown.extend(page)
+        if cursor is None:
+            return shown
+        if input("Press Enter for more products, or 'q' to choose: ").strip().lower() == "q":
+            return shown
+
+
 def make_order(store: Store):
     """Handles the process of creating an order and buying products."""
     shopping_list = []
-    products = store.get_all_products()
+    query = input("Search products by name (leave empty to list all): ").strip()
+    if query:
+        products = store.search(query, limit=SEARCH_PAGE_SIZE)
+        if not products:
+            print(f"No active products matching '{query}'")
+            return
+        print_numbered(products)
+    else:
+        products = browse_products(store)
 
     if not products:
         print("No active products in the store")
         return
 
-    print("-----")
-    for i, product in enumerate(products):
-        print(
-            f"{i + 1}. {product.name}, Price: {product.price}, Quantity: {product.get_quantity()}"
-        )
-    print("-----")
-
     while True:
         print("When you want to finish order, enter empty text.")
         item = input("Which product # do you want? ")
@@ -67,8 +95,7 @@ def start(store: Store):
 
         if choice == "1":
             print("-----")
-            for products in store.get_all_products():
-                products.show()
+            store.write_listing()
             print("-----")
         elif choice == "2":
             print(f"Total of {store.get_total_quantity()} items in store")
@@ -81,7 +108,8 @@ def start(store: Store):
             print("Invalid choice. Please enter 1-4.")
 
 
-def main():
+def demo_store() -> Store:
+    """Build the sample store used by the CLI and the HTTP server."""
     bose = Product("Bose Headphones", 250, 500)
     mac = Product("MacBook Air M2", 1450, 100)
     cable = Product("USB-C Cable", 10, 200)
@@ -93,8 +121,11 @@ def main():
     bose.set_promotion(second_half_price)
     mac.set_promotion(third_one_free)
     ebook.set_promotion(thirty_percent)
-    store = Store([bose, mac, cable, ebook, ps5])
-    start(store)
+    return Store([bose, mac, cable, ebook, ps5])
+
+
+def main():
+    start(demo_store())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,197 @@
+"""
+Hot-path instrumentation for Store and Product.
+
+Instrumentation is off by default; while it is off the hot paths only pay
+for one module attribute check. Turn it on with enable(), read it with
+snapshot(), and export it with to_prometheus() or to_json().
+"""
+import cProfile
+import json
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Upper bounds of the latency buckets, in seconds.
+BUCKETS = (
+    1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+    1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0,
+)
+
+enabled = False
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_profiler = None
+_profile_rate = 0.0
+
+
+def enable():
+    """Start collecting metrics."""
+    global enabled
+    enabled = True
+
+
+def disable():
+    """Stop collecting metrics; collected values are kept."""
+    global enabled
+    enabled = False
+
+
+def reset():
+    """Drop all collected metrics."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def inc(name, labels=(), amount=1):
+    """Add to a counter. `labels` is a tuple of (key, value) pairs."""
+    key = (name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, seconds, labels=()):
+    """Record one latency sample in a histogram."""
+    key = (name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * (len(BUCKETS) + 1), 0, 0.0]
+        buckets = histogram[0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                buckets[i] += 1
+                break
+        else:
+            buckets[-1] += 1
+        histogram[1] += 1
+        histogram[2] += seconds
+
+
+def failure_reason(error) -> str:
+    """Short reason code for a failed purchase."""
+    reason = getattr(error, "reason", None)
+    if reason:
+        return reason
+    if isinstance(error, ValueError):
+        return "invalid_quantity"
+    return "other"
+
+
+def call(name, function, *args, labels=()):
+    """
+    Run function(*args), counting and timing it under `name`.
+    Failures are counted by reason and re-raised.
+    """
+    started = time.perf_counter()
+    try:
+        return function(*args)
+    except Exception as e:
+        inc(f"{name}_failures_total", labels + (("reason", failure_reason(e)),))
+        raise
+    finally:
+        observe(f"{name}_seconds", time.perf_counter() - started, labels)
+        inc(f"{name}_total", labels)
+
+
+def set_profiler(hook, sample_rate=0.01):
+    """
+    Profile a sample of orders.
+
+    Args:
+        hook: Callable taking the shopping list and returning a context
+              manager that wraps the order (see cprofile_hook), or None
+              to stop profiling
+        sample_rate: Fraction of orders to profile, between 0 and 1
+    """
+    global _profiler, _profile_rate
+    if not 0 <= sample_rate <= 1:
+        raise ValueError("Sample rate must be between 0 and 1")
+    _profiler = hook
+    _profile_rate = sample_rate
+
+
+def profile_order(shopping_list):
+    """Return the profiler context for an order, or a no-op context."""
+    if _profiler is None or random.random() >= _profile_rate:
+        return nullcontext()
+    return _profiler(shopping_list)
+
+
+def cprofile_hook(results):
+    """
+    Build a profiler hook that runs sampled orders under cProfile and
+    appends (shopping_list, pstats.Stats) to `results`.
+    """
+
+    @contextmanager
+    def hook(shopping_list):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            results.append((shopping_list, pstats.Stats(profiler)))
+
+    return hook
+
+
+def snapshot() -> dict:
+    """Return all counters and histograms as plain data."""
+    with _lock:
+        counters = [
+            {"name": name, "labels": dict(labels), "value": value}
+            for (name, labels), value in sorted(_counters.items())
+        ]
+        histograms = [
+            {
+                "name": name,
+                "labels": dict(labels),
+                "buckets": dict(zip([*map(str, BUCKETS), "+Inf"], buckets)),
+                "count": count,
+                "sum": total,
+            }
+            for (name, labels), (buckets, count, total) in sorted(_histograms.items())
+        ]
+    return {"counters": counters, "histograms": histograms}
+
+
+def to_json() -> str:
+    """Export the snapshot as JSON."""
+    return json.dumps(snapshot())
+
+
+def _label_text(labels, extra=None):
+    pairs = list(labels.items()) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+def to_prometheus(prefix="bestbuy_") -> str:
+    """Export the snapshot in the Prometheus text exposition format."""
+    data = snapshot()
+    lines = []
+    typed = set()
+    for counter in data["counters"]:
+        name = prefix + counter["name"]
+        if name not in typed:
+            lines.append(f"# TYPE {name} counter")
+            typed.add(name)
+        lines.append(f"{name}{_label_text(counter['labels'])} {counter['value']}")
+    for histogram in data["histograms"]:
+        name = prefix + histogram["name"]
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        cumulative = 0
+        for bound, count in histogram["buckets"].items():
+            cumulative += count
+            lines.append(f"{name}_bucket{_label_text(histogram['labels'], ('le', bound))} {cumulative}")
+        lines.append(f"{name}_count{_label_text(histogram['labels'])} {histogram['count']}")
+        lines.append(f"{name}_sum{_label_text(histogram['labels'])} {histogram['sum']}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,71 @@
+class LineResult:
+    """Outcome of one order line."""
+
+    __slots__ = ("product", "quantity", "reason", "unit_price", "total_price", "promotion",
+                 "error")
+
+    def __init__(self, product, quantity, reason=None, unit_price=None, total_price=0,
+                 promotion=None, error=None):
+        """
+        Args:
+            product: The Product ordered
+            quantity: The quantity asked for
+            reason: None if the line was bought, else a reason code
+                    (invalid_quantity, inactive, insufficient_stock,
+                    over_maximum, pricing_error)
+            unit_price: Unit price the line was charged at, before promotion
+            total_price: Amount charged for the line, promotion applied
+            promotion: The Promotion applied, if any
+            error: The exception raised while pricing, for pricing_error
+        """
+        self.product = product
+        self.quantity = quantity
+        self.reason = reason
+        self.unit_price = unit_price
+        self.total_price = total_price
+        self.promotion = promotion
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.reason is None
+
+    @property
+    def status(self) -> str:
+        return "ok" if self.reason is None else "failed"
+
+    @property
+    def message(self) -> str:
+        """Human-readable failure message, as raised by Product.buy."""
+        if self.reason is None:
+            return ""
+        if self.error is not None:
+            return str(self.error)
+        return str(self.product._purchase_error(self.reason))
+
+    def __repr__(self):
+        return (f"LineResult({self.product.name!r}, {self.quantity}, {self.status}"
+                f"{'' if self.reason is None else ', ' + self.reason})")
+
+
+class OrderResult:
+    """Per-line outcome of an order and the total charged."""
+
+    __slots__ = ("lines", "total_price")
+
+    def __init__(self, lines, total_price):
+        self.lines = lines
+        self.total_price = total_price
+
+    @property
+    def ok(self) -> bool:
+        """True if every line was bought."""
+        return all(line.reason is None for line in self.lines)
+
+    @property
+    def failed(self) -> list:
+        """The lines that were not bought."""
+        return [line for line in self.lines if line.reason is not None]
+
+    def __repr__(self):
+        return f"OrderResult({len(self.lines)} lines, {len(self.failed)} failed, {self.total_price})"
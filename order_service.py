@@ -0,0 +1,155 @@
+import asyncio
+
+from product import Product, lock_products
+
+
+class AsyncOrderService:
+    """
+    Micro-batching order front end for asyncio callers.
+
+    Orders submitted while a batch is being collected are applied together:
+    the locks of every product in the batch are taken once, each order is
+    reserved against the stock left by the orders before it, and stock is
+    then taken with one update per product. Every caller still gets its own
+    total or exception. Batches are applied on the loop's default executor,
+    so waiting for product locks never blocks the event loop.
+    """
+
+    def __init__(self, store, max_batch_size=64, batch_window=0.002, max_pending=1024):
+        """
+        Args:
+            store: The Store whose products are ordered
+            max_batch_size: Most orders applied in one batch
+            batch_window: Seconds to wait for more orders after the first
+            max_pending: Queue size; submit() waits while the queue is full
+        """
+        if not isinstance(max_batch_size, int) or max_batch_size <= 0:
+            raise ValueError("Batch size must be a positive integer")
+        if batch_window < 0:
+            raise ValueError("Batch window must be a non negative number")
+        self.store = store
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self.max_pending = max_pending
+        self.batches = 0
+        self.orders = 0
+        self._loop = None
+        self._queue = None
+        self._worker = None
+
+    def _ensure_worker(self):
+        """Start the batching task on the running loop if needed."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, shopping_list) -> float:
+        """
+        Queue an order and wait for its result.
+        Raises:
+            ValueError: If a line is not a (product, quantity) pair of a
+                        Product and a quantity; the order is not queued
+        """
+        lines = []
+        for line in shopping_list:
+            try:
+                products, quantity = line
+            except (TypeError, ValueError):
+                raise ValueError(f"Order line must be a (product, quantity) pair: {line!r}") from None
+            if not isinstance(products, Product):
+                raise ValueError(f"Order line must name a Product: {products!r}")
+            lines.append((products, quantity))
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((lines, future))
+        return await future
+
+    def close(self):
+        """Stop the batching task. Orders still queued are cancelled."""
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                if not future.done():
+                    future.cancel()
+        self._worker = None
+
+    async def _run(self):
+        queue = self._queue
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            try:
+                self._drain(queue, batch)
+                if len(batch) < self.max_batch_size and self.batch_window > 0:
+                    await asyncio.sleep(self.batch_window)
+                    self._drain(queue, batch)
+                batch = [(shopping_list, future) for shopping_list, future in batch
+                         if not future.done()]
+                applied = loop.run_in_executor(None, self._apply, batch)
+            except BaseException:
+                # Taken off the queue but never applied: nobody else will
+                # resolve these callers.
+                for _, future in batch:
+                    if not future.done():
+                        future.cancel()
+                raise
+            # The callback resolves the callers even if this task is
+            # cancelled while the batch is still being applied.
+            applied.add_done_callback(lambda done, batch=batch: self._resolve(batch, done))
+            await asyncio.wait([applied])
+
+    def _drain(self, queue, batch):
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(queue.get_nowait())
+            except asyncio.QueueEmpty:
+                return
+
+    def _apply(self, batch) -> list:
+        """
+        Apply a batch of orders in one pass over the affected products.
+        Runs on an executor thread; returns (future, total_price, error) for
+        every order, to be resolved on the loop.
+        """
+        products = [products for shopping_list, _ in batch
+                    for products, _ in shopping_list]
+        results = []
+        try:
+            with lock_products(products):
+                reserved = {}
+                for shopping_list, future in batch:
+                    try:
+                        total_price = self.store._reserve_order(shopping_list, reserved)
+                    except Exception as e:
+                        results.append((future, None, e))
+                    else:
+                        results.append((future, total_price, None))
+                self.store._commit_reserved(reserved)
+        except Exception as e:
+            results = [(future, None, e) for _, future in batch]
+        self.batches += 1
+        self.orders += len(batch)
+        return results
+
+    @staticmethod
+    def _resolve(batch, applied):
+        """Hand every caller of an applied batch its total or exception."""
+        if applied.cancelled():
+            for _, future in batch:
+                future.cancel()
+            return
+        if applied.exception() is not None:
+            results = [(future, None, applied.exception()) for _, future in batch]
+        else:
+            results = applied.result()
+        for future, total_price, error in results:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(total_price)
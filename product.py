@@ -1,4 +1,140 @@
+import itertools
+import threading
+from contextlib import ExitStack, contextmanager
+
+import numpy as np
+
+import metrics
+import quote_cache
+from promotion import Promotion, PromotionStack
+
+# LimitedProducts with a maximum up to this size get a precomputed price table.
+PRICE_TABLE_LIMIT = 4096
+
+# Global lock ranks: multi-product operations acquire product locks in rank
+# order, so two orders over the same products can never deadlock.
+_lock_ranks = itertools.count()
+
+
+class _WriteState(threading.local):
+    """
+    Writes open on this thread. Stores queue snapshot versions until the
+    outermost write ends, so a version never shows part of an order, or a
+    product sold out but still active. Callbacks that must not run under
+    product or store locks wait until the thread releases the last of them.
+    """
+    depth = 0
+    # Store -> slots changed by the open write.
+    pending = None
+    # Lock scopes open, and the calls queued until they are all closed.
+    locked = 0
+    unlocked_calls = None
+
+
+_writes = _WriteState()
+
+
+class PurchaseError(Exception):
+    """A purchase that cannot be made; `reason` is a short machine-readable code."""
+
+    def __init__(self, message, reason):
+        super().__init__(message)
+        self.reason = reason
+
+    def __reduce__(self):
+        return (PurchaseError, (self.args[0], self.reason))
+
+
+def _has_compile(promotion) -> bool:
+    """Whether a promotion prices from the unit price alone (overrides compile)."""
+    if isinstance(promotion, PromotionStack):
+        return all(_has_compile(member) for member in promotion.promotions)
+    return type(promotion).compile is not Promotion.compile
+
+
+def _has_batch(promotion) -> bool:
+    """Whether a promotion prices lines from unit prices alone (overrides apply_promotion_batch)."""
+    if isinstance(promotion, PromotionStack):
+        return all(_has_batch(member) for member in promotion.promotions)
+    return type(promotion).apply_promotion_batch is not Promotion.apply_promotion_batch
+
+
+def _begin_write():
+    _writes.depth += 1
+
+
+def _end_write():
+    """Close a write; the outermost one publishes the versions it queued."""
+    writes = _writes
+    writes.depth -= 1
+    if writes.depth == 0 and writes.pending:
+        pending, writes.pending = writes.pending, None
+        for store, slots in pending.items():
+            store._publish(slots)
+
+
+def _enter_locked():
+    _writes.locked += 1
+
+
+def _exit_locked():
+    """Close a lock scope; the outermost one runs the calls queued under it."""
+    writes = _writes
+    writes.locked -= 1
+    if writes.locked == 0 and writes.unlocked_calls:
+        calls, writes.unlocked_calls = writes.unlocked_calls, None
+        for call, args in calls:
+            call(*args)
+
+
+def _call_unlocked(call, *args) -> bool:
+    """Queue a call until this thread's lock scopes close; False if none is open."""
+    writes = _writes
+    if not writes.locked:
+        return False
+    if writes.unlocked_calls is None:
+        writes.unlocked_calls = []
+    writes.unlocked_calls.append((call, args))
+    return True
+
+
+def _defer_publish(store, slots) -> bool:
+    """Queue changed slots until this thread's write ends; False if none is open."""
+    if not _writes.depth:
+        return False
+    pending = _writes.pending
+    if pending is None:
+        pending = _writes.pending = {}
+    pending.setdefault(store, set()).update(slots)
+    return True
+
+
+@contextmanager
+def lock_products(products):
+    """
+    Hold the locks of all given products, acquired in rank order, as one
+    write: snapshot versions are published before the locks are released,
+    and calls queued with _call_unlocked run after.
+    """
+    unique = {id(item): item for item in products}.values()
+    _enter_locked()
+    try:
+        with ExitStack() as stack:
+            for item in sorted(unique, key=lambda item: item._lock_rank):
+                stack.enter_context(item._lock)
+            _begin_write()
+            try:
+                yield
+            finally:
+                _end_write()
+    finally:
+        _exit_locked()
+
+
 class Product:
+    # Bumped by the price and promotion setters; part of every quote key.
+    _price_version = 0
+
     def __init__(self, name, price, quantity):
         if not isinstance(name, str) or name.strip() == "":
             raise ValueError("Name must be a non empty string")
@@ -11,6 +147,61 @@ class Product:
         self._quantity = quantity
         self._active = True
         self._promotion = None
+        self._init_shared_state()
+
+    @classmethod
+    def _from_trusted(cls, name, price, quantity, active=True, promotion=None):
+        """Build a product from already validated fields, skipping __init__."""
+        item = cls.__new__(cls)
+        item.name = name
+        item._price = price
+        item._quantity = quantity
+        item._active = active
+        item._promotion = promotion
+        item._init_shared_state()
+        return item
+
+    def _init_shared_state(self):
+        """Set up the state shared with stores and concurrent buyers."""
+        # Stores holding this product; they are told about every change so
+        # their running totals and indexes never need a full rescan. The
+        # WeakSet is created by the first store the product is added to.
+        self._stores = None
+        self._lock = threading.RLock()
+        self._lock_rank = next(_lock_ranks)
+        # Units set aside by open reservations; not available to buyers.
+        self._held = 0
+        # (price, promotion, pricing function), compiled on first purchase.
+        self._pricing = None
+
+    def to_record(self) -> dict:
+        """Return the product's data as a plain dict (see product_from_record)."""
+        return {
+            "type": "Product",
+            "name": self.name,
+            "price": self.price,
+            "quantity": self.quantity,
+            "active": bool(self.active),
+            "promotion": self.promotion.name if self.promotion else None,
+        }
+
+    def __getstate__(self):
+        """Pickle product data only; stores, locks, holds and caches are per process."""
+        state = self.__dict__.copy()
+        for key in ("_stores", "_lock", "_lock_rank", "_held", "_pricing"):
+            state.pop(key, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_shared_state()
+
+    def _notify(self, field, old, new):
+        """Push a field change to every store that contains this product."""
+        if not self._stores:
+            return
+        for store in list(self._stores):
+            store._product_changed(self, field, old, new)
 
     @property
     def quantity(self):
@@ -22,9 +213,24 @@ class Product:
         """Set quantity and deactivate product if it reaches 0."""
         if not isinstance(quantity, int) or quantity < 0:
             raise ValueError("Quantity must be a non negative number")
+        old_quantity = self._quantity
         self._quantity = quantity
-        if self._quantity == 0:
-            self.active = False
+        if quantity == 0 and self._active:
+            # One write, so no version shows a sold out product still active.
+            _begin_write()
+            try:
+                if quantity != old_quantity:
+                    self._notify("quantity", old_quantity, quantity)
+                self.active = False
+            finally:
+                _end_write()
+        elif quantity != old_quantity:
+            self._notify("quantity", old_quantity, quantity)
+
+    @property
+    def available(self):
+        """Quantity that is not held by open reservations."""
+        return max(self._quantity - self._held, 0)
 
     @property
     def price(self):
@@ -36,7 +242,11 @@ class Product:
         """Set price with validation."""
         if not isinstance(price, (int, float)) or price < 0:
             raise ValueError("Price must be a non negative number")
+        old_price = self._price
         self._price = float(price)
+        if self._price != old_price:
+            self._price_version += 1
+            self._notify("price", old_price, self._price)
 
     @property
     def active(self):
@@ -46,7 +256,10 @@ class Product:
     @active.setter
     def active(self, status):
         """Set active status."""
+        old_status = self._active
         self._active = status
+        if bool(status) != bool(old_status):
+            self._notify("active", old_status, status)
 
     @property
     def promotion(self):
@@ -56,7 +269,11 @@ class Product:
     @promotion.setter
     def promotion(self, promotion):
         """Set a promotion for the product."""
+        old_promotion = self._promotion
         self._promotion = promotion
+        if promotion is not old_promotion:
+            self._price_version += 1
+            self._notify("promotion", old_promotion, promotion)
 
     def get_quantity(self) -> int:
         """Return current quantity as int (kept for backward compatibility)."""
@@ -86,6 +303,13 @@ class Product:
         """Set a promotion (kept for backward compatibility)."""
         self.promotion = promotion
 
+    def add_promotion(self, promotion):
+        """Stack a promotion on top of the current one; it applies last."""
+        if self.promotion is None:
+            self.promotion = promotion
+        else:
+            self.promotion = PromotionStack([self.promotion, promotion])
+
     def __str__(self):
         """String representation of the product."""
         promotion_info = f", Promotion: {self.promotion.name}" if self.promotion else ""
@@ -107,6 +331,76 @@ class Product:
             return NotImplemented
         return self.price < other.price
 
+    def _purchase_problem(self, quantity, reserved=0):
+        """
+        Return the reason code why quantity cannot be bought on top of
+        `reserved` units that the caller has already set aside, or None if
+        it can. Has no side effects and raises nothing.
+        """
+        if not isinstance(quantity, int) or quantity <= 0:
+            return "invalid_quantity"
+        if not self.active:
+            return "inactive"
+        if quantity + reserved > self.quantity - self._held:
+            return "insufficient_stock"
+        return None
+
+    def _purchase_error(self, reason) -> Exception:
+        """Build the exception raised for a purchase reason code."""
+        if reason == "invalid_quantity":
+            return ValueError("Quantity must be a positive integer.")
+        if reason == "inactive":
+            return PurchaseError("Cannot buy: the product is not avaible.", reason)
+        return PurchaseError("Cannot buy: not enough stock avaible.", reason)
+
+    def _check_purchase(self, quantity, reserved=0):
+        """Raise if quantity cannot be bought on top of `reserved` units."""
+        reason = self._purchase_problem(quantity, reserved)
+        if reason is not None:
+            raise self._purchase_error(reason)
+
+    def _price_for(self, quantity) -> float:
+        """Return the total price for quantity, applying the promotion if any."""
+        price, promotion = self._price, self._promotion
+        pricing = self._pricing
+        if pricing is None or pricing[0] != price or pricing[1] is not promotion:
+            pricing = self._pricing = (price, promotion, self._compile_pricing(price, promotion))
+        if promotion and metrics.enabled:
+            return metrics.call("apply_promotion", pricing[2], quantity,
+                                labels=(("promotion", type(promotion).__name__),))
+        return pricing[2](quantity)
+
+    def _compile_pricing(self, price, promotion):
+        """Build the function pricing a quantity at this price and promotion."""
+        if not promotion:
+            return lambda quantity: quantity * price
+        if not _has_compile(promotion):
+            # apply_promotion may read any attribute, so it gets the product.
+            return lambda quantity: promotion.apply_promotion(self, quantity)
+        return promotion.compile(price)
+
+    def _commit_purchase(self, quantity):
+        """Take checked quantity out of stock."""
+        self.quantity = self.quantity - quantity
+
+    def quote(self, quantity, cache=None) -> float:
+        """
+        Return the total price of quantity, promotion applied, without buying.
+        Quotes are memoized in `cache` (quote_cache.default_cache by default);
+        price and promotion changes invalidate them.
+        Stock and active status are not checked.
+        """
+        if not isinstance(quantity, int) or quantity <= 0:
+            raise ValueError("Quantity must be a positive integer.")
+        if cache is None:
+            cache = quote_cache.default_cache
+        key = (self._lock_rank, self._price_version, self.promotion, quantity)
+        total_price = cache.get(key)
+        if total_price is None:
+            total_price = self._price_for(quantity)
+            cache.put(key, total_price)
+        return total_price
+
     def buy(self, quantity) -> float:
         """
         Buy a given quantity. Returns total price.
@@ -114,20 +408,21 @@ class Product:
         Raises Exception if product is inactive, quantity invalid,
                 or not enough stock.
         """
-        if not isinstance(quantity, int) or quantity <= 0:
-            raise ValueError("Quantity must be a positive integer.")
-        if not self.active:
-            raise Exception("Cannot buy: the product is not avaible.")
-        if quantity > self.quantity:
-            raise Exception("Cannot buy: not enough stock avaible.")
-
-        # Apply promotion if available, otherwise use regular price
-        if self.promotion:
-            total_price = self.promotion.apply_promotion(self, quantity)
-        else:
-            total_price = quantity * self.price
-
-        self.quantity = self.quantity - quantity
+        if metrics.enabled:
+            return metrics.call("buy", self._buy, quantity)
+        return self._buy(quantity)
+
+    def _buy(self, quantity) -> float:
+        # Check and decrement under the product lock so concurrent buyers
+        # cannot both pass the stock check and oversell.
+        _enter_locked()
+        try:
+            with self._lock:
+                self._check_purchase(quantity)
+                total_price = self._price_for(quantity)
+                self._commit_purchase(quantity)
+        finally:
+            _exit_locked()
         return total_price
 
 
@@ -145,22 +440,21 @@ class NonStockedProduct(Product):
         """Show non-stocked product info."""
         print(self)
 
-    def buy(self, quantity) -> float:
-        """
-        Buy non-stocked product (always available).
-        """
+    def to_record(self) -> dict:
+        record = super().to_record()
+        record["type"] = "NonStockedProduct"
+        return record
+
+    def _purchase_problem(self, quantity, reserved=0):
+        """Non-stocked products are always available while active."""
         if not isinstance(quantity, int) or quantity <= 0:
-            raise ValueError("Quantity must be a positive integer.")
+            return "invalid_quantity"
         if not self.active:
-            raise Exception("Cannot buy: the product is not avaible.")
-
-        # Apply promotion if available
-        if self.promotion:
-            total_price = self.promotion.apply_promotion(self, quantity)
-        else:
-            total_price = quantity * self.price
+            return "inactive"
+        return None
 
-        return total_price
+    def _commit_purchase(self, quantity):
+        """Non-stocked products have no stock to take."""
 
 
 class LimitedProduct(Product):
@@ -177,13 +471,71 @@ class LimitedProduct(Product):
         """Show limited product info."""
         print(self)
 
-    def buy(self, quantity) -> float:
+    def to_record(self) -> dict:
+        record = super().to_record()
+        record["type"] = "LimitedProduct"
+        record["maximum"] = self.maximum
+        return record
+
+    def _compile_pricing(self, price, promotion):
         """
-        Buy a given quantity with maximum limit enforcement.
-        Returns total price with promotion applied if available.
+        Precompute the price of every quantity up to the maximum, so that
+        promoted purchases are a table lookup.
         """
+        pricing = super()._compile_pricing(price, promotion)
+        if (not promotion or not _has_compile(promotion)
+                or not 0 < self.maximum <= PRICE_TABLE_LIMIT):
+            return pricing
+        quantities = np.arange(1, self.maximum + 1, dtype=np.int64)
+        table = [None] + promotion.apply_promotion_batch(
+            np.full(self.maximum, price, dtype=np.float64), quantities).tolist()
+        size = len(table)
+        return lambda quantity: table[quantity] if quantity < size else pricing(quantity)
+
+    def _purchase_problem(self, quantity, reserved=0):
+        """Enforce the maximum per purchase on top of the regular checks."""
         if not isinstance(quantity, int) or quantity <= 0:
-            raise ValueError("Quantity must be a positive integer.")
+            return "invalid_quantity"
         if quantity > self.maximum:
-            raise Exception(f"Cannot buy: maximum purchase limit is {self.maximum}.")
-        return super().buy(quantity)
+            return "over_maximum"
+        return super()._purchase_problem(quantity, reserved)
+
+    def _purchase_error(self, reason) -> Exception:
+        if reason == "over_maximum":
+            return PurchaseError(f"Cannot buy: maximum purchase limit is {self.maximum}.", reason)
+        return super()._purchase_error(reason)
+
+
+def product_from_record(record, promotions=None) -> Product:
+    """
+    Build a product from a dict made by Product.to_record().
+
+    Args:
+        record: Dict with type, name, price, quantity, active, promotion
+                (and maximum for LimitedProduct)
+        promotions: Optional mapping of promotion name to Promotion
+
+    Raises:
+        ValueError: If the type is unknown, a field is invalid or the
+                    promotion name is not in `promotions`
+    """
+    kind = record.get("type", "Product")
+    if kind == "Product":
+        item = Product(record["name"], record["price"], record["quantity"])
+    elif kind == "NonStockedProduct":
+        item = NonStockedProduct(record["name"], record["price"])
+    elif kind == "LimitedProduct":
+        maximum = record["maximum"]
+        if not isinstance(maximum, int) or isinstance(maximum, bool) or maximum <= 0:
+            raise ValueError("Maximum must be a positive integer")
+        item = LimitedProduct(record["name"], record["price"], record["quantity"],
+                              maximum=maximum)
+    else:
+        raise ValueError(f"Unknown product type: {kind}")
+    item._active = bool(record.get("active", True))
+    promotion_name = record.get("promotion")
+    if promotion_name:
+        if not promotions or promotion_name not in promotions:
+            raise ValueError(f"Unknown promotion: {promotion_name}")
+        item._promotion = promotions[promotion_name]
+    return item
@@ -1,9 +1,16 @@
 from abc import ABC, abstractmethod
+from types import SimpleNamespace
+
+import numpy as np
 
 
 class Promotion(ABC):
     """Abstract base class for promotions."""
 
+    # True when the total is proportional to the unit price, so a compiled
+    # function at price 1.0 prices any unit price by scaling.
+    scales_with_price = False
+
     def __init__(self, name):
         self.name = name
     @abstractmethod
@@ -20,10 +27,46 @@ class Promotion(ABC):
         """
         pass
 
+    def apply_promotion_batch(self, prices, quantities) -> np.ndarray:
+        """
+        Apply the promotion to many purchase lines at once.
+
+        The base implementation falls back to apply_promotion for each line;
+        the built-in promotions override it with a vectorized formula.
+
+        Args:
+            prices: Array of unit prices, one per line
+            quantities: Array of quantities, one per line
+
+        Returns:
+            np.ndarray: The discounted total price of each line
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        quantities = np.asarray(quantities, dtype=np.int64)
+        return np.array(
+            [self.apply_promotion(SimpleNamespace(price=float(price)), int(quantity))
+             for price, quantity in zip(prices, quantities)],
+            dtype=np.float64,
+        )
+
+    def compile(self, price):
+        """
+        Return a function pricing a quantity at the given unit price.
+
+        Products compile their promotion once per price and promotion
+        change instead of resolving it on every purchase. The base
+        implementation wraps apply_promotion; the built-in promotions
+        return closed-form functions.
+        """
+        product = SimpleNamespace(price=price)
+        return lambda quantity: self.apply_promotion(product, quantity)
+
 
 class PercentDiscount(Promotion):
     """Applies a percentage discount to the total price."""
 
+    scales_with_price = True
+
     def __init__(self, name, percent):
         """
         Initialize percentage discount promotion.
@@ -43,10 +86,26 @@ class PercentDiscount(Promotion):
         discount_amount = total_price * (self.percentage / 100)
         return total_price - discount_amount
 
+    def apply_promotion_batch(self, prices, quantities) -> np.ndarray:
+        """Apply percentage discount to every line."""
+        total_price = np.asarray(prices, dtype=np.float64) * np.asarray(quantities, dtype=np.int64)
+        return total_price - total_price * (self.percentage / 100)
+
+    def compile(self, price):
+        rate = self.percentage / 100
+
+        def percent_discount(quantity):
+            total_price = price * quantity
+            return total_price - total_price * rate
+
+        return percent_discount
+
 
 class SecondHalfPrice(Promotion):
     """Second item at half price promotion."""
 
+    scales_with_price = True
+
     def __init__(self, name):
         super().__init__(name)
 
@@ -62,10 +121,24 @@ class SecondHalfPrice(Promotion):
         )
         return total_price
 
+    def apply_promotion_batch(self, prices, quantities) -> np.ndarray:
+        """Apply second item at half price to every line."""
+        prices = np.asarray(prices, dtype=np.float64)
+        quantities = np.asarray(quantities, dtype=np.int64)
+        full_price_items = (quantities + 1) // 2
+        half_priced_items = quantities // 2
+        return (full_price_items * prices) + (half_priced_items * prices * 0.5)
+
+    def compile(self, price):
+        half_price = price * 0.5
+        return lambda quantity: ((quantity + 1) // 2 * price) + (quantity // 2 * half_price)
+
 
 class ThirdOneFree(Promotion):
     """Buy 2, get 1 free promotion."""
 
+    scales_with_price = True
+
     def __init__(self, name):
         super().__init__(name)
 
@@ -76,3 +149,84 @@ class ThirdOneFree(Promotion):
         """
         paid_items = quantity - (quantity // 3)
         return paid_items * product.price
+
+    def apply_promotion_batch(self, prices, quantities) -> np.ndarray:
+        """Apply buy 2 get 1 free to every line."""
+        quantities = np.asarray(quantities, dtype=np.int64)
+        paid_items = quantities - (quantities // 3)
+        return paid_items * np.asarray(prices, dtype=np.float64)
+
+    def compile(self, price):
+        return lambda quantity: (quantity - quantity // 3) * price
+
+
+class PromotionStack(Promotion):
+    """
+    Several promotions applied one after another.
+
+    Promotions apply in list order. Each one prices the quantity at the
+    average unit price left by the ones before it, so 30% off followed by
+    Third One Free charges 70% of the price for two items out of three.
+    The built-in promotions scale with the price, so their order does not
+    change the total; it can for custom promotions.
+    """
+
+    def __init__(self, promotions, name=None):
+        """
+        Args:
+            promotions: Promotions in order of application; nested stacks
+                        are flattened
+            name: Name of the stack; defaults to the joined names
+        """
+        flat = []
+        for promotion in promotions:
+            flat.extend(promotion.promotions if isinstance(promotion, PromotionStack) else [promotion])
+        if not flat:
+            raise ValueError("A promotion stack needs at least one promotion")
+        super().__init__(name or " + ".join(promotion.name for promotion in flat))
+        self.promotions = tuple(flat)
+        self.scales_with_price = all(promotion.scales_with_price for promotion in flat)
+
+    def apply_promotion(self, product, quantity) -> float:
+        total_price = self.promotions[0].apply_promotion(product, quantity)
+        for promotion in self.promotions[1:]:
+            total_price = promotion.apply_promotion(
+                SimpleNamespace(price=total_price / quantity), quantity)
+        return total_price
+
+    def apply_promotion_batch(self, prices, quantities) -> np.ndarray:
+        quantities = np.asarray(quantities, dtype=np.int64)
+        total_price = self.promotions[0].apply_promotion_batch(prices, quantities)
+        for promotion in self.promotions[1:]:
+            total_price = promotion.apply_promotion_batch(total_price / quantities, quantities)
+        return total_price
+
+    def compile(self, price):
+        """
+        Chain the members' compiled functions.
+
+        Members after the first see a unit price that depends on the
+        quantity; those that scale with the price are compiled once at
+        1.0 and scaled, the others are compiled per call. Stacks holding a
+        promotion without its own compile use the generic path.
+        """
+        if any(type(promotion).compile is Promotion.compile for promotion in self.promotions):
+            return super().compile(price)
+        first = self.promotions[0].compile(price)
+        stages = []
+        for promotion in self.promotions[1:]:
+            if promotion.scales_with_price:
+                unit = promotion.compile(1.0)
+                stages.append(lambda total_price, quantity, unit=unit:
+                              total_price / quantity * unit(quantity))
+            else:
+                stages.append(lambda total_price, quantity, promotion=promotion:
+                              promotion.compile(total_price / quantity)(quantity))
+
+        def stacked(quantity):
+            total_price = first(quantity)
+            for stage in stages:
+                total_price = stage(total_price, quantity)
+            return total_price
+
+        return stacked
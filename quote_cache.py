@@ -0,0 +1,80 @@
+import threading
+from collections import OrderedDict
+
+
+class QuoteCache:
+    """
+    Bounded LRU cache of price quotes.
+
+    Keys are built by Product.quote from the product, its price version,
+    its promotion and the quantity. The product's price and promotion
+    setters bump the price version, so stale quotes are never returned;
+    they simply age out of the cache.
+    """
+
+    def __init__(self, maxsize=65536):
+        if not isinstance(maxsize, int) or maxsize < 0:
+            raise ValueError("Cache size must be a non negative integer")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached quote for key, or None on a miss."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Cache a quote, evicting the least recently used ones if full."""
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def resize(self, maxsize):
+        """Change the cache size, evicting entries if it shrinks."""
+        if not isinstance(maxsize, int) or maxsize < 0:
+            raise ValueError("Cache size must be a non negative integer")
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._entries) > maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all cached quotes and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counts, size and hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+default_cache = QuoteCache()
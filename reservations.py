@@ -0,0 +1,151 @@
+import heapq
+import itertools
+import threading
+import time
+import weakref
+
+from product import lock_products
+
+
+class Reservation:
+    """Stock held for one shopping list until it is committed, released or expires."""
+
+    def __init__(self, reservation_id, lines, deadline):
+        self.id = reservation_id
+        self.lines = lines
+        self.deadline = deadline
+        self.state = "held"
+
+    def __repr__(self):
+        return f"Reservation({self.id}, {self.state}, {len(self.lines)} products)"
+
+
+class ReservationBook:
+    """
+    Open reservations of a store and their expiry.
+
+    Holds are counted on each product (Product.available leaves them out)
+    and purchase checks treat held units as sold. Deadlines sit in a heap:
+    reserving and expiring cost O(log n) whatever the number of open
+    reservations, and committed or released reservations are dropped from
+    the heap lazily when their deadline comes up. With `background` set, a
+    daemon thread sleeps until the earliest deadline and expires what is
+    due; expire() can also be called directly.
+    """
+
+    def __init__(self, clock=time.monotonic, background=True):
+        self._clock = clock
+        self._heap = []
+        self._open = {}
+        self._ids = itertools.count(1)
+        self._condition = threading.Condition()
+        self.expired = 0
+        if background:
+            threading.Thread(target=_expiry_loop, args=(weakref.ref(self), self._condition),
+                             daemon=True, name="reservation-expiry").start()
+
+    def __len__(self):
+        return len(self._open)
+
+    def reserve(self, lines, ttl) -> Reservation:
+        """
+        Hold stock for a coalesced order ({product: quantity}), all or nothing.
+        Raises:
+            Exception: If any product cannot be purchased; nothing is held.
+        """
+        if not isinstance(ttl, (int, float)) or ttl <= 0:
+            raise ValueError("Reservation ttl must be a positive number")
+        with lock_products(lines):
+            for products, quantity in lines.items():
+                products._check_purchase(quantity)
+            for products, quantity in lines.items():
+                products._held += quantity
+        reservation = Reservation(next(self._ids), lines, self._clock() + ttl)
+        with self._condition:
+            self._open[reservation.id] = reservation
+            heapq.heappush(self._heap, (reservation.deadline, reservation.id))
+            if self._heap[0][1] == reservation.id:
+                self._condition.notify()
+        return reservation
+
+    def _close(self, reservation, state) -> bool:
+        """Take a reservation out of the open set; False if it was not open."""
+        with self._condition:
+            if self._open.pop(reservation.id, None) is None:
+                return False
+            reservation.state = state
+            return True
+
+    @staticmethod
+    def _unhold(lines):
+        with lock_products(lines):
+            for products, quantity in lines.items():
+                products._held -= quantity
+
+    def commit(self, reservation, store) -> float:
+        """
+        Buy the held stock at current prices and close the reservation.
+        Raises:
+            ValueError: If the reservation is no longer held.
+            Exception: If the stock can no longer be bought (the product was
+            deactivated or its quantity lowered); the reservation is released.
+        """
+        if not self._close(reservation, "committed"):
+            raise ValueError(f"Reservation {reservation.id} is {reservation.state}")
+        lines = reservation.lines
+        with lock_products(lines):
+            for products, quantity in lines.items():
+                products._held -= quantity
+            try:
+                reserved = {}
+                total_price = store._reserve_order(lines.items(), reserved)
+            except Exception:
+                reservation.state = "released"
+                raise
+            store._commit_reserved(reserved)
+        return total_price
+
+    def release(self, reservation) -> bool:
+        """Return held stock. Returns False if the reservation was not held."""
+        if not self._close(reservation, "released"):
+            return False
+        self._unhold(reservation.lines)
+        return True
+
+    def expire(self, now=None) -> int:
+        """Release every reservation whose deadline has passed. Returns the count."""
+        now = self._clock() if now is None else now
+        due = []
+        with self._condition:
+            while self._heap and self._heap[0][0] <= now:
+                _, reservation_id = heapq.heappop(self._heap)
+                reservation = self._open.pop(reservation_id, None)
+                if reservation is not None:
+                    reservation.state = "expired"
+                    due.append(reservation)
+            self.expired += len(due)
+        for reservation in due:
+            self._unhold(reservation.lines)
+        return len(due)
+
+    def next_deadline(self):
+        """Clock time of the earliest pending deadline, or None."""
+        with self._condition:
+            return self._heap[0][0] if self._heap else None
+
+
+def _expiry_loop(book_ref, condition, idle_wait=1.0):
+    """Expire reservations on time; exits once the book is garbage collected."""
+    while True:
+        book = book_ref()
+        if book is None:
+            return
+        deadline = book.next_deadline()
+        delay = idle_wait if deadline is None else deadline - book._clock()
+        if delay <= 0:
+            book.expire()
+            del book
+            continue
+        del book
+        with condition:
+            condition.wait(min(delay, idle_wait))
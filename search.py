@@ -0,0 +1,160 @@
+import itertools
+import re
+
+from sortedcontainers import SortedList
+
+NGRAM = 3
+
+
+def _ngrams(text):
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+_WORD_START = re.compile(r" +(?=\S)")
+
+
+def _word_starts(name):
+    """Positions after the first where a word begins."""
+    return [match.end() for match in _WORD_START.finditer(name)]
+
+
+class SearchIndex:
+    """
+    Case-insensitive name index over products.
+
+    Prefix queries walk a sorted list of lowered names: all names sharing a
+    prefix are contiguous, which gives trie-like lookups with a flat,
+    compact structure. A second sorted list holds the tail of each name from
+    every later word start, for word prefix matches. Other substring
+    matches walk the shortest trigram posting of the query, in catalog
+    order, until the page is full; postings are built the first time they
+    are needed.
+    """
+
+    def __init__(self, items=()):
+        self._keys = {}
+        self._tiebreak = {}
+        self._counter = itertools.count()
+        self._postings = None
+        names, words = [], []
+        for item in items:
+            if item not in self._keys:
+                names_entry, word_entries = self._register(item)
+                names.append(names_entry)
+                words.extend(word_entries)
+        # Bulk construction sorts once instead of inserting one by one.
+        self._names = SortedList(names)
+        self._words = SortedList(words)
+
+    def _register(self, item):
+        name = item.name.lower()
+        tiebreak = next(self._counter)
+        self._keys[item] = name
+        self._tiebreak[item] = tiebreak
+        word_entries = [(name[start:], tiebreak, item) for start in _word_starts(name)]
+        return (name, tiebreak, item), word_entries
+
+    def add(self, item):
+        """Index a product under its current name."""
+        if item in self._keys:
+            return
+        names_entry, word_entries = self._register(item)
+        self._names.add(names_entry)
+        self._words.update(word_entries)
+        if self._postings is not None:
+            for gram in _ngrams(names_entry[0]):
+                self._postings.setdefault(gram, {})[item] = None
+
+    def remove(self, item):
+        """Drop a product from the index."""
+        name = self._keys.pop(item, None)
+        if name is None:
+            return
+        tiebreak = self._tiebreak.pop(item)
+        self._names.remove((name, tiebreak, item))
+        for start in _word_starts(name):
+            self._words.remove((name[start:], tiebreak, item))
+        if self._postings is not None:
+            for gram in _ngrams(name):
+                posting = self._postings[gram]
+                del posting[item]
+                if not posting:
+                    del self._postings[gram]
+
+    def __len__(self):
+        return len(self._keys)
+
+    @staticmethod
+    def _prefixed(entries, query):
+        for text, _, item in entries.irange((query,)):
+            if not text.startswith(query):
+                return
+            yield item
+
+    def prefix(self, query):
+        """Yield products whose name starts with query, in name order."""
+        return self._prefixed(self._names, query.lower())
+
+    def build_postings(self):
+        """Build the trigram postings now instead of on the first substring query."""
+        if self._postings is not None:
+            return
+        postings = {}
+        for item, name in self._keys.items():
+            for gram in _ngrams(name):
+                postings.setdefault(gram, {})[item] = None
+        self._postings = postings
+
+    def _substring_matches(self, query):
+        """Yield products whose name contains query, in catalog order."""
+        self.build_postings()
+        postings = []
+        for gram in _ngrams(query):
+            posting = self._postings.get(gram)
+            if not posting:
+                return
+            postings.append(posting)
+        keys = self._keys
+        for item in min(postings, key=len):
+            if query in keys[item]:
+                yield item
+
+    def search(self, query, limit=10, offset=0, accept=None):
+        """
+        Return one page of matches, best first.
+
+        Names starting with the query come first (an exact name first of
+        all, then alphabetical), then names with a later word starting with
+        it (alphabetical from that word), then any other substring matches
+        in catalog order. Queries shorter than a trigram only match word
+        prefixes. Each group is walked lazily until the page is full.
+
+        Args:
+            query: Text to look for, case-insensitive
+            limit: Page size
+            offset: Number of ranked matches to skip
+            accept: Optional predicate a product must satisfy
+        """
+        query = query.strip().lower()
+        needed = offset + limit
+        if not query or limit <= 0:
+            return []
+        results = []
+        seen = set()
+
+        def take(items):
+            for item in items:
+                if item in seen:
+                    continue
+                seen.add(item)
+                if accept is None or accept(item):
+                    results.append(item)
+                    if len(results) >= needed:
+                        return True
+            return False
+
+        if not (take(self._prefixed(self._names, query))
+                or take(self._prefixed(self._words, query))
+                or len(query) < NGRAM):
+            take(self._substring_matches(query))
+        return results[offset:needed]
@@ -0,0 +1,315 @@
+"""
+HTTP/JSON storefront over a Store, using only asyncio.
+
+Endpoints:
+    GET  /products?limit=50&cursor=N&active_only=true
+    GET  /search?q=text&limit=10&offset=0
+    POST /quote  {"lines": [{"name": ..., "quantity": ...}, ...]}
+    POST /order  {"lines": [...], "atomic": false}
+
+Connections are kept alive (HTTP/1.1) and requests may be pipelined:
+they are read ahead, handled concurrently and answered in order. Store
+calls run on a bounded thread pool so the event loop never blocks.
+
+Usage:
+    python server.py --port 8080 --workers 8
+"""
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from main import demo_store
+from product import PurchaseError
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+MAX_BODY = 1 << 20
+
+
+class HTTPError(Exception):
+    """A request that is answered with an error status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _product_json(item) -> dict:
+    record = item.to_record()
+    record["available"] = item.available
+    return record
+
+
+class StoreServer:
+    """Serves one Store over HTTP/JSON."""
+
+    def __init__(self, store, host="127.0.0.1", port=8080, workers=8, max_pipeline=32):
+        """
+        Args:
+            store: The Store to serve
+            host: Interface to bind
+            port: Port to bind; 0 picks a free one (see `port` after start)
+            workers: Threads running store calls, i.e. requests handled at once
+            max_pipeline: Requests read ahead on one connection before
+                          waiting for their responses
+        """
+        if not isinstance(workers, int) or workers <= 0:
+            raise ValueError("Workers must be a positive integer")
+        self.store = store
+        self.host = host
+        self.port = port
+        self.max_pipeline = max_pipeline
+        self.requests = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="store")
+        self._server = None
+        self._connections = {}
+        self._routes = {
+            ("GET", "/products"): self._list_products,
+            ("GET", "/search"): self._search,
+            ("POST", "/quote"): self._quote,
+            ("POST", "/order"): self._order,
+        }
+
+    async def start(self):
+        """Start listening; returns once the socket is bound."""
+        self._server = await asyncio.start_server(self._serve_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """Stop listening, close open connections and wait for their handlers."""
+        if self._server is not None:
+            self._server.close()
+        for writer in list(self._connections.values()):
+            writer.close()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _serve_connection(self, reader, writer):
+        # The reader parses requests ahead of the writer, which sends the
+        # responses in request order; the queue bounds the read-ahead.
+        responses = asyncio.Queue(self.max_pipeline)
+        sender = asyncio.ensure_future(self._send_responses(responses, writer))
+        handler = asyncio.current_task()
+        self._connections[handler] = writer
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except (HTTPError, ValueError) as e:
+                    status = e.status if isinstance(e, HTTPError) else 400
+                    await _enqueue(responses, (_done(_response(status, {"error": str(e)})), False),
+                                   sender)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = _keep_alive(headers)
+                task = asyncio.ensure_future(self._dispatch(method, target, body, keep_alive))
+                if not await _enqueue(responses, (task, keep_alive), sender) or not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            await _enqueue(responses, None, sender)
+            await sender
+            del self._connections[handler]
+
+    @staticmethod
+    async def _send_responses(responses, writer):
+        try:
+            while True:
+                item = await responses.get()
+                if item is None:
+                    break
+                task, keep_alive = item
+                writer.write(await task)
+                if responses.empty():
+                    await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, target, body, keep_alive) -> bytes:
+        url = urlsplit(target)
+        handler = self._routes.get((method, url.path))
+        try:
+            if handler is None:
+                if any(path == url.path for _, path in self._routes):
+                    raise HTTPError(405, f"Method {method} not allowed on {url.path}")
+                raise HTTPError(404, f"No such endpoint: {url.path}")
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            payload = json.loads(body) if body else {}
+            if not isinstance(payload, dict):
+                raise HTTPError(400, "Expected a JSON object")
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, handler, query, payload)
+            status = 200
+        except HTTPError as e:
+            status, result = e.status, {"error": str(e)}
+        except PurchaseError as e:
+            status, result = 409, {"error": str(e), "reason": e.reason}
+        except (ValueError, TypeError, KeyError) as e:
+            status, result = 400, {"error": str(e)}
+        except Exception as e:
+            status, result = 500, {"error": str(e)}
+        self.requests += 1
+        return _response(status, result, keep_alive)
+
+    def _list_products(self, query, payload) -> dict:
+        cursor = query.get("cursor")
+        page, next_cursor = self.store.list_products(
+            limit=int(query.get("limit", 50)),
+            cursor=None if cursor is None else int(cursor),
+            active_only=query.get("active_only", "true").lower() != "false",
+        )
+        return {"products": [_product_json(item) for item in page], "next_cursor": next_cursor}
+
+    def _search(self, query, payload) -> dict:
+        products = self.store.search(query.get("q", ""), limit=int(query.get("limit", 10)),
+                                     offset=int(query.get("offset", 0)))
+        return {"products": [_product_json(item) for item in products]}
+
+    def _shopping_list(self, payload) -> list:
+        lines = payload.get("lines")
+        if not isinstance(lines, list):
+            raise HTTPError(400, "Expected a list of lines")
+        shopping_list = []
+        for line in lines:
+            item = self.store.get_product(line["name"])
+            if item is None:
+                raise HTTPError(404, f"No such product: {line['name']}")
+            shopping_list.append((item, line["quantity"]))
+        return shopping_list
+
+    def _quote(self, query, payload) -> dict:
+        lines = [{"name": item.name, "quantity": quantity, "total_price": item.quote(quantity)}
+                 for item, quantity in self._shopping_list(payload)]
+        return {"total_price": sum(line["total_price"] for line in lines), "lines": lines}
+
+    def _order(self, query, payload) -> dict:
+        shopping_list = self._shopping_list(payload)
+        if payload.get("atomic"):
+            return {"ok": True, "total_price": self.store.order_atomic(shopping_list)}
+        result = self.store.place_order(shopping_list)
+        return {
+            "ok": result.ok,
+            "total_price": result.total_price,
+            "lines": [
+                {
+                    "name": line.product.name,
+                    "quantity": line.quantity,
+                    "status": line.status,
+                    "reason": line.reason,
+                    "unit_price": line.unit_price,
+                    "total_price": line.total_price,
+                    "promotion": line.promotion.name if line.promotion else None,
+                }
+                for line in result.lines
+            ],
+        }
+
+
+async def _read_request(reader):
+    """Read one request; None on a clean end of stream."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, target, version = request_line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line") from None
+    headers = {"_version": version}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY:
+        raise HTTPError(413, "Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, target, headers, body
+
+
+def _keep_alive(headers) -> bool:
+    connection = headers.get("connection", "").lower()
+    if headers["_version"] == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+
+def _response(status, payload, keep_alive=False) -> bytes:
+    body = json.dumps(payload).encode("utf-8")
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+
+async def _enqueue(responses, item, sender) -> bool:
+    """Queue an item for the sender; False if the sender has stopped and never will take it."""
+    if sender.done():
+        return False
+    try:
+        responses.put_nowait(item)
+        return True
+    except asyncio.QueueFull:
+        pass
+    put = asyncio.ensure_future(responses.put(item))
+    await asyncio.wait((put, sender), return_when=asyncio.FIRST_COMPLETED)
+    if put.done():
+        return True
+    put.cancel()
+    return False
+
+
+def _done(result):
+    future = asyncio.get_running_loop().create_future()
+    future.set_result(result)
+    return future
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the demo store over HTTP/JSON")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    server = StoreServer(demo_store(), args.host, args.port, args.workers)
+
+    async def run():
+        await server.start()
+        print(f"Serving on http://{server.host}:{server.port}")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
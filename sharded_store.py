@@ -0,0 +1,333 @@
+import copy
+import itertools
+import multiprocessing
+import threading
+import weakref
+import zlib
+from contextlib import ExitStack
+from multiprocessing import shared_memory
+from typing import List, Optional
+
+import numpy as np
+
+from product import Product
+
+
+def _shard_for(name, shards) -> int:
+    """Stable shard number for a product name (the same in every process)."""
+    return zlib.crc32(name.encode("utf-8")) % shards
+
+
+def _attach_counters(shm, size):
+    """Return the quantity and active arrays living in a shared memory block."""
+    quantities = np.ndarray((size,), dtype=np.int64, buffer=shm.buf, offset=0)
+    active = np.ndarray((size,), dtype=np.bool_, buffer=shm.buf, offset=size * 8)
+    return quantities, active
+
+
+def _shard_worker(conn, shm_name, size, owned):
+    """
+    Serve reserve/commit/abort and set_active requests for the products
+    of one shard.
+
+    `owned` maps a product index to a private copy of the product, used for
+    validation and pricing. Only this worker writes the shared counters of
+    its products, so no cross-process locking is needed.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    quantities, active = _attach_counters(shm, size)
+    held = {}
+    reserved = {}
+
+    def sync(index):
+        item = owned[index]
+        item._quantity = int(quantities[index])
+        item._active = bool(active[index])
+        return item
+
+    def reserve(order_id, lines):
+        pending = {}
+        total_price = 0
+        for index, quantity in lines:
+            # Sync the private copy with the shared counters before checking.
+            item = sync(index)
+            already = reserved.get(index, 0) + pending.get(index, 0)
+            item._check_purchase(quantity, already)
+            pending[index] = pending.get(index, 0) + quantity
+            total_price += item._price_for(quantity)
+        for index, quantity in pending.items():
+            reserved[index] = reserved.get(index, 0) + quantity
+        held[order_id] = pending
+        return total_price
+
+    def release(order_id, commit):
+        for index, quantity in held.pop(order_id, {}).items():
+            reserved[index] -= quantity
+            if commit:
+                item = sync(index)
+                item._commit_purchase(quantity)
+                quantities[index] = item._quantity
+                active[index] = item._active
+
+    try:
+        while True:
+            request = conn.recv()
+            op = request[0]
+            if op == "close":
+                break
+            try:
+                if op == "order":
+                    total_price = reserve(request[1], request[2])
+                    release(request[1], commit=True)
+                    conn.send(("ok", total_price))
+                elif op == "reserve":
+                    conn.send(("ok", reserve(request[1], request[2])))
+                elif op in ("commit", "abort"):
+                    release(request[1], commit=op == "commit")
+                    conn.send(("ok", None))
+                elif op == "set_active":
+                    active[request[1]] = request[2]
+                    conn.send(("ok", None))
+            except Exception as e:
+                conn.send(("error", e))
+    finally:
+        del quantities, active
+        shm.close()
+        conn.close()
+
+
+class ShardedProduct(Product):
+    """
+    A product of a ShardedStore.
+
+    Quantity and active status are read from the store's shared memory
+    counters. Stock only changes through orders, and the active flag only
+    through activate/deactivate; both are routed to the worker process that
+    owns the product. Price and promotion are fixed: workers price orders
+    from their own copies, so changing them here would not be seen.
+    """
+
+    def __init__(self, store, index, source):
+        self.name = source.name
+        self._price = source.price
+        self._promotion = source.promotion
+        self._sharded_store = store
+        self._index = index
+        self._init_shared_state()
+
+    @property
+    def _quantity(self):
+        return int(self._sharded_store._quantities[self._index])
+
+    @_quantity.setter
+    def _quantity(self, quantity):
+        raise Exception("Stock of a sharded product can only change through orders.")
+
+    @property
+    def price(self):
+        return self._price
+
+    @price.setter
+    def price(self, price):
+        raise Exception("Price of a sharded product is fixed when the store is built.")
+
+    @property
+    def promotion(self):
+        return self._promotion
+
+    @promotion.setter
+    def promotion(self, promotion):
+        raise Exception("Promotion of a sharded product is fixed when the store is built.")
+
+    @property
+    def _active(self):
+        return bool(self._sharded_store._active[self._index])
+
+    @_active.setter
+    def _active(self, status):
+        self._sharded_store._set_active(self._index, bool(status))
+
+    def __str__(self):
+        promotion_info = f", Promotion: {self.promotion.name}" if self.promotion else ""
+        return f"{self.name}, Price: ${self.price}, Quantity: {self.quantity}{promotion_info}"
+
+    def buy(self, quantity) -> float:
+        """Buy through the owning shard. Returns total price."""
+        return self._sharded_store.order_atomic([(self, quantity)])
+
+
+class ShardedStore:
+    """
+    Store whose products are split across worker processes by name hash.
+
+    Quantities and active flags live in shared memory, so listing and
+    totals are read directly without talking to the workers. Orders are
+    sent to the shards that own their products; orders spanning several
+    shards use a reserve/commit round so they stay all or nothing.
+
+    Prices and promotions are fixed when the store is created. Call close()
+    (or use the store as a context manager) to stop the workers.
+    """
+
+    def __init__(self, product_list, shards=None):
+        product_list = list(product_list)
+        if shards is None:
+            shards = multiprocessing.cpu_count()
+        if not isinstance(shards, int) or shards <= 0:
+            raise ValueError("Shards must be a positive integer")
+        size = len(product_list)
+        self.shards = shards
+        self._shm = shared_memory.SharedMemory(create=True, size=max(size * 9, 1))
+        self._quantities, self._active = _attach_counters(self._shm, size)
+        self._products = []
+        self._names = {}
+        self._shard_of = []
+        owned = [{} for _ in range(shards)]
+        for index, source in enumerate(product_list):
+            self._quantities[index] = source.quantity
+            self._active[index] = source.active
+            self._products.append(ShardedProduct(self, index, source))
+            self._names.setdefault(source.name, index)
+            shard = _shard_for(source.name, shards)
+            self._shard_of.append(shard)
+            # Workers get detached copies, free of the parent's stores and locks.
+            owned[shard][index] = copy.deepcopy(source)
+        self._order_ids = itertools.count()
+        self._conns = []
+        self._conn_locks = [threading.Lock() for _ in range(shards)]
+        self._workers = []
+        for shard in range(shards):
+            parent_conn, child_conn = multiprocessing.Pipe()
+            worker = multiprocessing.Process(
+                target=_shard_worker,
+                args=(child_conn, self._shm.name, size, owned[shard]),
+                daemon=True,
+            )
+            worker.start()
+            child_conn.close()
+            self._conns.append(parent_conn)
+            self._workers.append(worker)
+        self._finalizer = weakref.finalize(
+            self, ShardedStore._shutdown, self._conns, self._workers, self._shm
+        )
+
+    @staticmethod
+    def _shutdown(conns, workers, shm):
+        for conn in conns:
+            try:
+                conn.send(("close",))
+            except (OSError, ValueError):
+                pass
+        for worker in workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        for conn in conns:
+            conn.close()
+        shm.close()
+        shm.unlink()
+
+    def close(self):
+        """Stop the worker processes and free the shared memory."""
+        self._quantities = self._active = None
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _index_of(self, item) -> int:
+        if isinstance(item, ShardedProduct) and item._sharded_store is self:
+            return item._index
+        index = self._names.get(getattr(item, "name", item))
+        if index is None:
+            raise Exception(f"Product {getattr(item, 'name', item)} not found in store.")
+        return index
+
+    def get_product(self, name) -> Optional[ShardedProduct]:
+        """Return the first product added under the given name, or None."""
+        index = self._names.get(name)
+        return None if index is None else self._products[index]
+
+    def get_total_quantity(self) -> int:
+        """Return total quantity of all products in the store."""
+        return int(self._quantities.sum())
+
+    def get_all_products(self) -> List[ShardedProduct]:
+        """Return a list of all active products in the store."""
+        return [self._products[index] for index in np.flatnonzero(self._active)]
+
+    def _request(self, shard, message):
+        self._conns[shard].send(message)
+        return self._conns[shard].recv()
+
+    def _set_active(self, index, status):
+        """Have the owning shard set a product's active flag, in order with its commits."""
+        shard = self._shard_of[index]
+        with self._conn_locks[shard]:
+            status, result = self._request(shard, ("set_active", index, status))
+        if status == "error":
+            raise result
+
+    def order_atomic(self, shopping_list) -> float:
+        """
+        Processes an order for multiple products, all or nothing.
+        Args:
+            shopping_list (list of tuples):
+            Each tuple contains a product (or product name) and the quantity.
+        Returns:
+            float: Total price of the order.
+        Raises:
+            Exception: If any line cannot be purchased; no stock is taken.
+        """
+        by_shard = {}
+        for item, quantity in shopping_list:
+            index = self._index_of(item)
+            by_shard.setdefault(self._shard_of[index], []).append((index, quantity))
+        if not by_shard:
+            return 0
+        order_id = next(self._order_ids)
+        shards = sorted(by_shard)
+        with ExitStack() as stack:
+            # Shard connections are locked in shard order, so concurrent
+            # cross-shard orders cannot deadlock.
+            for shard in shards:
+                stack.enter_context(self._conn_locks[shard])
+            if len(shards) == 1:
+                status, result = self._request(shards[0], ("order", order_id, by_shard[shards[0]]))
+                if status == "error":
+                    raise result
+                return result
+            for shard in shards:
+                self._conns[shard].send(("reserve", order_id, by_shard[shard]))
+            replies = [self._conns[shard].recv() for shard in shards]
+            failed = [result for status, result in replies if status == "error"]
+            decision = "abort" if failed else "commit"
+            for shard in shards:
+                self._conns[shard].send((decision, order_id))
+            for shard in shards:
+                self._conns[shard].recv()
+        if failed:
+            raise failed[0]
+        return sum(result for _, result in replies)
+
+    def order(self, shopping_list) -> float:
+        """
+        Processes an order, printing the reason if it cannot be placed.
+        Unlike Store.order, the order is all or nothing.
+        Returns:
+            float: Total price of the order, or 0 if it failed.
+        """
+        try:
+            return self.order_atomic(shopping_list)
+        except Exception as e:
+            print(f"Could not place order: {e}")
+            return 0
+
+    def __contains__(self, product):
+        """Check if a product (or a product name) exists in the store using 'in' operator"""
+        if isinstance(product, str):
+            return product in self._names
+        return isinstance(product, ShardedProduct) and product._sharded_store is self
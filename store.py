@@ -1,29 +1,504 @@
-from typing import List
+import itertools
+import sys
+import threading
+import time
+import weakref
+from typing import List, Optional, Tuple
 
-import product
+import numpy as np
+from sortedcontainers import SortedList
+
+import metrics
+from order_result import LineResult, OrderResult
+from order_service import AsyncOrderService
+from product import (NonStockedProduct, Product, _call_unlocked, _defer_publish, _enter_locked,
+                     _exit_locked, _has_batch, lock_products)
+from reservations import Reservation, ReservationBook
+from search import SearchIndex
+from store_versions import StoreVersion
 
 
 class Store:
     def __init__(self, product_list):
-        self.product = product_list
+        # Products live in an insertion-ordered dict keyed by slot number so
+        # removal stays O(1); _slots and _names index the same entries by
+        # product instance and by product name.
+        self._products = {}
+        self._slots = {}
+        self._names = {}
+        self._next_slot = itertools.count()
+        # Slot order of all and of active products, for stable listing and
+        # cursors; maintained incrementally from Product change notifications.
+        self._all_slots = SortedList()
+        self._active_slots = SortedList()
+        self._total_quantity = 0
+        # Bumped whenever a product is added or removed.
+        self._membership_version = 0
+        # (price, slot) of active products, kept sorted by the price setter.
+        self._price_index = SortedList()
+        # (quantity, slot) of stocked products, and (quantity - watermark,
+        # slot) of those with a low-stock watermark; kept by the quantity setter.
+        self._stock_index = SortedList()
+        self._slack_index = SortedList()
+        self._watermarks = {}
+        self._low_stock_listeners = []
+        # Latest published StoreVersion, swapped in by writers as each write
+        # ends; versions are published only once snapshot() has been called.
+        self._published = None
+        self._version_numbers = itertools.count(1)
+        self._live_versions = weakref.WeakValueDictionary()
+        # Name search index, built on the first search() call outside the
+        # store lock; membership changes made meanwhile are queued in
+        # _search_pending and replayed before the index is swapped in.
+        self._search_index = None
+        self._search_pending = None
+        self._search_build_lock = threading.Lock()
+        # Guards the store's own bookkeeping only; stock changes are
+        # serialized by per-product locks.
+        self._lock = threading.RLock()
+        self._order_service = None
+        self._reservations = None
+        self._listeners = []
+        for products in product_list:
+            self.add_product(products)
+
+    @property
+    def product(self) -> Tuple[Product, ...]:
+        """
+        Return all products in insertion order (kept for backward compatibility).
+        This is a read-only snapshot; use add_product and remove_product to
+        change the store.
+        """
+        return tuple(self._products.values())
 
     def add_product(self, product):
-        self.product.append(product)
+        """Add a product to the store. The same instance may be added twice."""
+        with self._lock:
+            self._add_product(product)
+
+    def add_products(self, product_list) -> int:
+        """Add many products under one lock acquisition. Returns the count added."""
+        count = 0
+        with self._lock:
+            for products in product_list:
+                self._add_product(products)
+                count += 1
+        return count
+
+    def _add_product(self, product):
+        slot = next(self._next_slot)
+        self._membership_version += 1
+        self._products[slot] = product
+        self._all_slots.add(slot)
+        if product not in self._slots:
+            self._search_changed(SearchIndex.add, product)
+        self._slots.setdefault(product, []).append(slot)
+        self._names.setdefault(product.name, {})[product] = None
+        if product._stores is None:
+            product._stores = weakref.WeakSet()
+        product._stores.add(self)
+        self._total_quantity += product.quantity
+        if not isinstance(product, NonStockedProduct):
+            self._stock_index.add((product.quantity, slot))
+        if product.active:
+            self._active_slots.add(slot)
+            self._price_index.add((product.price, slot))
+        self._changed((slot,))
+        self._emit(product, "added", None, None)
 
     def remove_product(self, product):
         """Remove a product from the store."""
-        try:
-            self.product.remove(product)
-        except ValueError:
+        with self._lock:
+            self._remove_product(product)
+
+    def _remove_product(self, product):
+        slots = self._slots.get(product)
+        if not slots:
             print(f"Product {product.name} not found in store.")
+            return
+        slot = slots.pop(0)
+        self._membership_version += 1
+        del self._products[slot]
+        self._all_slots.remove(slot)
+        if slot in self._active_slots:
+            self._active_slots.remove(slot)
+            self._price_index.discard((product.price, slot))
+        self._total_quantity -= product.quantity
+        self._stock_index.discard((product.quantity, slot))
+        watermark = self._watermarks.get(product)
+        if watermark is not None:
+            self._slack_index.discard((product.quantity - watermark, slot))
+        if not slots:
+            self._watermarks.pop(product, None)
+            del self._slots[product]
+            product._stores.discard(self)
+            self._search_changed(SearchIndex.remove, product)
+            same_name = self._names[product.name]
+            del same_name[product]
+            if not same_name:
+                del self._names[product.name]
+        self._changed((slot,))
+        self._emit(product, "removed", None, None)
+
+    def get_product(self, name) -> Optional[Product]:
+        """Return the first product added under the given name, or None."""
+        same_name = self._names.get(name)
+        if not same_name:
+            return None
+        return next(iter(same_name))
 
     def get_total_quantity(self) -> int:
         """Return total quantity of all products in the store."""
-        return sum(products.get_quantity() for products in self.product)
+        return self._total_quantity
 
-    def get_all_products(self) -> List[product.Product]:
+    def get_all_products(self) -> List[Product]:
         """Return a list of all active products in the store."""
-        return [products for products in self.product if products.is_active()]
+        if metrics.enabled:
+            return metrics.call("get_all_products", self._get_all_products)
+        return self._get_all_products()
+
+    def _get_all_products(self) -> List[Product]:
+        with self._lock:
+            products = self._products
+            return [products[slot] for slot in self._active_slots]
+
+    def search(self, query, limit=10, offset=0, active_only=True) -> List[Product]:
+        """
+        Search products by name, case-insensitive, best matches first.
+        Args:
+            query: Prefix or substring of the product name.
+            limit: Page size.
+            offset: Number of ranked results to skip.
+            active_only: Whether inactive products are left out.
+        Returns:
+            list: One page of matching products.
+        """
+        index = self._search_index
+        if index is None:
+            index = self._build_search_index()
+        accept = (lambda item: item.active) if active_only else None
+        with self._lock:
+            return index.search(query, limit, offset, accept)
+
+    def _build_search_index(self) -> SearchIndex:
+        """
+        Build the search index, trigram postings included, without holding
+        the store lock, so purchases are not stalled by a large catalog.
+        """
+        with self._search_build_lock:
+            if self._search_index is not None:
+                return self._search_index
+            with self._lock:
+                items = list(self._slots)
+                self._search_pending = []
+            try:
+                index = SearchIndex(items)
+                index.build_postings()
+                with self._lock:
+                    for change, item in self._search_pending:
+                        change(index, item)
+                    self._search_index = index
+            finally:
+                self._search_pending = None
+            return index
+
+    def _search_changed(self, change, product):
+        """Apply an index change now, or queue it while the index is being built."""
+        if self._search_index is not None:
+            change(self._search_index, product)
+        elif self._search_pending is not None:
+            self._search_pending.append((change, product))
+
+    def list_products(self, limit=50, cursor=None, active_only=True, predicate=None):
+        """
+        Return one page of products in the order they were added.
+        Args:
+            limit: Page size.
+            cursor: Cursor returned with the previous page, or None to start.
+            active_only: Whether inactive products are left out.
+            predicate: Optional filter a product must satisfy.
+        Returns:
+            tuple: (products, next_cursor); next_cursor is None after the
+            last page. Products added or removed between pages do not shift
+            the pages that follow.
+        """
+        if limit <= 0:
+            raise ValueError("Page size must be positive")
+        with self._lock:
+            slots = self._active_slots if active_only else self._all_slots
+            start = 0 if cursor is None else slots.bisect_right(cursor)
+            page = []
+            for index, slot in enumerate(slots.islice(start), start + 1):
+                product = self._products[slot]
+                if predicate is None or predicate(product):
+                    page.append(product)
+                    if len(page) >= limit:
+                        return page, (slot if index < len(slots) else None)
+            return page, None
+
+    def iter_products(self, active_only=True, predicate=None, page_size=1024):
+        """Yield products page by page, holding the store lock per page only."""
+        cursor = None
+        while True:
+            page, cursor = self.list_products(page_size, cursor, active_only, predicate)
+            yield from page
+            if cursor is None:
+                return
+
+    def write_listing(self, out=None, active_only=True, predicate=None, page_size=1000) -> int:
+        """
+        Write one line per product to `out` (default stdout), one write per page.
+        Returns:
+            int: The number of products written.
+        """
+        out = out or sys.stdout
+        count = 0
+        cursor = None
+        while True:
+            page, cursor = self.list_products(page_size, cursor, active_only, predicate)
+            if page:
+                out.write("".join(f"{product}\n" for product in page))
+                count += len(page)
+            if cursor is None:
+                out.flush()
+                return count
+
+    def products_in_price_range(self, low, high) -> List[Product]:
+        """Return active products priced within [low, high], cheapest first."""
+        with self._lock:
+            return [self._products[slot] for _, slot in
+                    self._price_index.irange((low, -1), (high, float("inf")))]
+
+    def cheapest(self, k) -> List[Product]:
+        """Return the k cheapest active products, cheapest first."""
+        with self._lock:
+            return [self._products[slot] for _, slot in self._price_index.islice(0, k)]
+
+    def most_expensive(self, k) -> List[Product]:
+        """Return the k most expensive active products, priciest first."""
+        with self._lock:
+            return [self._products[slot] for _, slot in
+                    self._price_index.islice(max(len(self._price_index) - k, 0), reverse=True)]
+
+    def next_cheaper(self, product) -> Optional[Product]:
+        """Return the active product just below `product` in price order, or None."""
+        with self._lock:
+            index = self._price_index.bisect_left(self._price_key(product))
+            if index == 0:
+                return None
+            return self._products[self._price_index[index - 1][1]]
+
+    def next_pricier(self, product) -> Optional[Product]:
+        """Return the active product just above `product` in price order, or None."""
+        with self._lock:
+            index = self._price_index.bisect_right(self._price_key(product))
+            if index >= len(self._price_index):
+                return None
+            return self._products[self._price_index[index][1]]
+
+    def _stock_changed(self, product, slots, old, new):
+        """Move a product in the stock indexes and report watermark crossings."""
+        for slot in slots:
+            self._stock_index.discard((old, slot))
+            self._stock_index.add((new, slot))
+        watermark = self._watermarks.get(product)
+        if watermark is None:
+            return
+        for slot in slots:
+            self._slack_index.discard((old - watermark, slot))
+            self._slack_index.add((new - watermark, slot))
+        if (old <= watermark) != (new <= watermark):
+            below = new <= watermark
+            if not _call_unlocked(self._low_stock, product, new, watermark, below):
+                self._low_stock(product, new, watermark, below)
+
+    def _low_stock(self, product, quantity, watermark, below):
+        for listener in list(self._low_stock_listeners):
+            listener(product, quantity, watermark, below)
+
+    def lowest_stock(self, k) -> List[Product]:
+        """Return the k stocked products with the least quantity left, lowest first."""
+        with self._lock:
+            return [self._products[slot] for _, slot in self._stock_index.islice(0, k)]
+
+    def below_watermark(self, limit=None) -> List[Product]:
+        """
+        Return products whose quantity is at or below their watermark,
+        furthest below first.
+        """
+        with self._lock:
+            entries = self._slack_index.irange(maximum=(0, float("inf")))
+            return [self._products[slot] for _, slot in itertools.islice(entries, limit)]
+
+    def set_watermark(self, product, watermark):
+        """
+        Set the low-stock level of a product in the store; None clears it.
+        Listeners added with add_low_stock_listener are told whenever the
+        product's quantity crosses it.
+        """
+        if watermark is not None and (not isinstance(watermark, int) or watermark < 0):
+            raise ValueError("Watermark must be a non negative integer")
+        with self._lock:
+            slots = self._slots.get(product)
+            if not slots:
+                raise ValueError(f"Product {product.name} not found in store.")
+            old = self._watermarks.pop(product, None)
+            for slot in slots:
+                if old is not None:
+                    self._slack_index.discard((product.quantity - old, slot))
+                if watermark is not None:
+                    self._slack_index.add((product.quantity - watermark, slot))
+            if watermark is not None:
+                self._watermarks[product] = watermark
+
+    def add_low_stock_listener(self, listener):
+        """
+        Register a callable invoked as listener(product, quantity, watermark,
+        below) when a product's quantity falls to or below its watermark
+        (below is True) or rises back above it (below is False).
+        Listeners run after the write that crossed the watermark has
+        released its product and store locks, so they may restock.
+        """
+        with self._lock:
+            self._low_stock_listeners.append(listener)
+
+    def remove_low_stock_listener(self, listener):
+        """Unregister a listener added with add_low_stock_listener."""
+        with self._lock:
+            self._low_stock_listeners.remove(listener)
+
+    def restock(self, mapping) -> List[Product]:
+        """
+        Add stock to many products in one pass.
+        Products that had sold out (inactive at quantity 0) are activated
+        again; products deactivated with stock left stay inactive.
+        Args:
+            mapping: Product -> number of units to add (positive int).
+        Returns:
+            list: The products that were reactivated.
+        Raises:
+            ValueError: If a product is not in the store or not stocked, or a
+            count is not a positive integer; nothing is restocked.
+        """
+        mapping = dict(mapping)
+        for product, units in mapping.items():
+            if not isinstance(units, int) or units <= 0:
+                raise ValueError("Restock quantity must be a positive integer.")
+            if isinstance(product, NonStockedProduct):
+                raise ValueError(f"Product {product.name} is not stocked.")
+        reactivated = []
+        # Product locks first, then the store lock, as for purchases.
+        with lock_products(mapping), self._lock:
+            for product in mapping:
+                if product not in self._slots:
+                    raise ValueError(f"Product {product.name} not found in store.")
+            for product, units in mapping.items():
+                sold_out = product.quantity == 0 and not product.active
+                product.quantity = product.quantity + units
+                if sold_out:
+                    product.activate()
+                    reactivated.append(product)
+        return reactivated
+
+    def _price_key(self, product):
+        slots = self._slots.get(product)
+        if not slots:
+            raise ValueError(f"Product {product.name} not found in store.")
+        return (product.price, slots[0])
+
+    def _product_changed(self, product, field, old, new):
+        """Apply a change pushed by one of this store's products."""
+        _enter_locked()
+        try:
+            self._apply_change(product, field, old, new)
+        finally:
+            _exit_locked()
+
+    def _apply_change(self, product, field, old, new):
+        with self._lock:
+            slots = self._slots.get(product)
+            if not slots:
+                return
+            if field == "quantity":
+                self._total_quantity += (new - old) * len(slots)
+                if not isinstance(product, NonStockedProduct):
+                    self._stock_changed(product, slots, old, new)
+            elif field == "active":
+                if new:
+                    for slot in slots:
+                        self._active_slots.add(slot)
+                        self._price_index.add((product.price, slot))
+                else:
+                    for slot in slots:
+                        self._active_slots.discard(slot)
+                        self._price_index.discard((product.price, slot))
+            elif field == "price":
+                for slot in slots:
+                    if slot in self._active_slots:
+                        self._price_index.discard((old, slot))
+                        self._price_index.add((new, slot))
+            self._changed(slots)
+            self._emit(product, field, old, new)
+
+    def _changed(self, slots):
+        """Publish a version for changed slots, or queue them until the write ends."""
+        if self._published is not None and not _defer_publish(self, slots):
+            self._publish(slots)
+
+    def _publish(self, slots):
+        """Swap in the version after the current one, copying only `slots`."""
+        with self._lock:
+            version = StoreVersion.publish(
+                self._published, next(self._version_numbers), self._products, slots)
+            self._live_versions[version.version] = version
+            self._published = version
+
+    def snapshot(self) -> StoreVersion:
+        """
+        Return an immutable view of every product's price, quantity, active
+        flag and promotion at the latest version. Writers publish a version
+        as each write ends (a purchase or order under product locks, a
+        setter call, or an add/remove), copying only the products they
+        changed, so this takes no locks and never waits for a writer. Later
+        changes never show through.
+
+        The first call turns publishing on: it takes every product's lock
+        once to build a consistent first version. Setter calls made without
+        holding the product lock are not isolated from each other and
+        publish one version each.
+        """
+        published = self._published
+        if published is not None:
+            return published
+        with self._lock:
+            products = list(self._products.values())
+        with lock_products(products), self._lock:
+            if self._published is None:
+                self._publish(self._products.keys())
+            return self._published
+
+    def live_versions(self) -> List[int]:
+        """Return the numbers of the versions still held by a reader (or the store)."""
+        return sorted(self._live_versions.keys())
+
+    def add_listener(self, listener):
+        """
+        Register a callable invoked as listener(product, field, old, new)
+        for every change to a product in the store. `field` is one of
+        quantity, price, active or promotion, or added/removed (with old and
+        new set to None) when a product enters or leaves the store.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Unregister a listener added with add_listener."""
+        with self._lock:
+            self._listeners.remove(listener)
+
+    def _emit(self, product, field, old, new):
+        for listener in self._listeners:
+            listener(product, field, old, new)
 
     def order(self, shopping_list) -> float:
         """
@@ -37,21 +512,421 @@ class Store:
             Exception: If a product cannot be purchased due to insufficient
             quantity or if the product is inactive.
         """
+        if metrics.enabled:
+            with metrics.profile_order(shopping_list):
+                return metrics.call("order", self._order, shopping_list)
+        return self._order(shopping_list)
+
+    def _order(self, shopping_list) -> float:
+        result = self._place_order(shopping_list)
+        for line in result.lines:
+            if line.reason is not None:
+                print(f"Could not buy {line.product.name}: {line.message}")
+        return result.total_price
+
+    def place_order(self, shopping_list) -> OrderResult:
+        """
+        Processes an order line by line, like order(), without raising or
+        printing. Lines that cannot be bought are skipped and reported.
+        Args:
+            shopping_list (list of tuples):
+            Each tuple contains a Product object and the quantity to buy (int).
+        Returns:
+            OrderResult: Status, reason code, prices and promotion of every
+            line, and the total price of the lines bought.
+        """
+        if metrics.enabled:
+            return metrics.call("order", self._place_order, shopping_list)
+        return self._place_order(shopping_list)
+
+    @classmethod
+    def _place_order(cls, shopping_list) -> OrderResult:
+        place_line = cls._place_line_measured if metrics.enabled else cls._place_line
+        lines = []
         total_price = 0
         for products, quantity in shopping_list:
+            line = place_line(products, quantity)
+            total_price += line.total_price
+            lines.append(line)
+        return OrderResult(lines, total_price)
+
+    @staticmethod
+    def _place_line(products, quantity) -> LineResult:
+        """Buy one line under its product lock; failures are returned, not raised."""
+        _enter_locked()
+        try:
+            with products._lock:
+                reason = products._purchase_problem(quantity)
+                if reason is not None:
+                    return LineResult(products, quantity, reason)
+                unit_price, promotion = products.price, products.promotion
+                try:
+                    line_price = products._price_for(quantity)
+                except Exception as e:
+                    # A failing promotion skips the line; nothing has been taken.
+                    return LineResult(products, quantity, "pricing_error", error=e)
+                products._commit_purchase(quantity)
+        finally:
+            _exit_locked()
+        return LineResult(products, quantity, None, unit_price, line_price, promotion)
+
+    @classmethod
+    def _place_line_measured(cls, products, quantity) -> LineResult:
+        """_place_line, counted and timed as a buy."""
+        started = time.perf_counter()
+        line = cls._place_line(products, quantity)
+        if line.reason is not None:
+            metrics.inc("buy_failures_total", (("reason", line.reason),))
+        metrics.observe("buy_seconds", time.perf_counter() - started)
+        metrics.inc("buy_total")
+        return line
+
+    def order_atomic(self, shopping_list) -> float:
+        """
+        Processes an order for multiple products, all or nothing.
+        The locks of all products in the order are taken in a fixed order,
+        every line is checked against the stock left by the lines before it
+        (reserve), and only then is stock taken (commit). Orders over
+        disjoint products never wait for each other.
+        Args:
+            shopping_list (list of tuples):
+            Each tuple contains a Product object and the quantity to buy (int).
+        Returns:
+            float: Total price of the order.
+        Raises:
+            Exception: If any line cannot be purchased; no stock is taken.
+        """
+        shopping_list = list(shopping_list)
+        with lock_products(products for products, _ in shopping_list):
+            reserved = {}
+            total_price = self._reserve_order(shopping_list, reserved)
+            self._commit_reserved(reserved)
+        return total_price
+
+    def order_bulk(self, shopping_list) -> float:
+        """
+        Processes an order for multiple products, all or nothing, with
+        repeated lines for a product merged into one.
+
+        Pricing policy: every product is priced once, on the sum of its
+        quantities in the order, so a promotion sees the combined quantity
+        (two lines of one unit under "second half price" cost one and a
+        half units). A LimitedProduct's maximum likewise applies to the
+        combined quantity. Stock is checked and taken once per product.
+        Args:
+            shopping_list (list of tuples):
+            Each tuple contains a Product object and the quantity to buy (int).
+        Returns:
+            float: Total price of the order.
+        Raises:
+            Exception: If any product cannot be purchased; no stock is taken.
+        """
+        lines = self._coalesce(shopping_list)
+        with lock_products(lines):
+            reserved = {}
+            total_price = self._reserve_order(lines.items(), reserved)
+            self._commit_reserved(reserved)
+        return total_price
+
+    def order_batch(self, orders) -> list:
+        """
+        Processes many orders in one pass.
+        Each order is coalesced and priced as in order_bulk, on its own
+        quantities (promotions never span orders). Orders are checked in
+        sequence against the stock left by the orders before them; an order
+        that fails is rejected whole and the others go through. Stock is
+        then taken once per product for the whole batch.
+        Args:
+            orders (list of shopping lists): As for order_bulk.
+        Returns:
+            list: For each order, its total price or the exception that
+            rejected it.
+        """
+        coalesced = []
+        for shopping_list in orders:
             try:
-                total_price += products.buy(quantity)
-            except Exception as e:
-                print(f"Could not buy {products.name}: {e}")
+                coalesced.append(self._coalesce(shopping_list))
+            except ValueError as e:
+                coalesced.append(e)
+        results = []
+        with lock_products(products for lines in coalesced
+                           if isinstance(lines, dict) for products in lines):
+            reserved = {}
+            for lines in coalesced:
+                if isinstance(lines, Exception):
+                    results.append(lines)
+                    continue
+                try:
+                    results.append(self._reserve_order(lines.items(), reserved))
+                except Exception as e:
+                    results.append(e)
+            self._commit_reserved(reserved)
+        return results
+
+    @staticmethod
+    def _coalesce(shopping_list) -> dict:
+        """Sum the quantities of each product in an order, in first-seen order."""
+        lines = {}
+        for products, quantity in shopping_list:
+            if not isinstance(products, Product):
+                raise ValueError(f"Order line must name a Product: {products!r}")
+            if not isinstance(quantity, int) or quantity <= 0:
+                raise ValueError("Quantity must be a positive integer.")
+            lines[products] = lines.get(products, 0) + quantity
+        return lines
+
+    @staticmethod
+    def _reserve_order(shopping_list, reserved) -> float:
+        """
+        Check every line of an order against the stock left after `reserved`
+        and return its total price. The order's quantities are added to
+        `reserved` only if every line passes. Product locks must be held.
+        """
+        pending = {}
+        total_price = 0
+        for products, quantity in shopping_list:
+            already = reserved.get(products, 0) + pending.get(products, 0)
+            products._check_purchase(quantity, already)
+            pending[products] = pending.get(products, 0) + quantity
+            total_price += products._price_for(quantity)
+        for products, quantity in pending.items():
+            reserved[products] = reserved.get(products, 0) + quantity
         return total_price
 
+    @staticmethod
+    def _commit_reserved(reserved):
+        """Take reserved quantities out of stock, one update per product."""
+        for products, quantity in reserved.items():
+            products._commit_purchase(quantity)
+
+    async def order_async(self, shopping_list) -> float:
+        """
+        Processes an order from asyncio code, all or nothing.
+        Concurrent calls are micro-batched by the store's AsyncOrderService;
+        see configure_async_orders() for the batching knobs.
+        Returns:
+            float: Total price of the order.
+        Raises:
+            Exception: If any line cannot be purchased; no stock is taken.
+        """
+        if self._order_service is None:
+            self.configure_async_orders()
+        return await self._order_service.submit(shopping_list)
+
+    def configure_async_orders(self, max_batch_size=64, batch_window=0.002, max_pending=1024):
+        """Set up the async order service with the given batching knobs."""
+        if self._order_service is not None:
+            self._order_service.close()
+        self._order_service = AsyncOrderService(
+            self, max_batch_size=max_batch_size, batch_window=batch_window,
+            max_pending=max_pending,
+        )
+        return self._order_service
+
+    @property
+    def reservations(self) -> ReservationBook:
+        """The store's reservation book, created on first use."""
+        with self._lock:
+            if self._reservations is None:
+                self._reservations = ReservationBook()
+            return self._reservations
+
+    def reserve(self, shopping_list, ttl=900) -> Reservation:
+        """
+        Hold stock for a shopping list while the customer checks out.
+        Held units are left out of Product.available and cannot be bought
+        by anyone else until the reservation is committed, released, or
+        expires after `ttl` seconds. Lines are coalesced as in order_bulk.
+        Raises:
+            Exception: If any product cannot be purchased; nothing is held.
+        """
+        return self.reservations.reserve(self._coalesce(shopping_list), ttl)
+
+    def commit(self, reservation) -> float:
+        """Buy a reservation's stock at current prices. Returns the total price."""
+        return self.reservations.commit(reservation, self)
+
+    def release(self, reservation) -> bool:
+        """Give a reservation's stock back. Returns False if it was not held."""
+        return self.reservations.release(reservation)
+
+    def quote_many(self, carts) -> np.ndarray:
+        """
+        Price many shopping lists at once without buying anything.
+        Args:
+            carts (list of shopping lists):
+            Each shopping list holds (Product, quantity) tuples as for order().
+        Returns:
+            np.ndarray: The total price of each cart, promotions applied.
+            Stock and active status are not checked.
+        Raises:
+            ValueError: If a quantity is not a positive integer.
+        """
+        cart_ids, items, prices, quantities, promotions = [], [], [], [], {}
+        line = cart_count = 0
+        for cart_id, shopping_list in enumerate(carts):
+            cart_count = cart_id + 1
+            for products, quantity in shopping_list:
+                if not isinstance(quantity, int) or quantity <= 0:
+                    raise ValueError("Quantity must be a positive integer.")
+                cart_ids.append(cart_id)
+                items.append(products)
+                prices.append(products.price)
+                quantities.append(quantity)
+                promotions.setdefault(products.promotion, []).append(line)
+                line += 1
+        prices = np.array(prices, dtype=np.float64)
+        quantities = np.array(quantities, dtype=np.int64)
+        line_totals = np.empty(line, dtype=np.float64)
+        # Each promotion prices all of its lines in one vectorized call.
+        for promotion, lines in promotions.items():
+            lines = np.array(lines, dtype=np.intp)
+            if promotion is None:
+                line_totals[lines] = prices[lines] * quantities[lines]
+            elif not _has_batch(promotion):
+                # apply_promotion may read any attribute, so it gets the product.
+                for i in lines.tolist():
+                    line_totals[i] = promotion.apply_promotion(items[i], int(quantities[i]))
+            else:
+                line_totals[lines] = promotion.apply_promotion_batch(prices[lines], quantities[lines])
+        return np.bincount(np.array(cart_ids, dtype=np.intp), weights=line_totals,
+                           minlength=cart_count)
+
+    def __contains__(self, product):
+        """Check if a product (or a product name) exists in the store using 'in' operator"""
+        if isinstance(product, str):
+            return product in self._names
+        return product in self._slots
+
+    def __add__(self, others):
+        """Combine two stores using + operator; see merge()."""
+        if not isinstance(others, (Store, MergedStore)):
+            return NotImplemented
+        return self.merge(others)
+
+    def merge(self, *others) -> "MergedStore":
+        """
+        Return a live view over this store and others, without copying them.
+        Products found in several stores appear once in the view.
+        """
+        return MergedStore((self,) + others)
+
+
+class MergedStore:
+    """
+    Read-mostly view over several stores.
+
+    Nothing is copied: listings walk the source stores lazily, in store
+    order, and see later changes to them. A product held by more than one
+    store (or more than once by one store) is listed and counted once. Call
+    materialize() for an independent Store.
+    """
+
+    def __init__(self, stores):
+        flat = {}
+        for source in stores:
+            for store in (source._stores if isinstance(source, MergedStore) else (source,)):
+                flat[store] = None
+        if not flat:
+            raise ValueError("A merged store needs at least one store")
+        self._stores = tuple(flat)
+        self._duplicates_cache = None
+
+    @property
+    def stores(self):
+        """The source stores, in lookup order."""
+        return self._stores
+
+    @property
+    def product(self) -> Tuple[Product, ...]:
+        """Return all products, each once, in store then insertion order (read-only)."""
+        return tuple(self.iter_products(active_only=False))
+
+    def _duplicates(self) -> dict:
+        """
+        Map each product held more than once across the stores to its
+        extra occurrence count. Recomputed only after products are added
+        to or removed from a source store.
+        """
+        versions = tuple(store._membership_version for store in self._stores)
+        cached = self._duplicates_cache
+        if cached is not None and cached[0] == versions:
+            return cached[1]
+        counts = {}
+        for store in self._stores:
+            with store._lock:
+                for product, slots in store._slots.items():
+                    counts[product] = counts.get(product, 0) + len(slots)
+        duplicates = {product: count - 1 for product, count in counts.items() if count > 1}
+        self._duplicates_cache = (versions, duplicates)
+        return duplicates
+
+    def iter_products(self, active_only=True, predicate=None, page_size=1024):
+        """Yield each product of the union once, store by store, lazily."""
+        duplicates = self._duplicates()
+        seen = set()
+        for store in self._stores:
+            for product in store.iter_products(active_only, predicate, page_size):
+                if product in duplicates:
+                    if product in seen:
+                        continue
+                    seen.add(product)
+                yield product
+
+    def __iter__(self):
+        return self.iter_products(active_only=False)
+
+    def get_all_products(self) -> List[Product]:
+        """Return all active products of the union, each once."""
+        return list(self.iter_products())
+
+    def get_total_quantity(self) -> int:
+        """Return the total quantity of the union, counting each product once."""
+        total = sum(store.get_total_quantity() for store in self._stores)
+        for product, extra in self._duplicates().items():
+            total -= product.quantity * extra
+        return total
+
+    def get_product(self, name) -> Optional[Product]:
+        """Return the first product with the given name, searching stores in order."""
+        for store in self._stores:
+            product = store.get_product(name)
+            if product is not None:
+                return product
+        return None
+
     def __contains__(self, product):
-        """Check if a product exists in the store using 'in' operator"""
-        return product in self.product
+        """Check if a product (or a product name) is in any of the stores."""
+        return any(product in store for store in self._stores)
+
+    def order(self, shopping_list) -> float:
+        """Processes an order across the stores, as Store.order."""
+        # Purchases act on the products themselves, so any source store
+        # can place the order.
+        return self._stores[0].order(shopping_list)
+
+    def place_order(self, shopping_list) -> OrderResult:
+        """Processes an order across the stores, as Store.place_order."""
+        return self._stores[0].place_order(shopping_list)
+
+    def order_atomic(self, shopping_list) -> float:
+        """Processes an all-or-nothing order across the stores, as Store.order_atomic."""
+        return self._stores[0].order_atomic(shopping_list)
+
+    def order_bulk(self, shopping_list) -> float:
+        """Processes a coalesced order across the stores, as Store.order_bulk."""
+        return self._stores[0].order_bulk(shopping_list)
+
+    def order_batch(self, orders) -> list:
+        """Processes many orders across the stores, as Store.order_batch."""
+        return self._stores[0].order_batch(orders)
+
+    def materialize(self) -> Store:
+        """Copy the union into a new, independent Store."""
+        return Store(self.iter_products(active_only=False))
 
     def __add__(self, others):
-        """Combine two stores using + operator"""
-        if not isinstance(others, Store):
+        """Extend the view with another store or view."""
+        if not isinstance(others, (Store, MergedStore)):
             return NotImplemented
-        combined_product = self.product + others.product
-        return Store(combined_product)
+        return MergedStore((self, others))
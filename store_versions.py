@@ -0,0 +1,83 @@
+from collections import namedtuple
+
+# Slots per chunk; publishing a version copies only the chunks that changed.
+CHUNK_BITS = 8
+
+ProductState = namedtuple("ProductState", "product name price quantity active promotion")
+ProductState.__doc__ = "Immutable copy of a product's fields at one store version."
+
+
+def state_of(product) -> ProductState:
+    return ProductState(product, product.name, product.price, product.quantity,
+                        product.active, product.promotion)
+
+
+class StoreVersion:
+    """
+    Immutable, consistent view of a store at one version.
+
+    Product states are held in chunks of consecutive slots. A new version
+    shares every chunk with the previous one except those holding products
+    that changed, so publishing costs O(changed products + chunk count)
+    rather than a copy of the catalog. Nothing here is ever mutated, so
+    readers need no locks; a version is freed as soon as no reader holds it.
+    """
+
+    def __init__(self, version, chunks, total_quantity, count):
+        self.version = version
+        self._chunks = chunks
+        self._total_quantity = total_quantity
+        self._count = count
+
+    @classmethod
+    def publish(cls, previous, version, products, changed) -> "StoreVersion":
+        """
+        Build the version after `previous` (None for the first one).
+        Args:
+            previous: The last published StoreVersion, or None
+            version: Number of the new version
+            products: The store's current slot -> product mapping
+            changed: Slots added, removed or modified since `previous`
+        """
+        chunks = list(previous._chunks) if previous is not None else []
+        total_quantity = previous._total_quantity if previous is not None else 0
+        count = previous._count if previous is not None else 0
+        copied = {}
+        for slot in sorted(changed):
+            index = slot >> CHUNK_BITS
+            chunk = copied.get(index)
+            if chunk is None:
+                if index >= len(chunks):
+                    chunks.extend({} for _ in range(index + 1 - len(chunks)))
+                chunk = copied[index] = dict(chunks[index])
+                chunks[index] = chunk
+            # Updating in place keeps each chunk in slot order.
+            product = products.get(slot)
+            old = chunk.get(slot) if product is not None else chunk.pop(slot, None)
+            if old is not None:
+                total_quantity -= old.quantity
+                count -= 1
+            if product is not None:
+                new = chunk[slot] = state_of(product)
+                total_quantity += new.quantity
+                count += 1
+        return cls(version, tuple(chunks), total_quantity, count)
+
+    def __iter__(self):
+        """Yield the state of every product, in the order they were added."""
+        for chunk in self._chunks:
+            yield from chunk.values()
+
+    def __len__(self):
+        return self._count
+
+    def get_all_products(self) -> list:
+        """Return the states of all active products."""
+        return [state for chunk in self._chunks for state in chunk.values() if state.active]
+
+    def get_total_quantity(self) -> int:
+        """Return the total quantity of all products at this version."""
+        return self._total_quantity
+
+    def __repr__(self):
+        return f"StoreVersion({self.version}, {self._count} products)"
@@ -0,0 +1,23 @@
+import benchmark
+
+
+class TestBenchmark:
+    """Smoke tests for the benchmark suite"""
+
+    def test_run_size_reports_every_hot_path(self):
+        """Test that a tiny run reports throughput, latency and memory"""
+        results = benchmark.run_size(50, calls=20)
+        for name in ("order", "buy", "contains", "get_total_quantity",
+                     "get_all_products", "store_add"):
+            assert results[name]["ops_per_sec"] > 0
+            assert results[name]["p50_us"] <= results[name]["p99_us"]
+        assert results["peak_memory_mb"] > 0
+
+    def test_compare_flags_regressions(self):
+        """Test that a throughput drop beyond the tolerance is reported"""
+        baseline = {"1000": {"order": {"ops_per_sec": 1000.0}, "peak_memory_mb": 1.0}}
+        slower = {"1000": {"order": {"ops_per_sec": 700.0}, "peak_memory_mb": 1.0}}
+        faster = {"1000": {"order": {"ops_per_sec": 900.0}, "peak_memory_mb": 1.0}}
+
+        assert len(benchmark.compare(slower, baseline, tolerance=0.25)) == 1
+        assert benchmark.compare(faster, baseline, tolerance=0.25) == []
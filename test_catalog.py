@@ -0,0 +1,103 @@
+import pytest
+
+from catalog import ProductTable
+from product import LimitedProduct, NonStockedProduct, Product, PurchaseError
+from promotion import SecondHalfPrice
+from store import Store
+
+
+class TestProductTable:
+    """Test suite for the columnar ProductTable catalog"""
+
+    @pytest.fixture
+    def table(self):
+        """Fixture to create a small table with a promotion"""
+        table = ProductTable(capacity=2)
+        table.append("MacBook", 1450, 100)
+        table.append("Bose Earbuds", 250, 500, promotion=SecondHalfPrice("Half"))
+        table.append("Google Pixel", 500, 250)
+        return table
+
+    def test_views_read_columns(self, table):
+        """Test that views expose the row data like a Product"""
+        view = table[1]
+        assert isinstance(view, Product)
+        assert view.name == "Bose Earbuds"
+        assert view.price == 250.0
+        assert view.quantity == 500
+        assert view.active is True
+        assert view.promotion.name == "Half"
+
+    def test_view_identity_is_stable(self, table):
+        """Test that the same view object is returned for a row"""
+        assert table[0] is table[0]
+
+    def test_buy_writes_through(self, table):
+        """Test that buying through a view updates the arrays"""
+        total = table[1].buy(3)
+        assert total == 625.0
+        assert table.total_quantity() == 847
+
+    def test_sell_out_deactivates(self, table):
+        """Test that selling out a row clears its active flag"""
+        table[2].buy(250)
+        assert list(table.active_rows()) == [0, 1]
+        assert table[2].active is False
+
+    def test_store_with_views(self, table):
+        """Test that a Store built from views keeps its totals correct"""
+        store = Store(table.products())
+        store.order([(table[0], 10), (table[2], 250)])
+        assert store.get_total_quantity() == table.total_quantity() == 590
+        assert store.get_all_products() == [table[0], table[1]]
+
+    def test_inventory_value_and_price_range(self, table):
+        """Test vectorized valuation and price filtering"""
+        assert table.inventory_value() == 1450 * 100 + 250 * 500 + 500 * 250
+        table[0].deactivate()
+        assert list(table.rows_in_price_range(200, 1500)) == [1, 2]
+        assert table.products_in_price_range(0, 300) == [table[1]]
+        assert len(table.products_in_price_range(0, 2000, active_only=False)) == 3
+
+    def test_extend_validates_in_bulk(self, table):
+        """Test bulk appends and their validation"""
+        rows = table.extend(["A", "B"], [1.0, 2.5], [3, 4])
+        assert list(rows) == [3, 4]
+        assert table[4].price == 2.5
+        with pytest.raises(ValueError):
+            table.extend(["C"], [-1.0], [1])
+        with pytest.raises(ValueError):
+            table.extend(["C"], [1.0], [1.5])
+
+    def test_from_products(self):
+        """Test copying regular products into a table"""
+        table = ProductTable.from_products([Product("A", 10, 1), Product("B", 20, 2)])
+        assert len(table) == 2
+        assert table.inventory_value() == 50.0
+
+    def test_from_limited_products(self):
+        """Test that limited product rows keep their maximum per purchase"""
+        table = ProductTable.from_products([LimitedProduct("PS", 600, 5, maximum=1)])
+        view = table[0]
+        assert isinstance(view, LimitedProduct)
+        assert view.maximum == 1
+        with pytest.raises(PurchaseError):
+            view.buy(2)
+        assert view.buy(1) == 600
+        assert view.to_record()["maximum"] == 1
+
+    def test_from_non_stocked_products(self):
+        """Test that non-stocked product rows can be bought without stock"""
+        table = ProductTable.from_products([NonStockedProduct("E-Book", 20)])
+        view = table[0]
+        assert isinstance(view, NonStockedProduct)
+        assert view.buy(3) == 60
+        assert view.quantity == 0 and view.active is True
+
+    def test_from_products_rejects_other_types(self):
+        """Test that product subclasses with unknown rules are refused"""
+        class Custom(Product):
+            pass
+
+        with pytest.raises(ValueError):
+            ProductTable.from_products([Custom("A", 1, 1)])
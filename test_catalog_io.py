@@ -0,0 +1,115 @@
+import pytest
+
+from catalog_io import RowError, export_products, iter_products, load_store
+from product import LimitedProduct, NonStockedProduct, Product
+from promotion import PercentDiscount
+from store import Store
+
+
+class TestCatalogIO:
+    """Test suite for streaming catalog import and export"""
+
+    @pytest.fixture
+    def promotions(self):
+        """Fixture with the promotions known to the application"""
+        return {"30% off!": PercentDiscount("30% off!", 30)}
+
+    @pytest.fixture
+    def products(self, promotions):
+        """Fixture with one product of each type"""
+        ebook = NonStockedProduct("Python E-Book", 30)
+        ebook.set_promotion(promotions["30% off!"])
+        cable = Product("USB-C Cable", 10, 200)
+        cable.deactivate()
+        return [
+            Product("Bose Headphones", 250, 500),
+            cable,
+            ebook,
+            LimitedProduct("PlayStation 5", 600, 5, maximum=1),
+        ]
+
+    @pytest.mark.parametrize("suffix", ["csv", "jsonl"])
+    def test_round_trip(self, products, promotions, tmp_path, suffix):
+        """Test exporting and re-importing every product type"""
+        path = tmp_path / f"catalog.{suffix}"
+        assert export_products(products, path) == 4
+
+        loaded = list(iter_products(path, promotions, chunk_size=3))
+        assert [item.to_record() for item in loaded] == [item.to_record() for item in products]
+        assert [type(item) for item in loaded] == [type(item) for item in products]
+        assert loaded[2].promotion is promotions["30% off!"]
+        assert loaded[3].buy(1) == 600.0
+
+    def test_row_errors_are_reported(self, promotions, tmp_path):
+        """Test row-level errors with on_error while valid rows still load"""
+        path = tmp_path / "catalog.csv"
+        path.write_text(
+            "type,name,price,quantity,active,promotion,maximum\n"
+            "Product,Good,10,5,true,,\n"
+            "Product,Negative,-1,5,true,,\n"
+            "Product,,10,5,true,,\n"
+            "Product,BadQty,10,2.5,true,,\n"
+            "Product,NoPromo,10,5,true,Missing,\n"
+            "Gadget,Unknown,10,5,true,,\n"
+            "Product,Also good,12.5,1,false,,\n"
+        )
+        errors = []
+        loaded = list(iter_products(path, promotions, on_error=errors.append))
+
+        assert [item.name for item in loaded] == ["Good", "Also good"]
+        assert loaded[1].active is False
+        assert [error.row_number for error in errors] == [2, 3, 4, 5, 6]
+        assert "Price must be a non negative number" in str(errors[0])
+        assert "Unknown promotion" in str(errors[3])
+
+    @pytest.mark.parametrize("chunk_size", [1, 4096])
+    def test_fast_and_reference_paths_agree(self, tmp_path, chunk_size):
+        """Test that both paths accept and reject the same rows"""
+        path = tmp_path / "catalog.csv"
+        path.write_text(
+            "type,name,price,quantity,active,promotion,maximum\n"
+            "Product,NoQty,10,,true,,\n"
+            "LimitedProduct,BadMax,600,5,true,,abc\n"
+            "LimitedProduct,NegMax,600,5,true,,-3\n"
+            "NonStockedProduct,E-Book,30,,true,,\n"
+            "LimitedProduct,PS5,600,5,true,,1\n"
+            "Product,Warehouse,1,100000000000000000000,true,,\n"
+        )
+        errors = []
+        loaded = list(iter_products(path, on_error=errors.append, chunk_size=chunk_size))
+
+        assert [item.name for item in loaded] == ["E-Book", "PS5", "Warehouse"]
+        assert loaded[1].maximum == 1
+        assert loaded[2].quantity == 10 ** 20
+        assert [error.row_number for error in errors] == [1, 2, 3]
+        assert "Maximum must be a positive integer" in str(errors[1])
+
+        path = tmp_path / "catalog.jsonl"
+        path.write_text('5\nnull\n[1]\n{"name": "A", "price": 1, "quantity": 1}\n')
+        errors = []
+        loaded = list(iter_products(path, on_error=errors.append, chunk_size=chunk_size))
+
+        assert [item.name for item in loaded] == ["A"]
+        assert [error.row_number for error in errors] == [1, 2, 3]
+
+    def test_first_error_raises_by_default(self, tmp_path):
+        """Test that without on_error the first bad row raises"""
+        path = tmp_path / "catalog.jsonl"
+        path.write_text('{"name": "A", "price": 1, "quantity": 1}\nnot json\n')
+        with pytest.raises(RowError, match="Row 2"):
+            list(iter_products(path))
+
+    def test_load_store(self, products, promotions, tmp_path):
+        """Test streaming a catalog into a store"""
+        path = tmp_path / "catalog.jsonl"
+        export_products(products, path)
+        store = Store([])
+
+        assert load_store(store, path, promotions, chunk_size=2) == 4
+        assert store.get_total_quantity() == 705
+        assert len(store.get_all_products()) == 3
+
+    def test_unsupported_format(self, tmp_path):
+        """Test that unknown extensions are rejected"""
+        with pytest.raises(ValueError):
+            export_products([], tmp_path / "catalog.xml")
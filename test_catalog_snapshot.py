@@ -0,0 +1,82 @@
+import pytest
+
+from catalog_snapshot import open_snapshot, write_snapshot
+from product import LimitedProduct, NonStockedProduct, Product
+from promotion import SecondHalfPrice
+from store import Store
+
+PROMOTIONS = {"Second Half Price!": SecondHalfPrice("Second Half Price!")}
+
+
+class TestCatalogSnapshot:
+    """Test suite for memory-mapped catalog snapshots"""
+
+    @pytest.fixture
+    def store(self):
+        """Fixture to create a store with one product of each type and state"""
+        bose = Product("Bose Headphones", 250, 500)
+        bose.set_promotion(PROMOTIONS["Second Half Price!"])
+        cable = Product("USB-C Cable", 10, 200)
+        cable.deactivate()
+        return Store([
+            bose,
+            Product("MacBook Air M2", 1450, 100),
+            cable,
+            NonStockedProduct("Python E-Book", 30),
+            LimitedProduct("PlayStation 5", 600, 5, maximum=1),
+        ])
+
+    @pytest.fixture
+    def path(self, tmp_path, store):
+        """Fixture to write the store to a snapshot file"""
+        path = tmp_path / "catalog.bbcat"
+        assert write_snapshot(store, path) == 5
+        return path
+
+    def test_round_trip(self, store, path):
+        """Test that every product field survives a snapshot"""
+        with open_snapshot(path, PROMOTIONS) as mapped:
+            assert len(mapped) == 5
+            assert [item.to_record() for item in mapped.product] == \
+                [item.to_record() for item in store.product]
+            assert isinstance(mapped.get_product("PlayStation 5"), LimitedProduct)
+            assert mapped.get_product("Python E-Book").promotion is None
+
+    def test_products_materialize_lazily(self, path):
+        """Test that opening builds no products and lookups build only one"""
+        with open_snapshot(path, PROMOTIONS) as mapped:
+            assert mapped._products == {}
+            assert mapped.get_total_quantity() == 805
+            mac = mapped.get_product("MacBook Air M2")
+            assert mapped.get_product("MacBook Air M2") is mac
+            assert mapped.get_product("Missing") is None
+            assert len(mapped._products) == 1
+            assert "MacBook Air M2" in mapped and mac in mapped
+
+    def test_listing_and_orders(self, path, capsys):
+        """Test that listing skips inactive products and orders update totals"""
+        with open_snapshot(path, PROMOTIONS) as mapped:
+            page, cursor = mapped.list_products(limit=2)
+            assert [item.name for item in page] == ["Bose Headphones", "MacBook Air M2"]
+            page, cursor = mapped.list_products(limit=5, cursor=cursor)
+            assert [item.name for item in page] == ["Python E-Book", "PlayStation 5"]
+            assert cursor is None
+
+            bose = mapped.get_product("Bose Headphones")
+            assert mapped.order([(bose, 2), (mapped.get_product("PlayStation 5"), 2)]) == 375
+            assert "maximum purchase limit" in capsys.readouterr().out
+            assert mapped.get_total_quantity() == 803
+            assert mapped.to_store().get_total_quantity() == 803
+
+    def test_rejects_bad_files(self, tmp_path, path):
+        """Test that unknown promotions and foreign files are refused"""
+        with pytest.raises(ValueError):
+            open_snapshot(path)
+        other = tmp_path / "other.bin"
+        other.write_bytes(b"x" * 64)
+        with pytest.raises(ValueError):
+            open_snapshot(other)
+        for size in (0, 10, 100):
+            other.write_bytes(path.read_bytes()[:size])
+            with pytest.raises(ValueError):
+                open_snapshot(other, PROMOTIONS)
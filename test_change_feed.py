@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+from change_feed import ChangeFeed, FeedOverflow
+from product import Product
+from promotion import PercentDiscount
+from store import Store
+
+
+class TestChangeFeed:
+    """Test suite for the store change feed"""
+
+    @pytest.fixture
+    def mac(self):
+        """Fixture to create a product to watch"""
+        return Product("MacBook", 1450, 100)
+
+    @pytest.fixture
+    def store(self, mac):
+        """Fixture to create a store holding the product"""
+        return Store([mac])
+
+    def test_records_setters_and_membership(self, store, mac):
+        """Test that setters and add/remove appear in order with sequence numbers"""
+        feed = ChangeFeed(store)
+        subscriber = feed.subscribe()
+        mac.buy(2)
+        mac.price = 1400
+        mac.set_promotion(PercentDiscount("10% off!", 10))
+        pixel = Product("Pixel", 500, 10)
+        store.add_product(pixel)
+        store.remove_product(pixel)
+
+        changes = subscriber.poll()
+        assert [change.seq for change in changes] == [1, 2, 3, 4, 5]
+        assert [(change.name, change.field) for change in changes] == [
+            ("MacBook", "quantity"), ("MacBook", "price"), ("MacBook", "promotion"),
+            ("Pixel", "added"), ("Pixel", "removed"),
+        ]
+        assert (changes[0].old, changes[0].new) == (100, 98)
+        assert subscriber.poll() == []
+        assert subscriber.lag == 0
+
+    def test_batches_and_independent_subscribers(self, store, mac):
+        """Test that subscribers consume at their own pace in bounded batches"""
+        feed = ChangeFeed(store)
+        fast, slow = feed.subscribe(), feed.subscribe()
+        for _ in range(10):
+            mac.buy(1)
+        assert len(fast.poll(max_items=4)) == 4
+        assert len(fast.poll()) == 6
+        assert slow.lag == 10
+        assert [change.new for change in slow.poll(3)] == [99, 98, 97]
+        late = feed.subscribe(from_start=True)
+        assert len(late.poll()) == 10
+
+    def test_overflow_signal(self, store, mac):
+        """Test that a slow subscriber gets FeedOverflow and then resumes"""
+        feed = ChangeFeed(store, capacity=4)
+        subscriber = feed.subscribe()
+        for _ in range(6):
+            mac.buy(1)
+        with pytest.raises(FeedOverflow) as overflow:
+            subscriber.poll()
+        assert overflow.value.missed == 2
+        assert overflow.value.resume_seq == 3
+        assert [change.seq for change in subscriber.poll()] == [3, 4, 5, 6]
+
+    def test_writers_do_not_wait_for_subscribers(self, store, mac):
+        """Test that a concurrent reader sees every change in order or an overflow"""
+        mac.quantity = 100_000
+        feed = ChangeFeed(store, capacity=256)
+        subscriber = feed.subscribe()
+        seen = []
+        overflows = []
+        done = threading.Event()
+
+        def reader():
+            while not done.is_set() or subscriber.lag:
+                try:
+                    seen.extend(change.seq for change in subscriber.poll(64))
+                except FeedOverflow as e:
+                    overflows.append(e)
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        for _ in range(5000):
+            mac.buy(1)
+        done.set()
+        thread.join()
+        assert seen == sorted(seen)
+        assert len(seen) + sum(e.missed for e in overflows) == 5000
+
+    def test_close_stops_recording(self, store, mac):
+        """Test that a closed feed records nothing"""
+        feed = ChangeFeed(store)
+        feed.close()
+        mac.buy(1)
+        assert feed.head == 1
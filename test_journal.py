@@ -0,0 +1,141 @@
+import pytest
+
+from journal import InventoryJournal, recover
+from catalog import ProductTable
+from product import LimitedProduct, NonStockedProduct, Product
+from promotion import SecondHalfPrice
+from store import Store
+
+
+class TestInventoryJournal:
+    """Test suite for the write-ahead journal and recovery"""
+
+    @pytest.fixture
+    def promotions(self):
+        """Fixture with the promotions known to the application"""
+        return {"Half": SecondHalfPrice("Half")}
+
+    @pytest.fixture
+    def store(self, promotions):
+        """Fixture to create a store with one product of each type"""
+        bose = Product("Bose", 250, 500)
+        bose.set_promotion(promotions["Half"])
+        return Store([
+            bose,
+            NonStockedProduct("E-Book", 30),
+            LimitedProduct("PlayStation 5", 600, 5, maximum=1),
+        ])
+
+    def test_recover_from_log_only(self, store, promotions, tmp_path):
+        """Test replaying a log without a snapshot"""
+        journal = InventoryJournal(Store([]), tmp_path, flush_interval=0)
+        for item in store.product:
+            journal.store.add_product(item)
+        store.product[0].buy(3)
+        store.product[2].deactivate()
+        store.product[1].price = 35
+        journal.close()
+
+        recovered, info = recover(tmp_path, promotions)
+        assert [str(item) for item in recovered.product] == [str(item) for item in store.product]
+        assert recovered.get_product("PlayStation 5").active is False
+        assert recovered.get_product("Bose").promotion is promotions["Half"]
+        assert info["snapshot_products"] == 0
+        assert info["replayed"] > 0
+
+    def test_recover_snapshot_plus_tail(self, store, promotions, tmp_path):
+        """Test that recovery replays only the log after the snapshot"""
+        journal = InventoryJournal(store, tmp_path, flush_interval=0)
+        store.product[0].buy(10)
+        journal.snapshot()
+        store.product[0].buy(5)
+        store.product[0].promotion = None
+        journal.close()
+
+        recovered, info = recover(tmp_path, promotions)
+        assert recovered.get_product("Bose").quantity == 485
+        assert recovered.get_product("Bose").promotion is None
+        assert info["snapshot_products"] == 3
+        assert info["replayed"] == 2
+
+    def test_group_commit(self, store, tmp_path):
+        """Test that buffered records reach the log on close"""
+        journal = InventoryJournal(store, tmp_path, flush_interval=60, fsync=False)
+        for _ in range(50):
+            store.product[0].buy(1)
+        assert journal.flushes == 0
+        journal.close()
+
+        recovered, _ = recover(tmp_path, {"Half": SecondHalfPrice("Half")})
+        assert journal.records == 50
+        assert journal.flushes == 1
+        assert recovered.get_product("Bose").quantity == 450
+
+    def test_periodic_snapshots(self, store, promotions, tmp_path):
+        """Test automatic snapshots after a number of records"""
+        journal = InventoryJournal(store, tmp_path, flush_interval=0, snapshot_every=10)
+        for _ in range(25):
+            store.product[0].buy(1)
+            journal.flush()
+        journal.close()
+
+        recovered, info = recover(tmp_path, promotions)
+        assert journal.snapshots == 3  # one on attach, then every 10 records
+        assert info["replayed"] == 5
+        assert recovered.get_product("Bose").quantity == 475
+
+    def test_sequence_continues_after_restart(self, store, promotions, tmp_path):
+        """Test that a new journal continues numbering after recovery"""
+        journal = InventoryJournal(store, tmp_path, flush_interval=0)
+        store.product[0].buy(1)
+        journal.close()
+
+        recovered, _ = recover(tmp_path, promotions)
+        journal = InventoryJournal(recovered, tmp_path, flush_interval=0)
+        recovered.get_product("Bose").buy(1)
+        journal.close()
+
+        again, _ = recover(tmp_path, promotions)
+        assert again.get_product("Bose").quantity == 498
+
+    def test_products_sharing_a_name(self, tmp_path):
+        """Test that records are applied to the right product when names repeat"""
+        a, b = Product("Same", 1, 10), Product("Same", 2, 20)
+        store = Store([a, b])
+        journal = InventoryJournal(store, tmp_path, flush_interval=0)
+        b.buy(5)
+        store.add_product(Product("Same", 3, 30))
+        store.remove_product(a)
+        store.product[0].buy(1)
+        journal.close()
+
+        recovered, _ = recover(tmp_path)
+        assert [(item.price, item.quantity) for item in recovered.product] == [(2.0, 14), (3.0, 30)]
+
+    def test_same_instance_added_twice(self, tmp_path):
+        """Test that a product held in two slots is recovered as one product"""
+        item = Product("Cable", 10, 100)
+        store = Store([item, item])
+        journal = InventoryJournal(store, tmp_path, flush_interval=0)
+        store.add_product(item)
+        item.buy(10)
+        journal.close()
+
+        recovered, _ = recover(tmp_path)
+        assert len(recovered.product) == 3
+        assert len(set(recovered.product)) == 1
+        assert recovered.product[0].quantity == 90
+        assert recovered.get_total_quantity() == 270
+
+    def test_journal_product_views(self, tmp_path):
+        """Test that a store of table views can be journaled and recovered"""
+        table = ProductTable.from_products([Product("A", 10, 5),
+                                            LimitedProduct("PS", 600, 5, maximum=1)])
+        store = Store(table.products())
+        journal = InventoryJournal(store, tmp_path, flush_interval=0)
+        table[1].buy(1)
+        journal.close()
+
+        recovered, _ = recover(tmp_path)
+        assert isinstance(recovered.product[1], LimitedProduct)
+        assert recovered.product[1].quantity == 4
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+import metrics
+from product import LimitedProduct, Product
+from promotion import SecondHalfPrice
+from store import Store
+
+
+class TestMetrics:
+    """Test suite for hot-path instrumentation"""
+
+    @pytest.fixture(autouse=True)
+    def clean_metrics(self):
+        """Fixture to start every test with empty, enabled metrics"""
+        metrics.reset()
+        metrics.enable()
+        yield
+        metrics.disable()
+        metrics.set_profiler(None, 0)
+        metrics.reset()
+
+    @pytest.fixture
+    def store(self):
+        """Fixture to create a store with a promoted and a limited product"""
+        bose = Product("Bose", 250, 10)
+        bose.set_promotion(SecondHalfPrice("Half"))
+        return Store([bose, LimitedProduct("PlayStation 5", 600, 5, maximum=1)])
+
+    def counter(self, name, **labels):
+        for counter in metrics.snapshot()["counters"]:
+            if counter["name"] == name and counter["labels"] == labels:
+                return counter["value"]
+        return 0
+
+    def test_counts_and_failure_reasons(self, store, capsys):
+        """Test order/buy counters and failures by reason"""
+        bose, ps5 = store.product
+        store.order([(bose, 2), (ps5, 2), (bose, 20)])
+        store.get_all_products()
+
+        assert self.counter("order_total") == 1
+        assert self.counter("buy_total") == 3
+        assert self.counter("buy_failures_total", reason="over_maximum") == 1
+        assert self.counter("buy_failures_total", reason="insufficient_stock") == 1
+        assert self.counter("apply_promotion_total", promotion="SecondHalfPrice") == 1
+        assert self.counter("get_all_products_total") == 1
+
+    def test_disabled_collects_nothing(self, store):
+        """Test that nothing is recorded while instrumentation is off"""
+        metrics.disable()
+        store.order([(store.product[0], 1)])
+        assert metrics.snapshot() == {"counters": [], "histograms": []}
+
+    def test_exporters(self, store):
+        """Test the Prometheus text and JSON exports"""
+        store.order([(store.product[0], 1)])
+        text = metrics.to_prometheus()
+        assert "# TYPE bestbuy_order_total counter" in text
+        assert 'bestbuy_buy_seconds_bucket{le="+Inf"} 1' in text
+        assert "bestbuy_buy_seconds_count 1" in text
+        data = json.loads(metrics.to_json())
+        assert {histogram["name"] for histogram in data["histograms"]} >= {"order_seconds", "buy_seconds"}
+
+    def test_sampling_profiler_hook(self, store):
+        """Test that sampled orders run under the profiler hook"""
+        profiles = []
+        metrics.set_profiler(metrics.cprofile_hook(profiles), sample_rate=1.0)
+        store.order([(store.product[0], 1)])
+        assert len(profiles) == 1
+        assert profiles[0][1].total_calls > 0
+        with pytest.raises(ValueError):
+            metrics.set_profiler(None, sample_rate=2)
@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+
+from product import Product
+from store import Store
+
+
+class TestAsyncOrders:
+    """Test suite for micro-batched asyncio ordering"""
+
+    def test_each_caller_gets_its_own_result(self):
+        """Test that concurrent orders in one batch resolve independently"""
+        mac, bose = Product("MacBook", 1450, 3), Product("Bose", 250, 100)
+        store = Store([mac, bose])
+
+        async def run():
+            return await asyncio.gather(
+                store.order_async([(mac, 2)]),
+                store.order_async([(mac, 2), (bose, 1)]),
+                store.order_async([(bose, 4)]),
+                return_exceptions=True,
+            )
+
+        first, second, third = asyncio.run(run())
+        assert first == 2900.0
+        assert isinstance(second, Exception)
+        assert third == 1000.0
+        assert mac.quantity == 1
+        assert bose.quantity == 96
+        assert store.get_total_quantity() == 97
+
+    def test_orders_are_batched(self):
+        """Test that many concurrent orders are applied in few batches"""
+        item = Product("Cable", 10, 1000)
+        store = Store([item])
+        service = store.configure_async_orders(max_batch_size=50, batch_window=0.01)
+
+        async def run():
+            return await asyncio.gather(*(store.order_async([(item, 1)]) for _ in range(200)))
+
+        totals = asyncio.run(run())
+        assert totals == [10.0] * 200
+        assert item.quantity == 800
+        assert service.orders == 200
+        assert service.batches <= 8
+
+    def test_backpressure_with_small_queue(self):
+        """Test that submitters wait instead of failing when the queue is full"""
+        item = Product("Cable", 10, 1000)
+        store = Store([item])
+        store.configure_async_orders(max_batch_size=2, batch_window=0, max_pending=2)
+
+        async def run():
+            return await asyncio.gather(*(store.order_async([(item, 1)]) for _ in range(20)))
+
+        assert sum(asyncio.run(run())) == 200.0
+        assert item.quantity == 980
+
+    def test_invalid_configuration(self):
+        """Test that invalid batching knobs are rejected"""
+        store = Store([])
+        with pytest.raises(ValueError):
+            store.configure_async_orders(max_batch_size=0)
+        with pytest.raises(ValueError):
+            store.configure_async_orders(batch_window=-1)
+
+    def test_malformed_order_does_not_stall_the_batch(self):
+        """Test that a malformed line fails its caller only"""
+        mac, bose = Product("MacBook", 1450, 3), Product("Bose", 250, 100)
+        store = Store([mac, bose])
+
+        async def run():
+            return await asyncio.wait_for(asyncio.gather(
+                store.order_async([(mac, 1)]),
+                store.order_async([(mac,)]),
+                store.order_async([(bose, 2)]),
+                return_exceptions=True,
+            ), timeout=5)
+
+        first, second, third = asyncio.run(run())
+        assert first == 1450.0
+        assert isinstance(second, ValueError)
+        assert third == 500.0
+
+    def test_non_product_line_fails_its_caller_only(self):
+        """Test that a line naming something other than a Product fails only its order"""
+        mac = Product("MacBook", 1450, 3)
+        store = Store([mac])
+
+        async def run():
+            return await asyncio.gather(
+                store.order_async([(mac, 1)]),
+                store.order_async([("MacBook", 1)]),
+                return_exceptions=True,
+            )
+
+        first, second = asyncio.run(run())
+        assert first == 1450.0
+        assert isinstance(second, ValueError)
+        assert mac.quantity == 2
+
+    def test_loop_not_blocked_by_held_product_lock(self):
+        """Test that a batch waiting for a product lock leaves the loop running"""
+        mac = Product("MacBook", 1450, 3)
+        store = Store([mac])
+
+        async def run():
+            ticks = 0
+            with mac._lock:
+                order = asyncio.ensure_future(store.order_async([(mac, 1)]))
+                for _ in range(5):
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+                assert not order.done()
+            return ticks, await order
+
+        assert asyncio.run(run()) == (5, 1450.0)
+
+    def test_close_cancels_collected_batch(self):
+        """Test that orders taken off the queue but not applied are cancelled on close"""
+        item = Product("Cable", 10, 100)
+        store = Store([item])
+        service = store.configure_async_orders(batch_window=10)
+
+        async def run():
+            order = asyncio.ensure_future(store.order_async([(item, 1)]))
+            await asyncio.sleep(0.05)
+            service.close()
+            with pytest.raises(asyncio.CancelledError):
+                await asyncio.wait_for(order, timeout=5)
+
+        asyncio.run(run())
+        assert item.quantity == 100
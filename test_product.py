@@ -1,6 +1,11 @@
+import threading
+
 import pytest
 
-from product import Product
+from product import LimitedProduct, NonStockedProduct, Product
+from promotion import PercentDiscount, Promotion, PromotionStack, SecondHalfPrice, ThirdOneFree
+from quote_cache import QuoteCache
+from search import SearchIndex
 from store import Store
 
 
@@ -199,6 +204,101 @@ class TestStore:
         assert total == expected
         assert sample_products[0].get_quantity() == 85
 
+    def test_bulk_order_coalesces_lines(self, store, sample_products):
+        """Test that repeated lines are priced and taken as one"""
+        bose = sample_products[1]
+        bose.set_promotion(SecondHalfPrice("Second Half Price!"))
+        total = store.order_bulk([(bose, 1), (sample_products[0], 5), (bose, 1)])
+
+        assert total == 250 + 125 + 5 * 1450
+        assert bose.get_quantity() == 498
+        assert sample_products[0].get_quantity() == 95
+
+    def test_bulk_order_checks_combined_quantity(self, store, sample_products):
+        """Test that stock and maximum checks see the combined quantity"""
+        ps5 = LimitedProduct("PlayStation 5", 600, 5, maximum=1)
+        store.add_product(ps5)
+        with pytest.raises(Exception):
+            store.order_bulk([(ps5, 1), (ps5, 1)])
+        with pytest.raises(Exception):
+            store.order_bulk([(sample_products[0], 60), (sample_products[0], 50)])
+        with pytest.raises(ValueError):
+            store.order_bulk([(sample_products[0], 2), (sample_products[0], -1)])
+        assert ps5.get_quantity() == 5
+        assert sample_products[0].get_quantity() == 100
+
+    def test_order_batch_rejects_failing_orders_only(self, store, sample_products):
+        """Test that a batch reserves in sequence and commits once per product"""
+        mac, bose, _ = sample_products
+        changes = []
+        mac.quantity = 10
+        store.add_listener(lambda *change: changes.append(change))
+
+        results = store.order_batch([
+            [(mac, 4), (bose, 1)],
+            [(mac, 7)],
+            [(mac, 6)],
+            [(bose, 0)],
+        ])
+
+        assert results[0] == 4 * 1450 + 250
+        assert isinstance(results[1], Exception)
+        assert results[2] == 6 * 1450
+        assert isinstance(results[3], ValueError)
+        assert mac.get_quantity() == 0
+        assert [change[1] for change in changes if change[0] is mac].count("quantity") == 1
+
+    def test_order_batch_rejects_non_product_lines(self, store, sample_products):
+        """Test that a line naming something other than a Product fails only its order"""
+        mac = sample_products[0]
+        results = store.order_batch([[(mac, 1)], [("MacBook Air M2", 1)]])
+        assert results[0] == 1450
+        assert isinstance(results[1], ValueError)
+        assert mac.get_quantity() == 99
+
+    def test_place_order_reports_each_line(self, store, sample_products, capsys):
+        """Test that place_order returns per-line results without printing"""
+        mac, bose, pixel = sample_products
+        bose.set_promotion(SecondHalfPrice("Second Half Price!"))
+        pixel.deactivate()
+        ps5 = LimitedProduct("PlayStation 5", 600, 5, maximum=1)
+
+        result = store.place_order([(bose, 2), (mac, 101), (pixel, 1), (ps5, 2), (mac, 0), (mac, 1)])
+
+        assert capsys.readouterr().out == ""
+        assert [line.reason for line in result.lines] == [
+            None, "insufficient_stock", "inactive", "over_maximum", "invalid_quantity", None]
+        assert not result.ok
+        assert len(result.failed) == 4
+        first = result.lines[0]
+        assert first.status == "ok"
+        assert (first.unit_price, first.total_price) == (250, 375)
+        assert first.promotion is bose.promotion
+        assert result.total_price == 375 + 1450
+        assert mac.get_quantity() == 99
+        assert result.lines[3].message == "Cannot buy: maximum purchase limit is 1."
+
+    def test_legacy_order_prints_failures(self, store, sample_products, capsys):
+        """Test that order() still prints failed lines and returns the total"""
+        mac = sample_products[0]
+        assert store.order([(mac, 200), (mac, 1)]) == 1450
+        assert capsys.readouterr().out == "Could not buy MacBook: Cannot buy: not enough stock avaible.\n"
+
+    def test_pricing_error_is_reported_not_raised(self, store, sample_products, capsys):
+        """Test that a failing promotion skips its line without raising"""
+        class BrokenPromotion(Promotion):
+            def apply_promotion(self, product, quantity):
+                raise RuntimeError("promotion service down")
+
+        mac, bose, _ = sample_products
+        bose.set_promotion(BrokenPromotion("Broken"))
+        result = store.place_order([(mac, 1), (bose, 1)])
+        assert [line.reason for line in result.lines] == [None, "pricing_error"]
+        assert result.lines[1].message == "promotion service down"
+        assert (mac.quantity, bose.quantity) == (99, 500)
+        assert store.order([(mac, 1), (bose, 1)]) == 1450
+        assert capsys.readouterr().out == "Could not buy Bose Earbuds: promotion service down\n"
+
     def test_store_with_all_inactive_products(self, sample_products):
         """Test store where all products are inactive"""
         for product in sample_products:
@@ -239,3 +339,621 @@ class TestStore:
         total = store.order(shopping_list)
 
         assert total == 172500.0
+
+    # Test indexed lookup
+    def test_contains_uses_index(self, store, sample_products):
+        """Test 'in' works for product instances and product names"""
+        assert sample_products[0] in store
+        assert "MacBook" in store
+        assert Product("MacBook", 1450, 100) not in store
+        assert "Unknown" not in store
+
+    def test_get_product_by_name(self, store, sample_products):
+        """Test looking up a product by name"""
+        assert store.get_product("Bose Earbuds") is sample_products[1]
+        assert store.get_product("Unknown") is None
+
+    def test_remove_duplicate_product_once(self, store):
+        """Test removing one copy of a product that was added twice"""
+        new_product = Product("Tablet", 300, 20)
+        store.add_product(new_product)
+        store.add_product(new_product)
+
+        store.remove_product(new_product)
+        assert store.product.count(new_product) == 1
+        assert new_product in store
+        store.remove_product(new_product)
+        assert new_product not in store
+        assert store.get_product("Tablet") is None
+
+    def test_store_preserves_insertion_order(self, store, sample_products):
+        """Test that removal keeps the remaining products in order"""
+        store.remove_product(sample_products[1])
+        assert store.product == (sample_products[0], sample_products[2])
+
+    def test_store_product_is_read_only(self, store, sample_products):
+        """Test that the product listing cannot be mutated in place"""
+        with pytest.raises(AttributeError):
+            store.product.append(sample_products[0])
+        assert len(store.product) == 3
+
+    # Test incrementally maintained totals
+    def test_total_quantity_tracks_setter(self, store, sample_products):
+        """Test that setting a quantity updates the running total"""
+        sample_products[0].quantity = 40
+        assert store.get_total_quantity() == 790
+
+    def test_total_quantity_counts_duplicates(self, store):
+        """Test that a product added twice counts twice, as in a plain list"""
+        new_product = Product("Tablet", 300, 20)
+        store.add_product(new_product)
+        store.add_product(new_product)
+        new_product.buy(5)
+        assert store.get_total_quantity() == 850 + 30
+
+    def test_reactivated_product_keeps_position(self, store, sample_products):
+        """Test that a reactivated product is listed in its original position"""
+        sample_products[0].deactivate()
+        assert store.get_all_products() == sample_products[1:]
+        sample_products[0].activate()
+        assert store.get_all_products() == sample_products
+
+    def test_combined_store_tracks_changes(self, store, sample_products):
+        """Test that both source and combined stores see later changes"""
+        other = Store([Product("iPhone", 999, 50)])
+        combined = store + other
+        sample_products[2].buy(250)
+
+        assert combined.get_total_quantity() == 650
+        assert store.get_total_quantity() == 600
+        assert sample_products[2] not in combined.get_all_products()
+        assert len(combined.get_all_products()) == 3
+
+    def test_removed_product_no_longer_tracked(self, store, sample_products):
+        """Test that changes to a removed product do not affect the store"""
+        store.remove_product(sample_products[0])
+        sample_products[0].quantity = 1
+        assert store.get_total_quantity() == 750
+
+    # Test batch quoting
+    def test_quote_many_matches_buy(self, store, sample_products):
+        """Test that quote_many prices carts like buy() without changing stock"""
+        sample_products[0].set_promotion(ThirdOneFree("3 for 2"))
+        sample_products[1].set_promotion(SecondHalfPrice("Half"))
+        carts = [
+            [(sample_products[0], 3), (sample_products[1], 3)],
+            [],
+            [(sample_products[2], 2), (sample_products[1], 1)],
+        ]
+        totals = store.quote_many(carts)
+
+        assert list(totals) == [2 * 1450 + 625.0, 0.0, 1000.0 + 250.0]
+        assert store.get_total_quantity() == 850
+
+    def test_quote_many_rejects_bad_quantity(self, store, sample_products):
+        """Test that quote_many validates quantities like buy()"""
+        with pytest.raises(ValueError):
+            store.quote_many([[(sample_products[0], 0)]])
+
+    def test_quote_many_custom_promotion_sees_the_product(self, store, sample_products):
+        """Test that quote_many gives promotions without a batch method the product"""
+        class ClearanceDiscount(Promotion):
+            def apply_promotion(self, product, quantity):
+                rate = 0.5 if product.quantity < 200 else 1.0
+                return product.price * quantity * rate
+
+        clearance = ClearanceDiscount("Clearance")
+        sample_products[0].set_promotion(clearance)
+        sample_products[1].set_promotion(PromotionStack([clearance, PercentDiscount("10% off!", 10)]))
+        totals = store.quote_many([[(sample_products[0], 2)], [(sample_products[1], 2)]])
+
+        assert list(totals) == pytest.approx([sample_products[0].quote(2), sample_products[1].quote(2)])
+        assert list(totals) == pytest.approx([1450.0, 450.0])
+
+    # Test change listeners
+    def test_listeners_receive_changes(self, store, sample_products):
+        """Test that store listeners see product changes and membership"""
+        changes = []
+        store.add_listener(lambda item, field, old, new: changes.append((item.name, field, old, new)))
+        sample_products[0].price = 1400
+        sample_products[0].buy(100)
+        store.remove_product(sample_products[1])
+
+        assert changes == [
+            ("MacBook", "price", 1450.0, 1400.0),
+            ("MacBook", "quantity", 100, 0),
+            ("MacBook", "active", True, False),
+            ("Bose Earbuds", "removed", None, None),
+        ]
+
+    # Test the price index
+    def test_price_range_and_top_k(self, store, sample_products):
+        """Test range queries and top-k in price order"""
+        mac, bose, pixel = sample_products
+        assert store.products_in_price_range(200, 600) == [bose, pixel]
+        assert store.cheapest(2) == [bose, pixel]
+        assert store.most_expensive(2) == [mac, pixel]
+        assert store.cheapest(10) == [bose, pixel, mac]
+
+    def test_price_index_follows_setters(self, store, sample_products):
+        """Test that price changes and deactivation update the index"""
+        mac, bose, pixel = sample_products
+        mac.price = 100
+        pixel.deactivate()
+        assert store.cheapest(3) == [mac, bose]
+        assert store.products_in_price_range(400, 2000) == []
+        pixel.activate()
+        assert store.most_expensive(1) == [pixel]
+
+    def test_next_cheaper_and_pricier(self, store, sample_products):
+        """Test neighbours in price order"""
+        mac, bose, pixel = sample_products
+        assert store.next_cheaper(pixel) is bose
+        assert store.next_pricier(pixel) is mac
+        assert store.next_cheaper(bose) is None
+        assert store.next_pricier(mac) is None
+        store.remove_product(pixel)
+        assert store.next_pricier(bose) is mac
+
+    # Test name search
+    def test_search_prefix_and_substring(self, store, sample_products):
+        """Test case-insensitive prefix and substring search"""
+        mac, bose, pixel = sample_products
+        assert store.search("mac") == [mac]
+        assert store.search("PIX") == [pixel]
+        assert store.search("earbud") == [bose]
+        assert store.search("o") == []
+        assert store.search("xyz") == []
+
+    def test_search_ranking_and_pages(self, store):
+        """Test that exact and prefix matches rank first and pages slice results"""
+        phone = Product("Phone", 100, 1)
+        phone_case = Product("Phone Case", 10, 1)
+        smartphone = Product("Smartphone", 300, 1)
+        budget_phone = Product("Budget Phone", 80, 1)
+        for item in (smartphone, budget_phone, phone_case, phone):
+            store.add_product(item)
+
+        assert store.search("phone", limit=10) == [phone, phone_case, budget_phone, smartphone]
+        assert store.search("phone", limit=2, offset=2) == [budget_phone, smartphone]
+
+    def test_search_follows_store_changes(self, store, sample_products):
+        """Test that the index tracks add/remove and skips inactive products"""
+        assert store.search("macbook") == [sample_products[0]]
+        store.remove_product(sample_products[0])
+        assert store.search("macbook") == []
+        tablet = Product("Tablet", 300, 1)
+        store.add_product(tablet)
+        assert store.search("tab") == [tablet]
+        tablet.deactivate()
+        assert store.search("tab") == []
+        assert store.search("tab", active_only=False) == [tablet]
+
+    def test_search_index_built_outside_store_lock(self, store, sample_products, monkeypatch):
+        """Test that building the index leaves writers running and keeps their changes"""
+        tablet = Product("Tablet", 300, 1)
+        build_postings = SearchIndex.build_postings
+
+        def slow_build(index):
+            if index._postings is not None:
+                return
+            writer = threading.Thread(target=lambda: (
+                store.add_product(tablet),
+                store.remove_product(sample_products[0]),
+                sample_products[1].buy(1),
+            ))
+            writer.start()
+            writer.join(5)
+            assert not writer.is_alive()
+            build_postings(index)
+
+        monkeypatch.setattr(SearchIndex, "build_postings", slow_build)
+        assert store.search("tab") == [tablet]
+        assert store.search("macbook") == []
+        assert store.search("earbuds") == [sample_products[1]]
+        assert sample_products[1].quantity == 499
+
+
+    def test_list_products_pages_with_cursor(self, store, sample_products):
+        """Test that cursors page through products in order, unshifted by changes"""
+        page, cursor = store.list_products(limit=2)
+        assert page == sample_products[:2]
+        store.remove_product(sample_products[0])
+        store.add_product(Product("Tablet", 300, 1))
+        page, cursor = store.list_products(limit=2, cursor=cursor)
+        assert [item.name for item in page] == ["Google Pixel", "Tablet"]
+        assert cursor is None
+
+    def test_list_products_filters(self, store, sample_products):
+        """Test that inactive products and predicate misses are skipped"""
+        sample_products[1].deactivate()
+        assert list(store.iter_products(page_size=1)) == [sample_products[0], sample_products[2]]
+        assert list(store.iter_products(active_only=False)) == sample_products
+        cheap = list(store.iter_products(predicate=lambda item: item.price < 1000))
+        assert cheap == [sample_products[2]]
+        with pytest.raises(ValueError):
+            store.list_products(limit=0)
+
+    def test_write_listing_buffers_pages(self, store, sample_products):
+        """Test that the listing is written once per page"""
+        writes = []
+
+        class Out:
+            def write(self, text):
+                writes.append(text)
+
+            def flush(self):
+                pass
+
+        assert store.write_listing(Out(), page_size=2) == 3
+        assert len(writes) == 2
+        assert "".join(writes) == "".join(f"{item}\n" for item in sample_products)
+
+    def test_lowest_stock_and_watermarks(self, store, sample_products):
+        """Test the stock-ordered and below-watermark queries"""
+        mac, bose, pixel = sample_products
+        assert store.lowest_stock(2) == [mac, pixel]
+        store.set_watermark(bose, 450)
+        store.set_watermark(pixel, 100)
+        assert store.below_watermark() == []
+        bose.buy(60)
+        pixel.buy(200)
+        assert store.lowest_stock(1) == [pixel]
+        assert store.below_watermark() == [pixel, bose]
+        store.set_watermark(pixel, None)
+        assert store.below_watermark() == [bose]
+        with pytest.raises(ValueError):
+            store.set_watermark(Product("Tablet", 300, 1), 5)
+
+    def test_low_stock_callbacks_fire_on_crossing(self, store, sample_products):
+        """Test that watermark listeners fire only when the level is crossed"""
+        mac = sample_products[0]
+        crossings = []
+        store.add_low_stock_listener(
+            lambda product, quantity, watermark, below: crossings.append((quantity, below)))
+        store.set_watermark(mac, 10)
+        mac.buy(85)
+        mac.buy(5)
+        mac.buy(1)
+        store.restock({mac: 20})
+        assert crossings == [(10, True), (29, False)]
+
+    def test_restock_reactivates_sold_out_products(self, store, sample_products):
+        """Test that restock adds stock and reactivates only sold-out products"""
+        mac, bose, pixel = sample_products
+        mac.buy(100)
+        bose.deactivate()
+        total = store.get_total_quantity()
+
+        assert store.restock({mac: 5, bose: 10, pixel: 1}) == [mac]
+        assert mac.is_active() and not bose.is_active()
+        assert (mac.quantity, bose.quantity, pixel.quantity) == (5, 510, 251)
+        assert store.get_total_quantity() == total + 16
+        assert store.lowest_stock(1) == [mac]
+        with pytest.raises(ValueError):
+            store.restock({mac: 1, pixel: 0})
+        with pytest.raises(ValueError):
+            store.restock({Product("Tablet", 300, 1): 1})
+        assert mac.quantity == 5
+
+    def test_restock_rejects_non_stocked_products(self, store):
+        """Test that non-stocked products cannot be given stock"""
+        ebook = NonStockedProduct("Python E-Book", 30)
+        store.add_product(ebook)
+        total = store.get_total_quantity()
+        with pytest.raises(ValueError, match="not stocked"):
+            store.restock({ebook: 100})
+        assert ebook.quantity == 0
+        assert store.get_total_quantity() == total
+
+    def test_low_stock_listener_runs_without_locks(self, store, sample_products):
+        """Test that a listener may restock while another thread buys that product"""
+        mac, bose, _ = sample_products
+        finished = []
+
+        def replenish(product, quantity, watermark, below):
+            buyer = threading.Thread(target=lambda: finished.append(bose.buy(1)))
+            buyer.start()
+            buyer.join(5)
+            if not buyer.is_alive():
+                store.restock({bose: 1})
+
+        store.add_low_stock_listener(replenish)
+        store.set_watermark(mac, 10)
+        mac.buy(90)
+        assert finished == [250]
+        assert bose.quantity == 500
+
+
+class TestMergedStore:
+    """Test suite for merged store views"""
+
+    @pytest.fixture
+    def shared(self):
+        return Product("Shared", 10, 5)
+
+    @pytest.fixture
+    def stores(self, shared):
+        north = Store([Product("MacBook", 1450, 100), shared])
+        south = Store([shared, Product("iPhone", 999, 50)])
+        return north, south
+
+    def test_view_dedupes_products(self, stores, shared):
+        """Test that a product held by both stores is listed and counted once"""
+        north, south = stores
+        merged = north + south
+        assert [item.name for item in merged.get_all_products()] == ["MacBook", "Shared", "iPhone"]
+        assert merged.get_total_quantity() == 155
+        assert shared in merged and "iPhone" in merged
+        assert merged.get_product("iPhone") is south.get_product("iPhone")
+
+    def test_view_is_live(self, stores, shared):
+        """Test that the view sees changes made to the source stores"""
+        north, south = stores
+        merged = north.merge(south)
+        shared.buy(2)
+        south.add_product(Product("Pixel", 500, 7))
+        assert merged.get_total_quantity() == 160
+        north.remove_product(shared)
+        assert merged.get_total_quantity() == 160
+        assert [item.name for item in merged] == ["MacBook", "Shared", "iPhone", "Pixel"]
+
+    def test_order_and_materialize(self, stores, shared):
+        """Test ordering through the view and copying it into a Store"""
+        north, south = stores
+        merged = north + south + north
+        assert merged.stores == (north, south)
+        iphone = merged.get_product("iPhone")
+        assert merged.order([(shared, 2), (iphone, 1)]) == 20 + 999
+        copy = merged.materialize()
+        assert isinstance(copy, Store)
+        assert copy.product == merged.product
+        assert copy.get_total_quantity() == merged.get_total_quantity() == 152
+
+class TestPromotionBatch:
+    """Test suite for vectorized promotion pricing"""
+
+    @pytest.mark.parametrize("promotion", [
+        SecondHalfPrice("Half"),
+        ThirdOneFree("3 for 2"),
+        PercentDiscount("30% off", 30),
+    ])
+    def test_batch_matches_scalar(self, promotion):
+        """Test that batch pricing equals per-line pricing"""
+        prices = [10.0, 99.99, 250.0, 1.5]
+        quantities = [1, 2, 7, 300]
+        batch = promotion.apply_promotion_batch(prices, quantities)
+        scalar = [promotion.apply_promotion(Product("X", price, 1000), quantity)
+                  for price, quantity in zip(prices, quantities)]
+        assert list(batch) == scalar
+
+    def test_custom_promotion_falls_back(self):
+        """Test that subclasses without a batch method use apply_promotion"""
+        class FlatOff(Promotion):
+            def apply_promotion(self, product, quantity):
+                return max(product.price * quantity - 5, 0)
+
+        batch = FlatOff("5 off").apply_promotion_batch([10.0, 2.0], [1, 2])
+        assert list(batch) == [5.0, 0.0]
+
+
+
+class TestCompiledPricing:
+    """Test suite for stacked promotions and compiled product pricing"""
+
+    def test_stack_applies_in_order(self):
+        """Test that stacked promotions compound in list order"""
+        stack = PromotionStack([PercentDiscount("30% off!", 30), ThirdOneFree("Third One Free!")])
+        assert stack.name == "30% off! + Third One Free!"
+        item = Product("Speaker", 100, 50)
+        item.set_promotion(stack)
+        assert item.buy(3) == pytest.approx(140)
+        assert list(stack.apply_promotion_batch([100.0, 100.0], [3, 1])) == pytest.approx([140, 70])
+
+    def test_add_promotion_stacks(self):
+        """Test that add_promotion builds a flat stack"""
+        item = Product("Speaker", 100, 50)
+        item.add_promotion(SecondHalfPrice("Second Half Price!"))
+        assert item.quote(2) == 150
+        item.add_promotion(PercentDiscount("10% off!", 10))
+        item.add_promotion(ThirdOneFree("Third One Free!"))
+        assert len(item.promotion.promotions) == 3
+        assert item.quote(3) == pytest.approx((250 * 0.9) / 3 * 2)
+
+    @pytest.mark.parametrize("promotion", [
+        None,
+        SecondHalfPrice("Second Half Price!"),
+        ThirdOneFree("Third One Free!"),
+        PercentDiscount("30% off!", 30),
+        PromotionStack([SecondHalfPrice("a"), PercentDiscount("b", 15)]),
+    ])
+    def test_compiled_prices_match_promotions(self, promotion):
+        """Test that compiled pricing and price tables match apply_promotion"""
+        regular = Product("Speaker", 19.99, 10_000)
+        limited = LimitedProduct("Console", 19.99, 10_000, maximum=40)
+        for item in (regular, limited):
+            item.set_promotion(promotion)
+            for quantity in range(1, 60):
+                expected = promotion.apply_promotion(item, quantity) if promotion else quantity * 19.99
+                assert item._price_for(quantity) == pytest.approx(expected)
+
+    def test_pricing_rebuilt_on_change(self):
+        """Test that compiled pricing follows price and promotion changes"""
+        item = LimitedProduct("Console", 100, 100, maximum=5)
+        item.set_promotion(ThirdOneFree("Third One Free!"))
+        assert item.buy(3) == 200
+        compiled = item._pricing
+        assert item.buy(3) == 200
+        assert item._pricing is compiled
+        item.price = 50
+        assert item.buy(3) == 100
+        item.set_promotion(None)
+        assert item.buy(3) == 150
+
+    def test_custom_promotion_sees_the_product(self):
+        """Test that a promotion without compile can read any product attribute"""
+        class ClearanceDiscount(Promotion):
+            def apply_promotion(self, product, quantity):
+                rate = 0.5 if product.quantity < 10 else 1.0
+                return product.price * quantity * rate
+
+        for item in (Product("Speaker", 100, 12), LimitedProduct("Console", 100, 12, maximum=5)):
+            item.set_promotion(ClearanceDiscount("Clearance"))
+            assert item.buy(2) == 200
+            assert item.buy(2) == 200
+            assert item.buy(1) == 50
+            assert item.quote(2) == 100
+
+    def test_stack_is_compiled(self):
+        """Test that stacks of built-in promotions compile and get a price table"""
+        stack = PromotionStack([PercentDiscount("30% off!", 30), ThirdOneFree("Third One Free!")])
+        regular = Product("Speaker", 100, 50)
+        limited = LimitedProduct("Console", 100, 50, maximum=5)
+        for item in (regular, limited):
+            item.set_promotion(stack)
+            assert item.buy(3) == pytest.approx(140)
+        assert "table" not in regular._pricing[2].__code__.co_freevars
+        assert "table" in limited._pricing[2].__code__.co_freevars
+
+    def test_stack_with_custom_promotion_sees_the_product(self):
+        """Test that a stack holding a custom promotion falls back to the product"""
+        class ClearanceDiscount(Promotion):
+            def apply_promotion(self, product, quantity):
+                rate = 0.5 if product.quantity < 10 else 1.0
+                return product.price * quantity * rate
+
+        item = LimitedProduct("Console", 100, 12, maximum=5)
+        item.set_promotion(PromotionStack([ClearanceDiscount("Clearance"), PercentDiscount("10% off!", 10)]))
+        assert item.buy(2) == pytest.approx(180)
+        assert item.buy(2) == pytest.approx(180)
+        assert item.buy(1) == pytest.approx(45)
+
+
+class TestConcurrentOrders:
+    """Test suite for thread-safe and all-or-nothing ordering"""
+
+    def test_atomic_order_commits_all_lines(self):
+        """Test that a valid atomic order takes stock for every line"""
+        mac, bose = Product("MacBook", 1450, 10), Product("Bose", 250, 10)
+        store = Store([mac, bose])
+        total = store.order_atomic([(mac, 2), (bose, 3), (mac, 1)])
+
+        assert total == 3 * 1450 + 3 * 250
+        assert mac.quantity == 7
+        assert store.get_total_quantity() == 14
+
+    def test_atomic_order_rolls_back_on_failure(self):
+        """Test that a failing line leaves the whole order uncommitted"""
+        mac, bose = Product("MacBook", 1450, 10), Product("Bose", 250, 10)
+        store = Store([mac, bose])
+        with pytest.raises(Exception, match="not enough stock"):
+            store.order_atomic([(mac, 2), (bose, 6), (bose, 5)])
+
+        assert mac.quantity == 10
+        assert bose.quantity == 10
+
+    def test_atomic_order_enforces_limited_maximum(self):
+        """Test that LimitedProduct limits apply per line in atomic orders"""
+        ps5 = LimitedProduct("PlayStation 5", 600, 5, maximum=1)
+        store = Store([ps5])
+        with pytest.raises(Exception, match="maximum purchase limit"):
+            store.order_atomic([(ps5, 2)])
+        assert ps5.quantity == 5
+
+    def test_concurrent_buys_never_oversell(self):
+        """Test that concurrent buyers cannot sell more than the stock"""
+        item = Product("Tablet", 300, 500)
+        store = Store([item])
+        sold = []
+
+        def buyer():
+            for _ in range(100):
+                try:
+                    item.buy(1)
+                    sold.append(1)
+                except Exception:
+                    pass
+
+        threads = [threading.Thread(target=buyer) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(sold) == 500
+        assert item.quantity == 0
+        assert store.get_total_quantity() == 0
+
+    def test_crossing_atomic_orders_do_not_deadlock(self):
+        """Test that orders locking products in opposite orders complete"""
+        first, second = Product("A", 1, 10000), Product("B", 1, 10000)
+        store = Store([first, second])
+
+        def worker(shopping_list):
+            for _ in range(500):
+                store.order_atomic(shopping_list)
+
+        threads = [
+            threading.Thread(target=worker, args=([(first, 1), (second, 1)],)),
+            threading.Thread(target=worker, args=([(second, 1), (first, 1)],)),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+
+        assert not any(thread.is_alive() for thread in threads)
+        assert first.quantity == second.quantity == 9000
+        assert store.get_total_quantity() == 18000
+
+
+class TestQuoteCache:
+    """Test suite for memoized price quotes"""
+
+    @pytest.fixture
+    def cache(self):
+        """Fixture with a small private cache"""
+        return QuoteCache(maxsize=2)
+
+    def test_quote_matches_buy_without_side_effects(self, cache):
+        """Test that quote prices like buy() but keeps the stock"""
+        bose = Product("Bose", 250, 500)
+        bose.set_promotion(SecondHalfPrice("Half"))
+        assert bose.quote(2, cache) == 375.0
+        assert bose.quantity == 500
+        assert bose.buy(2) == bose.quote(2, cache)
+
+    def test_repeated_quotes_hit(self, cache):
+        """Test that the same quote is served from the cache"""
+        item = Product("Cable", 10, 200)
+        item.quote(3, cache)
+        item.quote(3, cache)
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_price_and_promotion_changes_invalidate(self, cache):
+        """Test that setters make older quotes unreachable"""
+        item = Product("Cable", 10, 200)
+        assert item.quote(3, cache) == 30.0
+        item.price = 20
+        assert item.quote(3, cache) == 60.0
+        item.promotion = ThirdOneFree("3 for 2")
+        assert item.quote(3, cache) == 40.0
+        assert cache.stats()["hits"] == 0
+
+    def test_lru_eviction(self, cache):
+        """Test that the least recently used quote is evicted"""
+        item = Product("Cable", 10, 200)
+        item.quote(1, cache)
+        item.quote(2, cache)
+        item.quote(1, cache)
+        item.quote(3, cache)
+        assert cache.stats()["evictions"] == 1
+        item.quote(1, cache)
+        assert cache.stats()["hits"] == 2
+        assert len(cache) == 2
+
+    def test_quote_rejects_bad_quantity(self, cache):
+        """Test that quote validates the quantity like buy()"""
+        with pytest.raises(ValueError):
+            Product("Cable", 10, 200).quote(0, cache)
@@ -0,0 +1,111 @@
+import time
+
+import pytest
+
+from product import LimitedProduct, Product
+from promotion import SecondHalfPrice
+from reservations import ReservationBook
+from store import Store
+
+
+class FakeClock:
+    """Clock that only moves when a test sets `now`"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestReservations:
+    """Test suite for cart reservations and their expiry"""
+
+    @pytest.fixture
+    def mac(self):
+        """Fixture to create a product to reserve"""
+        return Product("MacBook", 1450, 10)
+
+    @pytest.fixture
+    def store(self, mac):
+        """Fixture to create a store holding the product"""
+        return Store([mac, Product("Bose Earbuds", 250, 500)])
+
+    def test_reserve_holds_stock(self, store, mac):
+        """Test that held units are unavailable to other buyers"""
+        reservation = store.reserve([(mac, 6), (mac, 2)])
+        assert reservation.lines == {mac: 8}
+        assert mac.available == 2
+        assert mac.quantity == 10
+        with pytest.raises(Exception):
+            mac.buy(3)
+        with pytest.raises(Exception):
+            store.reserve([(mac, 3)])
+        assert mac.buy(2) == 2900
+
+    def test_commit_buys_held_stock(self, store, mac):
+        """Test that committing takes the stock and prices the combined quantity"""
+        mac.set_promotion(SecondHalfPrice("Second Half Price!"))
+        reservation = store.reserve([(mac, 1), (mac, 1)])
+        assert store.commit(reservation) == 1450 + 725
+        assert reservation.state == "committed"
+        assert mac.quantity == mac.available == 8
+        with pytest.raises(ValueError):
+            store.commit(reservation)
+        assert store.release(reservation) is False
+
+    def test_release_returns_stock(self, store, mac):
+        """Test that releasing gives held units back"""
+        reservation = store.reserve([(mac, 4)])
+        assert store.release(reservation) is True
+        assert mac.available == 10
+        assert len(store.reservations) == 0
+
+    def test_failed_reserve_holds_nothing(self, store, mac):
+        """Test that a reservation is all or nothing"""
+        ps5 = LimitedProduct("PlayStation 5", 600, 5, maximum=1)
+        with pytest.raises(Exception):
+            store.reserve([(mac, 2), (ps5, 2)])
+        assert mac.available == 10
+        with pytest.raises(ValueError):
+            store.reserve([(mac, 1)], ttl=0)
+
+    def test_commit_fails_after_deactivation(self, store, mac):
+        """Test that a commit on a deactivated product raises and releases"""
+        reservation = store.reserve([(mac, 4)])
+        mac.deactivate()
+        with pytest.raises(Exception):
+            store.commit(reservation)
+        assert reservation.state == "released"
+        assert mac.quantity == 10
+        assert mac._held == 0
+
+    def test_expiry_in_deadline_order(self, mac):
+        """Test that expire() releases only the reservations that are due"""
+        clock = FakeClock()
+        book = ReservationBook(clock=clock, background=False)
+        first = book.reserve({mac: 3}, ttl=5)
+        second = book.reserve({mac: 2}, ttl=10)
+        third = book.reserve({mac: 1}, ttl=7)
+        book.release(third)
+        assert book.next_deadline() == 5
+
+        clock.now = 7
+        assert book.expire() == 1
+        assert first.state == "expired"
+        assert second.state == "held"
+        assert mac.available == 8
+        clock.now = 10
+        assert book.expire() == 1
+        assert mac.available == 10
+        assert book.expired == 2
+        assert book.next_deadline() is None
+
+    def test_background_expiry(self, store, mac):
+        """Test that the expiry thread releases holds without being asked"""
+        reservation = store.reserve([(mac, 5)], ttl=0.05)
+        deadline = time.monotonic() + 5
+        while reservation.state == "held" and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert reservation.state == "expired"
+        assert mac.available == 10
@@ -0,0 +1,141 @@
+import asyncio
+import json
+
+from loadgen import _encode, run_load
+from main import demo_store
+from server import StoreServer
+
+
+def serve(scenario):
+    """Run scenario(server) against a demo store server on a free port."""
+
+    async def run():
+        async with StoreServer(demo_store(), port=0, workers=2) as server:
+            return await scenario(server)
+
+    return asyncio.run(run())
+
+
+async def exchange(port, *requests):
+    """Send requests pipelined on one connection; return (status, body) pairs."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"".join(_encode(method, path, payload, "localhost")
+                          for method, path, payload in requests))
+    responses = []
+    for _ in requests:
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode().partition(":")
+            headers[name.lower()] = value.strip()
+        body = await reader.readexactly(int(headers["content-length"]))
+        responses.append((status, json.loads(body)))
+    writer.close()
+    await writer.wait_closed()
+    return responses
+
+
+class TestStoreServer:
+    """Test suite for the HTTP store server"""
+
+    def test_pipelined_requests_answered_in_order(self):
+        """Test that pipelined requests on one connection get ordered responses"""
+        async def scenario(server):
+            return await exchange(
+                server.port,
+                ("GET", "/products?limit=2", None),
+                ("GET", "/search?q=mac", None),
+                ("POST", "/quote", {"lines": [{"name": "MacBook Air M2", "quantity": 3}]}),
+                ("GET", "/products?limit=10&cursor=1", None),
+            )
+
+        (s1, page), (s2, found), (s3, quote), (s4, rest) = serve(scenario)
+        assert (s1, s2, s3, s4) == (200, 200, 200, 200)
+        assert [item["name"] for item in page["products"]] == ["Bose Headphones", "MacBook Air M2"]
+        assert page["next_cursor"] == 1
+        assert [item["name"] for item in found["products"]] == ["MacBook Air M2"]
+        assert quote["total_price"] == 2900
+        assert len(rest["products"]) == 3 and rest["next_cursor"] is None
+
+    def test_order_reports_lines(self):
+        """Test that orders return per-line results and take stock"""
+        async def scenario(server):
+            responses = await exchange(server.port, ("POST", "/order", {"lines": [
+                {"name": "Bose Headphones", "quantity": 2},
+                {"name": "PlayStation 5", "quantity": 2},
+            ]}))
+            return responses, server.store.get_product("Bose Headphones").quantity
+
+        [(status, result)], bose_left = serve(scenario)
+        assert status == 200
+        assert result["ok"] is False
+        assert result["total_price"] == 375
+        assert [line["reason"] for line in result["lines"]] == [None, "over_maximum"]
+        assert result["lines"][0]["promotion"] == "Second Half Price!"
+        assert bose_left == 498
+
+    def test_errors(self):
+        """Test unknown endpoints, methods, products and bad JSON"""
+        async def scenario(server):
+            return await exchange(
+                server.port,
+                ("GET", "/nope", None),
+                ("GET", "/order", None),
+                ("POST", "/order", {"lines": [{"name": "Missing", "quantity": 1}]}),
+                ("POST", "/quote", {"lines": [{"name": "USB-C Cable", "quantity": 0}]}),
+            )
+
+        statuses = [status for status, _ in serve(scenario)]
+        assert statuses == [404, 405, 404, 400]
+
+    def test_load_generator(self):
+        """Test that the load generator reports throughput and latency"""
+        async def scenario(server):
+            return await run_load(port=server.port, connections=4, requests=200, pipeline=4)
+
+        stats = serve(scenario)
+        assert stats["requests"] == 200
+        assert stats["statuses"] == {200: 200}
+        assert 0 < stats["p50_ms"] <= stats["p99_ms"]
+        assert stats["requests_per_sec"] > 0
+
+    def test_failed_atomic_order_and_non_object_payload(self):
+        """Test that rejected atomic orders get 409 with a reason and non-objects get 400"""
+        async def scenario(server):
+            return await exchange(
+                server.port,
+                ("POST", "/order", {"atomic": True, "lines": [{"name": "PlayStation 5", "quantity": 2}]}),
+                ("POST", "/quote", [1, 2]),
+            )
+
+        (s1, rejected), (s2, _) = serve(scenario)
+        assert (s1, rejected["reason"]) == (409, "over_maximum")
+        assert s2 == 400
+
+    def test_connection_closes_when_sender_stops(self):
+        """Test that a handler whose sender died does not block on a full queue"""
+        class BrokenWriter:
+            """Stream writer whose peer has gone away"""
+
+            def write(self, data):
+                raise ConnectionResetError("peer went away")
+
+            async def drain(self):
+                pass
+
+            def close(self):
+                pass
+
+        async def scenario(server):
+            server.max_pipeline = 1
+            reader = asyncio.StreamReader()
+            reader.feed_data(b"".join(_encode("GET", "/products?limit=1", None, "localhost")
+                                      for _ in range(20)))
+            reader.feed_eof()
+            await asyncio.wait_for(server._serve_connection(reader, BrokenWriter()), timeout=5)
+            return server._connections
+
+        assert serve(scenario) == {}
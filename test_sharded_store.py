@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+
+from product import LimitedProduct, NonStockedProduct, Product
+from sharded_store import ShardedStore
+
+
+class TestShardedStore:
+    """Test suite for the multi-process sharded store"""
+
+    @pytest.fixture
+    def store(self):
+        """Fixture to create a sharded store and stop its workers afterwards"""
+        products = [Product(f"Item {i}", 10 + i, 20) for i in range(12)]
+        products.append(LimitedProduct("PlayStation 5", 600, 5, maximum=1))
+        products.append(NonStockedProduct("E-Book", 30))
+        with ShardedStore(products, shards=3) as store:
+            yield store
+
+    def test_reads_come_from_shared_memory(self, store):
+        """Test totals and listing without any order"""
+        assert store.get_total_quantity() == 12 * 20 + 5
+        assert len(store.get_all_products()) == 14
+        assert "E-Book" in store
+
+    def test_cross_shard_order(self, store):
+        """Test an order that spans several shards"""
+        names = [f"Item {i}" for i in range(12)]
+        total = store.order_atomic([(name, 2) for name in names])
+
+        assert total == sum(2 * (10 + i) for i in range(12))
+        assert store.get_total_quantity() == 12 * 18 + 5
+        assert store.get_product("Item 3").quantity == 18
+
+    def test_failed_cross_shard_order_takes_nothing(self, store):
+        """Test that a failing line aborts the reservations on every shard"""
+        shopping_list = [(f"Item {i}", 1) for i in range(12)]
+        shopping_list.append(("PlayStation 5", 2))
+        with pytest.raises(Exception, match="maximum purchase limit"):
+            store.order_atomic(shopping_list)
+        assert store.get_total_quantity() == 12 * 20 + 5
+
+    def test_sell_out_and_non_stocked(self, store):
+        """Test product type rules enforced by the workers"""
+        item = store.get_product("Item 0")
+        assert item.buy(20) == 200.0
+        assert item.active is False
+        assert item not in store.get_all_products()
+        assert store.order([("E-Book", 3)]) == 90.0
+
+    def test_order_prints_failure(self, store, capsys):
+        """Test that order reports a failed order and returns 0"""
+        assert store.order([("Item 1", 21)]) == 0
+        assert "Could not place order" in capsys.readouterr().out
+
+    def test_concurrent_orders_never_oversell(self, store):
+        """Test that concurrent cross-shard orders keep stock consistent"""
+        results = []
+
+        def buyer():
+            for _ in range(30):
+                try:
+                    results.append(store.order_atomic([("Item 1", 1), ("Item 2", 1)]))
+                except Exception:
+                    pass
+
+        threads = [threading.Thread(target=buyer) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(results) == 20
+        assert store.get_product("Item 1").quantity == 0
+        assert store.get_product("Item 2").quantity == 0
+
+    def test_price_and_promotion_are_fixed(self, store):
+        """Test that price and promotion changes are refused, not silently ignored"""
+        item = store.get_product("Item 0")
+        with pytest.raises(Exception, match="fixed"):
+            item.price = 99
+        with pytest.raises(Exception, match="fixed"):
+            item.set_promotion(None)
+        assert store.order_atomic([("Item 0", 1)]) == 10
+
+    def test_deactivate_goes_through_the_shard(self, store):
+        """Test that deactivate waits for an order in flight on the owning shard"""
+        item = store.get_product("Item 0")
+        shard = store._shard_of[item._index]
+        with store._conn_locks[shard]:
+            thread = threading.Thread(target=item.deactivate)
+            thread.start()
+            thread.join(0.2)
+            assert thread.is_alive()
+            assert item.active is True
+        thread.join()
+        assert item.active is False
+        assert store.order([(item, 1)]) == 0
+        item.activate()
+        assert store.order_atomic([(item, 1)]) == 10
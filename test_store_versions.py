@@ -0,0 +1,147 @@
+import gc
+import sys
+import threading
+
+import pytest
+
+from product import Product
+from store import Store
+from store_versions import CHUNK_BITS
+
+
+def make_store(count=3):
+    """Create a store of `count` products with 100 units each"""
+    return Store([Product(f"Product {i}", 10 + i, 100) for i in range(count)])
+
+
+class TestStoreVersions:
+    """Test suite for copy-on-write versioned store snapshots"""
+
+    @pytest.fixture
+    def store(self):
+        """Fixture to create a store of three products"""
+        return make_store()
+
+    def test_snapshot_is_immutable(self, store):
+        """Test that a snapshot keeps its values after the store changes"""
+        mac = store.product[0]
+        before = store.snapshot()
+        mac.buy(40)
+        store.product[1].deactivate()
+        store.add_product(Product("Tablet", 300, 5))
+
+        assert before.get_total_quantity() == 300
+        assert [state.quantity for state in before] == [100, 100, 100]
+        assert len(before.get_all_products()) == 3
+
+        after = store.snapshot()
+        assert after.version > before.version
+        assert after.get_total_quantity() == 265
+        assert [state.name for state in after.get_all_products()] == ["Product 0", "Product 2", "Tablet"]
+        assert next(iter(after)).product is mac
+
+    def test_unchanged_store_reuses_version(self, store):
+        """Test that snapshots without changes in between are the same object"""
+        assert store.snapshot() is store.snapshot()
+
+    def test_publish_copies_only_changed_chunks(self):
+        """Test that a new version shares unchanged chunks with the old one"""
+        store = make_store(3 << CHUNK_BITS)
+        first = store.snapshot()
+        store.product[5].quantity = 1
+        store.remove_product(store.product[-1])
+        second = store.snapshot()
+
+        shared = [a is b for a, b in zip(first._chunks, second._chunks)]
+        assert shared == [False, True, False]
+        assert len(second) == len(first) - 1
+        assert second.get_total_quantity() == first.get_total_quantity() - 99 - 100
+
+    def test_old_versions_are_reclaimed(self, store):
+        """Test that a version is dropped once no reader holds it"""
+        held = store.snapshot()
+        store.product[0].quantity = 5
+        dropped = store.snapshot()
+        store.product[0].quantity = 6
+        latest = store.snapshot()
+        del dropped
+        gc.collect()
+        assert store.live_versions() == [held.version, latest.version]
+
+    def test_readers_see_consistent_totals(self):
+        """Test that a snapshot's total always matches its product states"""
+        store = make_store(50)
+        products = store.product
+        stop = threading.Event()
+        errors = []
+
+        def reader():
+            while not stop.is_set():
+                version = store.snapshot()
+                if sum(state.quantity for state in version) != version.get_total_quantity():
+                    errors.append(version.version)
+
+        threads = [threading.Thread(target=reader) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for i in range(2000):
+            products[i % 50].buy(1)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+
+    def test_readers_never_wait_for_writers(self, store):
+        """Test that snapshot() returns while another thread holds the store lock"""
+        store.snapshot()
+        held, release = threading.Event(), threading.Event()
+
+        def writer():
+            with store._lock:
+                held.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        held.wait(5)
+        result = []
+        reader = threading.Thread(target=lambda: result.append(store.snapshot()))
+        reader.start()
+        reader.join(1)
+        returned = bool(result)
+        release.set()
+        thread.join()
+        reader.join()
+        assert returned
+
+    def test_versions_never_show_partial_writes(self):
+        """Test that atomic orders and sell-outs appear whole in every version"""
+        store = Store([Product("A", 1, 2000), Product("B", 1, 2000), Product("C", 1, 1)])
+        a, b, c = store.product
+        store.snapshot()
+        stop = threading.Event()
+        errors = []
+
+        def reader():
+            while not stop.is_set():
+                states = list(store.snapshot())
+                if states[0].quantity != states[1].quantity:
+                    errors.append("partial order")
+                if states[2].quantity == 0 and states[2].active:
+                    errors.append("sold out but active")
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        thread = threading.Thread(target=reader)
+        thread.start()
+        try:
+            for i in range(1000):
+                store.order_atomic([(a, 1), (b, 1)])
+                if i == 500:
+                    c.buy(1)
+        finally:
+            stop.set()
+            thread.join()
+            sys.setswitchinterval(interval)
+        assert errors == []
+        assert [state.quantity for state in store.snapshot()] == [1000, 1000, 0]